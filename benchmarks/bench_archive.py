@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+"""
+Time archive builds, filtering and extraction on a synthetic sweep.
+
+Builds one sweep with the test generators, then times each stage in a
+fresh process so that its peak resident memory can be measured on its own:
+
+    filter-raw    Filter reading the simulation folders (no archive yet)
+    archive       Archive, once for every requested core count
+    filter-bpa    Filter reading the archive
+    extract-*     the main extract functions on the finished archive
+
+Each stage reports wall time, simulations per second, megabytes per second
+and peak RSS. Megabytes are the sweep's files for archive and filter-raw,
+the archive file for filter-bpa, and the data returned for extract stages.
+Peak RSS is the larger of the stage process and its biggest worker, and
+includes the cost of importing bigplanet. The sweep is deterministic, so
+runs with the same options can be compared across releases.
+
+Run from the repository root:
+
+    python benchmarks/bench_archive.py --sims 200 --cores 1 2 4 --json out.json
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import pathlib
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import h5py
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import bigplanet
+from bigplanet import archive, checkpoint, filter
+from tests.fixtures import generators
+
+SWEEP_FOLDER = "bench_sims"
+ARCHIVE_FILE = SWEEP_FOLDER + ".bpa"
+FILTER_INPUT = "bpl_filter.in"
+FILTER_OUTPUT = "bench_filtered.bpf"
+
+
+def fsBodyName(iBody):
+    """Name of the iBody-th planet in the sweep."""
+    return "earth" if iBody == 0 else f"planet{iBody}"
+
+
+def fnCreateSweep(pathDir, args):
+    """Create the sweep and the bpl.in files used to archive and filter it."""
+    listBodies = [fsBodyName(i) for i in range(args.bodies)]
+    dictSimOptions = {
+        "listBodyNames": ["sun"] + listBodies,
+        "iNumTimeSteps": args.steps,
+        "bIncludeClimate": args.climate is not None,
+        # extra planets find their forward files through sOutFile
+        "bSystemOutFile": True,
+    }
+    if args.climate is not None:
+        dictSimOptions["iNumLatitudes"], dictSimOptions["iNumDays"] = \
+            args.climate
+    generators.fnCreateMultipleSimulations(
+        pathDir / SWEEP_FOLDER, args.sims, **dictSimOptions
+    )
+
+    listBodyFiles = [sBody + ".in" for sBody in listBodies]
+    listInclude = [
+        f"{listBodies[-1]}:TMan:forward",
+        f"{listBodies[-1]}:TMan:final",
+    ]
+    pathFilter = generators.fnCreateBigPlanetIn(
+        pathDir, SWEEP_FOLDER, listBodyFiles=listBodyFiles,
+        listInclude=listInclude,
+    )
+    with open(pathFilter, "a") as f:
+        f.write(f"sOutputFile {FILTER_OUTPUT}\n")
+    pathFilter.rename(pathDir / FILTER_INPUT)
+
+    pathBpl = generators.fnCreateBigPlanetIn(
+        pathDir, SWEEP_FOLDER, listBodyFiles=listBodyFiles
+    )
+    if args.precompute:
+        with open(pathBpl, "a") as f:
+            f.write("saPrecomputeStats\n")
+    return pathBpl
+
+
+def fiDirBytes(sPath):
+    """Total size of the files under sPath."""
+    iBytes = 0
+    for sRoot, listDirs, listFiles in os.walk(sPath):
+        for sFile in listFiles:
+            iBytes += os.path.getsize(os.path.join(sRoot, sFile))
+    return iBytes
+
+
+def fiResultBytes(result):
+    """Size of the data returned by an extract function."""
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    if isinstance(result, pd.DataFrame):
+        return result.to_numpy().nbytes
+    if isinstance(result, (list, tuple)):
+        return sum(fiResultBytes(value) for value in result)
+    if isinstance(result, (bytes, str)):
+        return len(result)
+    return 8
+
+
+def fdPeakRssMb():
+    """Peak RSS of this process or its largest finished child, in MB."""
+    iPeak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    if sys.platform == "darwin":
+        return iPeak / 1e6
+    return iPeak * 1024 / 1e6
+
+
+def fiStageArchive(sBpl, iCores):
+    archive.Archive(sBpl, iCores, True, False, False, False)
+    return fiDirBytes(SWEEP_FOLDER)
+
+
+def fiStageFilterRaw(sBpl):
+    filter.Filter(sBpl, True, False, False, True)
+    return fiDirBytes(SWEEP_FOLDER)
+
+
+def fiStageFilterArchive(sBpl):
+    filter.Filter(sBpl, True, False, False, True)
+    return os.path.getsize(ARCHIVE_FILE)
+
+
+def fiStageExtract(sFunction, sKey):
+    with h5py.File(ARCHIVE_FILE, "r") as hf:
+        result = getattr(archive, sFunction)(hf, sKey)
+    return fiResultBytes(result)
+
+
+STAGES = {
+    "archive": fiStageArchive,
+    "filter-raw": fiStageFilterRaw,
+    "filter-bpa": fiStageFilterArchive,
+    "extract": fiStageExtract,
+}
+
+
+def fnRunStage(queue, sStage, tArgs, bQuiet):
+    """Run one stage in this (fresh) process and report on the queue."""
+    if bQuiet:
+        iNull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(iNull, 1)
+        os.dup2(iNull, 2)
+    try:
+        dStart = time.perf_counter()
+        iBytes = STAGES[sStage](*tArgs)
+        dSeconds = time.perf_counter() - dStart
+    except Exception as error:
+        queue.put({"error": repr(error)})
+        return
+    queue.put({"seconds": dSeconds, "bytes": iBytes,
+               "peak_rss_mb": fdPeakRssMb()})
+
+
+def fdictMeasure(sStage, tArgs, iSims, iRepeat, bQuiet):
+    """Run a stage iRepeat times and keep the fastest time and largest RSS."""
+    ctx = mp.get_context("spawn")
+    listRuns = []
+    for iRun in range(iRepeat):
+        if sStage == "archive":
+            if os.path.exists(ARCHIVE_FILE):
+                os.remove(ARCHIVE_FILE)
+            checkpoint.RemoveCheckpoint(
+                os.path.join(os.getcwd(), "." + SWEEP_FOLDER + "_BPL")
+            )
+        queue = ctx.Queue()
+        proc = ctx.Process(target=fnRunStage,
+                           args=(queue, sStage, tArgs, bQuiet))
+        proc.start()
+        dictRun = queue.get()
+        proc.join()
+        if "error" in dictRun:
+            raise RuntimeError(f"{sStage} failed: {dictRun['error']}")
+        listRuns.append(dictRun)
+
+    dSeconds = min(dictRun["seconds"] for dictRun in listRuns)
+    iBytes = listRuns[0]["bytes"]
+    return {
+        "seconds": dSeconds,
+        "sims_per_s": iSims / dSeconds,
+        "mb_per_s": iBytes / 1e6 / dSeconds,
+        "mb": iBytes / 1e6,
+        "peak_rss_mb": max(dictRun["peak_rss_mb"] for dictRun in listRuns),
+    }
+
+
+def flistExtractCases(args):
+    """(label, extract function, key) for every extract stage."""
+    sBody = fsBodyName(args.bodies - 1)
+    listCases = [
+        ("ExtractColumn-forward", "ExtractColumn", f"{sBody}:TMan:forward"),
+        ("ExtractColumn-final", "ExtractColumn", f"{sBody}:TMan:final"),
+        ("ExtractColumn-option", "ExtractColumn", f"{sBody}:dTMan:option"),
+        ("ExtractColumn-mean", "ExtractColumn", f"{sBody}:TMan:mean"),
+        ("ExtractColumn-max", "ExtractColumn", f"{sBody}:TMan:max"),
+        ("ExtractUniqueValues", "ExtractUniqueValues",
+         f"{sBody}:dObliquity:option"),
+        ("ExtractColumns", "ExtractColumns",
+         [f"{sBody}:TMan:initial", f"{sBody}:TMan:final",
+          f"{sBody}:dTMan:option", f"{sBody}:dObliquity:option"]),
+        ("ExtractUnits", "ExtractUnits", f"{sBody}:TMan:forward"),
+        ("ForwardData", "ForwardData", f"{sBody}:TMan:forward"),
+    ]
+    if args.climate is not None:
+        listCases.append(("ExtractColumn-climate", "ExtractColumn",
+                          f"{sBody}:DailyInsol:climate"))
+    return listCases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sims", type=int, default=100)
+    parser.add_argument("--bodies", type=int, default=1,
+                        help="planets per simulation, besides the sun")
+    parser.add_argument("--steps", type=int, default=100,
+                        help="forward rows per planet")
+    parser.add_argument("--climate", type=int, nargs=2,
+                        metavar=("LATITUDES", "DAYS"),
+                        help="add seasonal climate grids of this shape")
+    parser.add_argument("--cores", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--precompute", action="store_true",
+                        help="archive with saPrecomputeStats")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="runs per stage; the fastest is reported")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true",
+                        help="show the output of each stage")
+    args = parser.parse_args()
+
+    sCwd = os.getcwd()
+    pathDir = pathlib.Path(tempfile.mkdtemp())
+    listResults = []
+    try:
+        pathBpl = fnCreateSweep(pathDir, args)
+        os.chdir(pathDir)
+        iInputBytes = fiDirBytes(SWEEP_FOLDER)
+
+        def fnMeasure(sLabel, sStage, tArgs, iCores=None):
+            dictResult = {"stage": sLabel, "cores": iCores}
+            dictResult.update(fdictMeasure(
+                sStage, tArgs, args.sims, args.repeat, not args.verbose
+            ))
+            listResults.append(dictResult)
+
+        fnMeasure("filter-raw", "filter-raw", (FILTER_INPUT,))
+        for iCores in args.cores:
+            fnMeasure("archive", "archive", (str(pathBpl), iCores), iCores)
+        dArchiveMb = os.path.getsize(ARCHIVE_FILE) / 1e6
+        fnMeasure("filter-bpa", "filter-bpa", (FILTER_INPUT,))
+        for sLabel, sFunction, sKey in flistExtractCases(args):
+            fnMeasure(sLabel, "extract", (sFunction, sKey))
+    finally:
+        os.chdir(sCwd)
+        shutil.rmtree(pathDir)
+
+    print("%-24s %5s %9s %10s %9s %9s"
+          % ("stage", "cores", "seconds", "sims/s", "MB/s", "RSS MB"))
+    for dictResult in listResults:
+        print(
+            "%-24s %5s %9.3f %10.1f %9.2f %9.1f"
+            % (
+                dictResult["stage"],
+                dictResult["cores"] or "-",
+                dictResult["seconds"],
+                dictResult["sims_per_s"],
+                dictResult["mb_per_s"],
+                dictResult["peak_rss_mb"],
+            )
+        )
+
+    if args.json:
+        dictSweep = {
+            "sims": args.sims,
+            "bodies": args.bodies,
+            "steps": args.steps,
+            "climate": args.climate,
+            "precompute": args.precompute,
+            "input_mb": iInputBytes / 1e6,
+            "archive_mb": dArchiveMb,
+        }
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "bigplanet_version": bigplanet.__version__,
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpu_count": os.cpu_count(),
+                    "repeat": args.repeat,
+                    "sweep": dictSweep,
+                    "results": listResults,
+                },
+                f, indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
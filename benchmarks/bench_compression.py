@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Compare archive storage settings on a synthetic sweep.
+
+Builds one sweep with the test generators, archives it once per storage
+setting, and reports build time, time to read every forward column, and
+archive size. The generated series are smooth, so they compress better
+than most real VPLanet output; compare settings against each other rather
+than reading the ratios as typical.
+
+Run from the repository root:
+
+    python benchmarks/bench_compression.py --sims 50 --steps 2000
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+
+import h5py
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from bigplanet import archive, checkpoint
+from tests.fixtures import generators
+
+# (label, storage options) for each archive that is built
+STORAGE_CASES = [
+    ("none", {"sCompression": "none", "bShuffle": False}),
+    ("gzip-4-shuffle", {}),
+    ("gzip-9-shuffle", {"iCompressionLevel": 9}),
+    ("lzf-shuffle", {"sCompression": "lzf"}),
+    ("gzip-4-scaleoffset-6", {"iScaleOffset": 6}),
+]
+
+
+def fnCreateSweep(pathDir, iSims, iSteps):
+    """Create a sweep of iSims simulations with iSteps forward rows each."""
+    for iSim in range(iSims):
+        generators.fnCreateMinimalSimulation(
+            pathDir / "bench_sims" / f"sim_{iSim:04d}", iNumTimeSteps=iSteps
+        )
+    return generators.fnCreateBigPlanetIn(
+        pathDir, "bench_sims", listBodyFiles=["earth.in"]
+    )
+
+
+def fdictRunCase(pathBpl, iCores, dictOptions):
+    """Build one archive and time reading its forward columns back."""
+    sArchive = "bench_sims.bpa"
+    if os.path.exists(sArchive):
+        os.remove(sArchive)
+    checkpoint.RemoveCheckpoint(os.path.join(os.getcwd(), ".bench_sims_BPL"))
+
+    dStart = time.perf_counter()
+    archive.Archive(
+        str(pathBpl), iCores, True, False, False, False, storage=dictOptions
+    )
+    dWrite = time.perf_counter() - dStart
+
+    dStart = time.perf_counter()
+    with h5py.File(sArchive, "r") as hf:
+        sFirst = archive.flistSimulationGroups(hf)[0]
+        listKeys = [k for k in hf[sFirst].keys() if k.endswith(":forward")]
+        for k in listKeys:
+            archive.ExtractColumn(hf, k)
+    dRead = time.perf_counter() - dStart
+
+    return {
+        "write_s": dWrite,
+        "read_s": dRead,
+        "size_mb": os.path.getsize(sArchive) / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sims", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--cores", type=int, default=2)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    sCwd = os.getcwd()
+    pathDir = pathlib.Path(tempfile.mkdtemp())
+    dictResults = {}
+    try:
+        pathBpl = fnCreateSweep(pathDir, args.sims, args.steps)
+        os.chdir(pathDir)
+        for sLabel, dictOptions in STORAGE_CASES:
+            dictResults[sLabel] = fdictRunCase(pathBpl, args.cores, dictOptions)
+    finally:
+        os.chdir(sCwd)
+        shutil.rmtree(pathDir)
+
+    print("%-22s %10s %10s %10s" % ("storage", "write s", "read s", "MB"))
+    for sLabel, dictResult in dictResults.items():
+        print(
+            "%-22s %10.3f %10.3f %10.2f"
+            % (
+                sLabel,
+                dictResult["write_s"],
+                dictResult["read_s"],
+                dictResult["size_mb"],
+            )
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"sims": args.sims, "steps": args.steps,
+                 "results": dictResults},
+                f, indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
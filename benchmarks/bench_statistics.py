@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+Time the forward-data statistics on a synthetic column of series.
+
+Builds one RaggedColumn of random series and computes every statistic in
+SERIES_STATISTICS three ways:
+
+    lists      one simulation at a time on Python lists, with the
+               statistics module, min/max and scipy, as ExtractColumn
+               originally did
+    rows       one simulation at a time with NumPy and scipy
+    segments   every simulation at once, as ExtractColumn does now
+
+Results of the three are checked against each other before timing, and
+the speedup of segments over lists and over rows is reported. Series
+lengths vary around --steps, so the column is ragged like a real sweep.
+
+Run from the repository root:
+
+    python benchmarks/bench_statistics.py --sims 1000 --steps 1000
+"""
+
+import argparse
+import json
+import pathlib
+import statistics as st
+import sys
+import time
+import warnings
+
+import numpy as np
+from scipy import stats
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from bigplanet import extract
+
+# Per-simulation kernels on Python lists
+LIST_KERNELS = {
+    "mean": st.mean,
+    "stddev": st.stdev,
+    "min": min,
+    "max": max,
+    "mode": lambda listRow: stats.mode(listRow).mode,
+    "geomean": stats.gmean,
+}
+
+# Per-simulation kernels on NumPy arrays
+ROW_KERNELS = {
+    "mean": np.mean,
+    "stddev": lambda daRow: np.std(daRow, ddof=1),
+    "min": np.min,
+    "max": np.max,
+    "mode": lambda daRow: stats.mode(daRow).mode,
+    "geomean": stats.gmean,
+}
+
+
+def fcolCreateColumn(iSims, iSteps, iSeed):
+    """A RaggedColumn of positive series with repeated values."""
+    rng = np.random.default_rng(iSeed)
+    daLengths = rng.integers(iSteps // 2, iSteps * 3 // 2 + 1, iSims)
+    daOffsets = np.zeros(iSims + 1, dtype=np.int64)
+    np.cumsum(daLengths, out=daOffsets[1:])
+    # rounded so that the mode is meaningful
+    daValues = np.round(rng.lognormal(size=daOffsets[-1]), 2) + 0.01
+    return extract.RaggedColumn(daValues, daOffsets, daLengths[:, None])
+
+
+def fdTime(fnRun, iRepeat):
+    """Fastest of iRepeat runs, in seconds."""
+    listSeconds = []
+    for iRun in range(iRepeat):
+        dStart = time.perf_counter()
+        fnRun()
+        listSeconds.append(time.perf_counter() - dStart)
+    return min(listSeconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sims", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=1000,
+                        help="mean length of each series")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per kernel; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    column = fcolCreateColumn(args.sims, args.steps, args.seed)
+    listLists = [daRow.tolist() for daRow in column]
+    listResults = []
+    for sStatistic, fnSegments in extract.SERIES_STATISTICS.items():
+        fnList = LIST_KERNELS[sStatistic]
+        fnRow = ROW_KERNELS[sStatistic]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            daLists = np.array([fnList(listRow) for listRow in listLists])
+            daRows = np.array([fnRow(daRow) for daRow in column])
+        daSegments = fnSegments(column)
+        np.testing.assert_allclose(daSegments, daRows, rtol=1e-10)
+        np.testing.assert_allclose(daSegments, daLists, rtol=1e-10)
+
+        dictResult = {
+            "statistic": sStatistic,
+            "lists": fdTime(
+                lambda: [fnList(listRow) for listRow in listLists], args.repeat
+            ),
+            "rows": fdTime(
+                lambda: [fnRow(daRow) for daRow in column], args.repeat
+            ),
+            "segments": fdTime(lambda: fnSegments(column), args.repeat),
+        }
+        listResults.append(dictResult)
+
+    print("%d series, %d values" % (len(column), len(column.daValues)))
+    print("%-10s %10s %10s %10s %10s %10s" % (
+        "statistic", "lists s", "rows s", "segments s", "vs lists", "vs rows"
+    ))
+    for dictResult in listResults:
+        print("%-10s %10.4f %10.4f %10.4f %9.1fx %9.1fx" % (
+            dictResult["statistic"],
+            dictResult["lists"],
+            dictResult["rows"],
+            dictResult["segments"],
+            dictResult["lists"] / dictResult["segments"],
+            dictResult["rows"] / dictResult["segments"],
+        ))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"sims": args.sims, "steps": args.steps,
+                       "results": listResults}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
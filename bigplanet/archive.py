@@ -1,15 +1,109 @@
 #!/usr/bin/env python
 
+import collections
+import json
 import multiprocessing as mp
 import os
+import queue
+import shutil
 import subprocess as sub
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import h5py
+import numpy as np
+from .checkpoint import OpenCheckpoint, RemoveCheckpoint
 from .extract import *
 from .read import *
 from .process import *
 
 
-def Archive(bpInputFile, cores, quiet, force, ignorecorrupt, verbose):
+# Number of record batches each parser may have waiting for the writer before
+# it blocks. Keeps memory flat when parsing outpaces HDF5 writes.
+QUEUE_DEPTH_PER_PARSER = 2
+
+ARCHIVE_MODES = ("writer", "lock", "shard")
+
+# "groups" stores every dataset in its simulation's group; "ragged" moves
+# the series keys into one concatenated array per key under SERIES_GROUP.
+ARCHIVE_LAYOUTS = ("groups", "ragged")
+
+# Chunk sizes, in elements, for the concatenated series values and for the
+# per-simulation offsets, shapes and names that index them. The values of a
+# key are chunked to fit its first row, between SERIES_MIN_CHUNK and
+# SERIES_CHUNK, so the chunks of a small sweep are not mostly empty.
+SERIES_CHUNK = 16384
+SERIES_MIN_CHUNK = 256
+SERIES_INDEX_CHUNK = 1024
+
+# Rows of a series are moved this many values at a time when the rows of
+# deleted groups are removed from it.
+SERIES_COPY_BLOCK = 1024 * 1024
+
+# Largest number of dimensions a series dataset may have. Shapes are stored
+# as (ndim, dim_0, ..., dim_SERIES_MAX_NDIM-1).
+SERIES_MAX_NDIM = 4
+
+# Each worker records (claims, simulations, seconds) in a shared array so the
+# run summary can report how much time went to checkpoint claims.
+CLAIM_STATS_FIELDS = 3
+
+# Every simulation group records the size and modification time of each raw
+# file it was built from, so an update can tell which groups are stale.
+MANIFEST_ATTR = "Manifest"
+
+# Groups are written under this prefix and renamed once complete, so a
+# worker that dies mid-simulation never leaves a group that looks whole.
+PARTIAL_PREFIX = ".partial_"
+
+# Each worker reads the raw files of up to iPrefetchDepth upcoming simulations
+# on background threads while it parses the current one, holding at most
+# iPrefetchMB megabytes of them. A depth of 0 turns prefetching off.
+PREFETCH_DEFAULTS = {"iPrefetchDepth": 2, "iPrefetchMB": 256}
+
+# Besides its input and log files, a simulation's output files are the ones
+# with these extensions and everything in SEASONAL_FOLDER
+PREFETCH_SUFFIXES = (".forward", ".backward", ".Climate")
+SEASONAL_FOLDER = "SeasonalClimateFiles"
+
+# Statistics of each forward key stored with the archive when
+# saPrecomputeStats is given without a list
+PRECOMPUTE_DEFAULTS = ("min", "max", "mean", "stddev", "first", "last")
+
+
+def Archive(
+    bpInputFile,
+    cores,
+    quiet,
+    force,
+    ignorecorrupt,
+    verbose,
+    mode="writer",
+    merge=False,
+    update=False,
+    layout="groups",
+    storage=None,
+    prefetch=None,
+):
+    if mode not in ARCHIVE_MODES:
+        raise ValueError("Unknown archive mode: " + str(mode))
+    if layout not in ARCHIVE_LAYOUTS:
+        raise ValueError("Unknown archive layout: " + str(layout))
+    if layout == "ragged" and mode == "shard":
+        raise ValueError("The ragged layout needs the writer or lock mode")
+    bRagged = layout == "ragged"
+
+    # storage options from the command line take precedence over bpl.in
+    dictOptions = ReadStorageOptions(bpInputFile)
+    if storage:
+        dictOptions.update(storage)
+    dictStorage = fdictStorageOptions(dictOptions)
+    dictPrefetch = ReadPrefetchOptions(bpInputFile)
+    if prefetch:
+        dictPrefetch.update(prefetch)
+    dictPrefetch = fdictPrefetchOptions(dictPrefetch)
+    listStats = flistPrecomputeStats(ReadPrecomputeStats(bpInputFile))
 
     # Get the directory and list of  from the bpl file
     (
@@ -42,9 +136,27 @@ def Archive(bpInputFile, cores, quiet, force, ignorecorrupt, verbose):
     # creates the chepoint file name
     checkpoint_file = os.getcwd() + "/" + "." + dest_folder + "_BPL"
 
+    # now that we have everything we need
+    # we save the name of the Master HDF5 file
+    master_hdf5_file = os.path.abspath(bpl_file)
+
+    # simulations whose rows in the summary columns can be kept as they are
+    setKeep = None
+
     # Create the checkpoint file to be used to keep track of the groups
-    if os.path.isfile(checkpoint_file) == False:
-        CreateCP(checkpoint_file, bpInputFile, sim_list)
+    if update == True and os.path.isfile(master_hdf5_file):
+        listQueued = flistUpdateCP(
+            checkpoint_file, bpInputFile, quiet, sim_list, master_hdf5_file
+        )
+        setKeep = set(
+            sFolder.split("/")[-1] for sFolder in sim_list
+        ) - set(sFolder.split("/")[-1] for sFolder in listQueued)
+        if not listQueued:
+            fnBuildColumns(master_hdf5_file, setKeep)
+            return
+
+    elif os.path.isfile(checkpoint_file) == False:
+        CreateCP(checkpoint_file, bpInputFile, sim_list, backend="sqlite")
 
     # if it does exist, it checks for any 0's (sims that didn't complete) and
     # changes them to -1 to be re-ran
@@ -53,78 +165,180 @@ def Archive(bpInputFile, cores, quiet, force, ignorecorrupt, verbose):
             checkpoint_file, bpInputFile, quiet, sim_list, dest_folder, force
         )
 
-    # now that we have everything we need
-    # we save the name of the Master HDF5 file
-    master_hdf5_file = os.path.abspath(bpl_file)
-
     # creates the lock and workers for the parallel processes
     lock = mp.Lock()
-    workers = []
-
-    # for each core, create a process that adds a group to the hdf5 file and adds that to the Master HDF5 file
-    for i in range(cores):
-        workers.append(
-            mp.Process(
-                target=par_worker,
-                args=(
-                    checkpoint_file,
-                    system_name,
-                    body_list,
-                    log_file,
-                    infile_list,
-                    quiet,
-                    lock,
-                    vplanet_help,
-                    master_hdf5_file,
-                    verbose,
-                ),
-            )
+    claim_stats = mp.Array("d", CLAIM_STATS_FIELDS * cores, lock=False)
+
+    if mode == "writer":
+        fnRunSingleWriter(
+            cores,
+            checkpoint_file,
+            system_name,
+            body_list,
+            log_file,
+            infile_list,
+            quiet,
+            lock,
+            vplanet_help,
+            master_hdf5_file,
+            verbose,
+            claim_stats,
+            bRagged,
+            dictStorage,
+            dictPrefetch,
+            listStats,
         )
-    for w in workers:
-        w.start()
-    for w in workers:
-        w.join()
+    elif mode == "lock":
+        workers = []
+
+        # for each core, create a process that adds a group to the hdf5 file and adds that to the Master HDF5 file
+        for i in range(cores):
+            workers.append(
+                mp.Process(
+                    target=par_worker,
+                    args=(
+                        checkpoint_file,
+                        system_name,
+                        body_list,
+                        log_file,
+                        infile_list,
+                        quiet,
+                        lock,
+                        vplanet_help,
+                        master_hdf5_file,
+                        verbose,
+                        claim_stats,
+                        i,
+                        bRagged,
+                        dictStorage,
+                        dictPrefetch,
+                        listStats,
+                    ),
+                )
+            )
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    else:
+        shard_folder = fsShardFolder(master_hdf5_file)
+        os.makedirs(shard_folder, exist_ok=True)
+        workers = []
+        for i in range(cores):
+            workers.append(
+                mp.Process(
+                    target=par_shard_worker,
+                    args=(
+                        fsShardFile(shard_folder, i),
+                        checkpoint_file,
+                        system_name,
+                        body_list,
+                        log_file,
+                        infile_list,
+                        quiet,
+                        lock,
+                        vplanet_help,
+                        verbose,
+                        claim_stats,
+                        i,
+                        dictStorage,
+                        dictPrefetch,
+                        listStats,
+                    ),
+                )
+            )
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+
+        fnLinkShards(master_hdf5_file, shard_folder)
+        if merge:
+            if not quiet:
+                print("Merging shards into", master_hdf5_file, "...")
+            fnMergeShards(master_hdf5_file, shard_folder)
+
+    if listStats:
+        for k in flistUnsummarisedKeys(master_hdf5_file, listStats):
+            print(
+                "WARNING: Statistics of " + k + " are not stored for every "
+                "simulation (its forward file was streamed, or archived "
+                "without saPrecomputeStats); they will be computed when "
+                "extracted."
+            )
+
+    if not quiet:
+        print("Building summary columns...")
+    fnBuildColumns(master_hdf5_file, setKeep)
+
+    if not quiet:
+        fnPrintClaimSummary(claim_stats)
 
     print("Archive created with Fletcher32 checksums enabled for data integrity verification.")
+    if dictOptions.get("iScaleOffset") is not None:
+        print(
+            "WARNING: Data stored with the scale-offset filter have no "
+            "checksums."
+        )
+
 
+def CreateCP(checkpoint_file, input_file, sims, backend="text"):
+    """
+    Create a checkpoint with every simulation marked as not started.
+
+    Parameters
+    ----------
+    checkpoint_file : str
+        Path to checkpoint file
+    input_file : str
+        Name of the BigPlanet input file, recorded in the checkpoint
+    sims : list
+        Simulation folders
+    backend : str, optional
+        "text" for the original line-per-simulation file, or "sqlite" for
+        the indexed store used by Archive (default "text")
 
-def CreateCP(checkpoint_file, input_file, sims):
-    with open(checkpoint_file, "w") as cp:
-        cp.write("Vspace File: " + os.getcwd() + "/" + input_file + "\n")
-        cp.write("Total Number of Simulations: " + str(len(sims)) + "\n")
-        for f in range(len(sims)):
-            cp.write(sims[f] + " " + "-1 \n")
-        cp.write("THE END \n")
+    Returns
+    -------
+    None
+    """
+    with OpenCheckpoint(checkpoint_file, backend=backend) as cp:
+        cp.fnCreate(input_file, sims)
 
 
 def ReCreateCP(checkpoint_file, input_file, quiet, sims, folder_name, force):
 
-    datalist = []
-
-    with open(checkpoint_file, "r") as f:
-        for newline in f:
-            if newline:
-                datalist.append(newline.strip().split())
-                for l in datalist:
-                    if l[1] == "0":
-                        l[1] = "-1"
-                        folder = l[0]
-                        with h5py.File(folder_name + ".bpa", "a") as master:
-                            group_name = "/" + folder.split("/")[-1]
-                            if group_name in master:
-                                if quiet == False:
-                                    print(
-                                        "Deleting",
-                                        group_name,
-                                        "from BPL file...",
-                                    )
-                                del master[group_name]
-
-    with open(checkpoint_file, "w") as f:
-        for newline in datalist:
-            f.writelines(" ".join(newline) + "\n")
-
-    if all(l[1] == "1" for l in datalist[2:-2]) == True:
+    with OpenCheckpoint(checkpoint_file) as cp:
+        # simulations that were in progress when the last run stopped are
+        # queued again, and their partial groups removed from the archive
+        listReset = cp.flistResetInProgress()
+        if listReset:
+            with h5py.File(folder_name + ".bpa", "a") as master:
+                for folder in listReset:
+                    group_name = "/" + folder.split("/")[-1]
+                    if group_name in master:
+                        if quiet == False:
+                            print(
+                                "Deleting",
+                                group_name,
+                                "from BPL file...",
+                            )
+                        del master[group_name]
+                    # left by a writer that was killed mid-simulation
+                    partial_name = "/" + PARTIAL_PREFIX + group_name[1:]
+                    if partial_name in master:
+                        del master[partial_name]
+                if SERIES_GROUP in master:
+                    setReset = set(
+                        folder.split("/")[-1] for folder in listReset
+                    )
+                    for hSeries in master[SERIES_GROUP].values():
+                        fnCompactSeries(hSeries, setReset)
+
+        dictSummary = cp.fdictSummary()
+        sBackend = cp.sBackend
+
+    if dictSummary["remaining"] == 0:
         if quiet == False:
             print("All Groups in BPL file exist")
 
@@ -132,10 +346,12 @@ def ReCreateCP(checkpoint_file, input_file, quiet, sims, folder_name, force):
             if quiet == False:
                 print("Deleting BPL file...")
             os.remove(folder_name + ".bpa")
+            if os.path.isdir(fsShardFolder(folder_name + ".bpa")):
+                shutil.rmtree(fsShardFolder(folder_name + ".bpa"))
             if quiet == False:
                 print("Deleting checkpoint file...")
-            os.remove(checkpoint_file)
-            CreateCP(checkpoint_file, input_file, sims)
+            RemoveCheckpoint(checkpoint_file)
+            CreateCP(checkpoint_file, input_file, sims, backend=sBackend)
         else:
             exit()
 
@@ -144,12 +360,259 @@ def ReCreateCP(checkpoint_file, input_file, quiet, sims, folder_name, force):
             print("Continuing from Checkpoint...")
 
 
+def fsSimulationManifest(sFolder):
+    """
+    Describe the raw files of a simulation by size and modification time.
+
+    Parameters
+    ----------
+    sFolder : str
+        Path to simulation folder
+
+    Returns
+    -------
+    str
+        JSON object mapping each file path, relative to the folder, to its
+        [size, mtime in ns]. Keys are sorted so equal folders give equal
+        strings.
+    """
+    dictManifest = {}
+    for sRoot, listDirs, listFiles in os.walk(sFolder):
+        for sFile in listFiles:
+            sPath = os.path.join(sRoot, sFile)
+            stat = os.stat(sPath)
+            dictManifest[os.path.relpath(sPath, sFolder)] = [
+                stat.st_size,
+                stat.st_mtime_ns,
+            ]
+    return json.dumps(dictManifest, sort_keys=True)
+
+
+def flistStaleSimulations(sArchiveFile, listSims):
+    """
+    Find the simulations whose archive group is missing or out of date.
+
+    A group is out of date when its stored manifest differs from the
+    simulation folder on disk. Groups written before manifests were stored,
+    or left half written by an interrupted run, have no manifest and are
+    always out of date.
+
+    Parameters
+    ----------
+    sArchiveFile : str
+        Path to HDF5 archive file
+    listSims : list
+        Simulation folders
+
+    Returns
+    -------
+    tuple of list
+        (new, changed) simulation folders, in the order of listSims
+    """
+    listNew = []
+    listChanged = []
+    with h5py.File(sArchiveFile, "r") as hMaster:
+        for sFolder in listSims:
+            sGroupName = "/" + sFolder.split("/")[-1]
+            if sGroupName not in hMaster:
+                listNew.append(sFolder)
+            elif hMaster[sGroupName].attrs.get(
+                MANIFEST_ATTR
+            ) != fsSimulationManifest(sFolder):
+                listChanged.append(sFolder)
+    return listNew, listChanged
+
+
+def fnDeleteArchiveGroups(sArchiveFile, listNames):
+    """
+    Delete simulation groups from an archive, including sharded ones.
+
+    A group mounted from a shard is deleted from its shard as well as
+    unlinked from the root, so the rebuilt group is the only copy. In the
+    ragged layout, the groups' rows are removed from every series key with
+    fnCompactSeries.
+
+    Parameters
+    ----------
+    sArchiveFile : str
+        Path to the root HDF5 archive file
+    listNames : list
+        Group names, without a leading /
+
+    Returns
+    -------
+    None
+    """
+    sRootDir = os.path.dirname(os.path.abspath(sArchiveFile))
+    with h5py.File(sArchiveFile, "a") as hMaster:
+        for sName in listNames:
+            link = hMaster.get(sName, getlink=True)
+            if isinstance(link, h5py.ExternalLink):
+                with h5py.File(
+                    os.path.join(sRootDir, link.filename), "a"
+                ) as hShard:
+                    if link.path in hShard:
+                        del hShard[link.path]
+            if link is not None:
+                del hMaster[sName]
+        if SERIES_GROUP in hMaster:
+            for hSeries in hMaster[SERIES_GROUP].values():
+                fnCompactSeries(hSeries, set(listNames))
+
+
+def flistUpdateCP(checkpoint_file, input_file, quiet, sims, archive_file):
+    """
+    Prepare an incremental update of an existing archive.
+
+    Compares every simulation folder with its group in the archive, deletes
+    the groups whose raw files changed, and writes a new checkpoint that
+    holds only the new and changed simulations.
+
+    Parameters
+    ----------
+    checkpoint_file : str
+        Path to checkpoint file
+    input_file : str
+        Name of the BigPlanet input file
+    quiet : bool
+        Quiet mode flag
+    sims : list
+        Simulation folders
+    archive_file : str
+        Path to HDF5 archive file
+
+    Returns
+    -------
+    list
+        Simulation folders queued in the new checkpoint, empty if the
+        archive is already up to date
+    """
+    listNew, listChanged = flistStaleSimulations(archive_file, sims)
+    if quiet == False:
+        print(
+            "Update:",
+            len(listNew),
+            "new,",
+            len(listChanged),
+            "changed,",
+            len(sims) - len(listNew) - len(listChanged),
+            "unchanged simulations",
+        )
+
+    fnDeleteArchiveGroups(
+        archive_file, [sFolder.split("/")[-1] for sFolder in listChanged]
+    )
+
+    RemoveCheckpoint(checkpoint_file)
+    if not listNew and not listChanged:
+        if quiet == False:
+            print("Archive is up to date")
+        return []
+
+    setStale = set(listNew + listChanged)
+    listQueued = [sFolder for sFolder in sims if sFolder in setStale]
+    CreateCP(checkpoint_file, input_file, listQueued, backend="sqlite")
+    return listQueued
+
+
+def fnBuildColumns(sArchiveFile, setKeep=None):
+    """
+    Write the consolidated scalar columns of an archive.
+
+    Every initial, final and option value, and every statistic stored by
+    saPrecomputeStats, that every simulation group holds as a single
+    number is copied into one float64 dataset per key under
+    COLUMNS_GROUP, with the group names in COLUMNS_INDEX, so a column can be
+    read with a single HDF5 read. Keys that are missing from any group or do
+    not parse as a number are left out and read group by group as before.
+
+    Parameters
+    ----------
+    sArchiveFile : str
+        Path to HDF5 archive file
+    setKeep : set of str, optional
+        Simulation groups that have not changed since the columns were last
+        built. Their rows are copied from the existing columns instead of
+        being read from the groups again.
+
+    Returns
+    -------
+    None
+    """
+    with h5py.File(sArchiveFile, "a", libver=ARCHIVE_LIBVER) as hMaster:
+        listSims = flistSimulationGroups(hMaster)
+        if not listSims:
+            return
+
+        # rows of the existing columns that are still valid
+        dictOld = {}
+        dictOldRow = {}
+        if COLUMNS_GROUP in hMaster:
+            hOld = hMaster[COLUMNS_GROUP]
+            if setKeep and COLUMNS_INDEX in hOld:
+                for i, sName in enumerate(hOld[COLUMNS_INDEX].asstr()[()]):
+                    if sName in setKeep:
+                        dictOldRow[sName] = i
+                for k in hOld.keys():
+                    if k != COLUMNS_INDEX:
+                        dictOld[k] = hOld[k][()]
+            del hMaster[COLUMNS_GROUP]
+
+        hFirst = hMaster[listSims[0]]
+        dictUnits = {}
+        for k in hFirst.keys():
+            if (
+                k.rpartition(":")[-1] in SCALAR_AGGREGATIONS
+                and hFirst[k].shape == (1,)
+            ):
+                dictUnits[k] = hFirst[k].attrs.get("Units", "")
+        for k, daStat in fdictReadSummary(hFirst).items():
+            if daStat.shape == (1,):
+                dictUnits[k] = fsReadUnits(hMaster, k) or ""
+        dictColumns = {k: np.empty(len(listSims)) for k in dictUnits}
+
+        for j, sName in enumerate(listSims):
+            iOld = dictOldRow.get(sName)
+            hSim = hMaster[sName]
+            dictSummary = None
+            for k in list(dictColumns):
+                if iOld is not None and k in dictOld:
+                    dictColumns[k][j] = dictOld[k][iOld]
+                    continue
+                if k.rpartition(":")[-1] in SERIES_STATISTICS:
+                    if dictSummary is None:
+                        dictSummary = fdictReadSummary(hSim)
+                    if k in dictSummary and dictSummary[k].shape == (1,):
+                        dictColumns[k][j] = dictSummary[k][0]
+                    else:
+                        del dictColumns[k]
+                    continue
+                dataset = hSim.get(k)
+                if dataset is not None and dataset.shape == (1,):
+                    try:
+                        dictColumns[k][j] = float(dataset[0])
+                        continue
+                    except (TypeError, ValueError):
+                        pass
+                del dictColumns[k]
+
+        hColumns = hMaster.create_group(COLUMNS_GROUP)
+        hColumns.create_dataset(
+            COLUMNS_INDEX, data=np.array(listSims, dtype="S")
+        )
+        for k, daColumn in dictColumns.items():
+            hColumns.create_dataset(k, data=daColumn, fletcher32=True)
+            hColumns[k].attrs["Units"] = dictUnits[k]
+
+
 def fnGetNextSimulation(sCheckpointFile, lockFile):
     """
     Find and mark the next simulation to process from checkpoint file.
 
-    Thread-safe with file locking. Reads checkpoint, finds first simulation
-    with status -1, marks it as 0 (in-progress), and returns the folder path.
+    Thread-safe with file locking. Claims the first simulation with status
+    -1, marks it as 0 (in-progress), and returns the folder path. Workers
+    that claim many simulations should open the checkpoint once with
+    OpenCheckpoint instead.
 
     Parameters
     ----------
@@ -163,30 +626,8 @@ def fnGetNextSimulation(sCheckpointFile, lockFile):
     str or None
         Absolute path to simulation folder, or None if all done
     """
-    lockFile.acquire()
-    listData = []
-
-    with open(sCheckpointFile, "r") as f:
-        for sLine in f:
-            listData.append(sLine.strip().split())
-
-    sFolder = ""
-    for listLine in listData:
-        if listLine[1] == "-1":
-            sFolder = listLine[0]
-            listLine[1] = "0"
-            break
-
-    if not sFolder:
-        lockFile.release()
-        return None
-
-    with open(sCheckpointFile, "w") as f:
-        for listLine in listData:
-            f.writelines(" ".join(listLine) + "\n")
-
-    lockFile.release()
-    return os.path.abspath(sFolder)
+    with OpenCheckpoint(sCheckpointFile, lockFile) as cp:
+        return cp.fsClaimNext()
 
 
 def fnMarkSimulationComplete(sCheckpointFile, sFolder, lockFile):
@@ -208,23 +649,292 @@ def fnMarkSimulationComplete(sCheckpointFile, sFolder, lockFile):
     -------
     None
     """
-    lockFile.acquire()
-    listData = []
+    with OpenCheckpoint(sCheckpointFile, lockFile) as cp:
+        cp.fnMarkComplete(sFolder)
+
+
+def fiterClaimSimulations(cp, arrClaimStats=None, iWorker=0):
+    """
+    Yield simulation folders claimed from the checkpoint in batches.
 
-    with open(sCheckpointFile, "r") as f:
-        for sLine in f:
-            listData.append(sLine.strip().split())
+    Batch sizes come from checkpoint.fiClaimBatchSize, so early claims take
+    many simulations per round trip and the last ones take a single one.
+    The time spent in each claim is added to this worker's claim stats.
+
+    Parameters
+    ----------
+    cp : TextCheckpoint or SQLiteCheckpoint
+        Open checkpoint store
+    arrClaimStats : multiprocessing.Array, optional
+        Shared claim statistics, CLAIM_STATS_FIELDS entries per worker. Its
+        length also gives the number of workers sharing the checkpoint.
+    iWorker : int, optional
+        This worker's slot in arrClaimStats
+
+    Yields
+    ------
+    str
+        Absolute path to a claimed simulation folder
+    """
+    iWorkers = 1
+    if arrClaimStats is not None:
+        iWorkers = len(arrClaimStats) // CLAIM_STATS_FIELDS
+    iSlot = CLAIM_STATS_FIELDS * iWorker
 
-    for listLine in listData:
-        if listLine[0] == sFolder:
-            listLine[1] = "1"
-            break
+    while True:
+        dStart = time.perf_counter()
+        listFolders = cp.flistClaimBatch(iWorkers)
+        if arrClaimStats is not None:
+            arrClaimStats[iSlot] += 1
+            arrClaimStats[iSlot + 1] += len(listFolders)
+            arrClaimStats[iSlot + 2] += time.perf_counter() - dStart
+        if not listFolders:
+            return  # All done
+        for sFolder in listFolders:
+            yield sFolder
 
-    with open(sCheckpointFile, "w") as f:
-        for listLine in listData:
-            f.writelines(" ".join(listLine) + "\n")
 
-    lockFile.release()
+def fnPrintClaimSummary(arrClaimStats):
+    """
+    Print how many checkpoint round trips the workers needed.
+
+    Parameters
+    ----------
+    arrClaimStats : multiprocessing.Array
+        Shared claim statistics, CLAIM_STATS_FIELDS entries per worker
+
+    Returns
+    -------
+    None
+    """
+    iClaims = int(sum(arrClaimStats[0::CLAIM_STATS_FIELDS]))
+    iSims = int(sum(arrClaimStats[1::CLAIM_STATS_FIELDS]))
+    dSeconds = sum(arrClaimStats[2::CLAIM_STATS_FIELDS])
+    if iSims == 0:
+        return
+    print(
+        "Claimed %d simulations in %d checkpoint round trips "
+        "(%.3f s total, %.2f ms per simulation)"
+        % (iSims, iClaims, dSeconds, 1000 * dSeconds / iSims)
+    )
+
+
+def fdictPrefetchOptions(dictOptions=None):
+    """
+    Build the prefetch settings of an archive build.
+
+    Parameters
+    ----------
+    dictOptions : dict, optional
+        Any of iPrefetchDepth (simulations read ahead by each worker) and
+        iPrefetchMB (megabytes each worker may hold). They replace the
+        PREFETCH_DEFAULTS.
+
+    Returns
+    -------
+    dict
+        Settings for SimulationPrefetcher
+    """
+    dictPrefetch = dict(PREFETCH_DEFAULTS)
+    for sOption, iValue in (dictOptions or {}).items():
+        if sOption not in PREFETCH_DEFAULTS:
+            raise ValueError("Unknown prefetch option: " + str(sOption))
+        if iValue < 0:
+            raise ValueError(sOption + " must not be negative")
+        dictPrefetch[sOption] = iValue
+    return dictPrefetch
+
+
+def flistPrecomputeStats(listStats=None):
+    """
+    Build the list of statistics to store for each forward key.
+
+    Parameters
+    ----------
+    listStats : list of str, optional
+        Statistics from saPrecomputeStats, as from ReadPrecomputeStats.
+        None stores none, and an empty list the PRECOMPUTE_DEFAULTS.
+
+    Returns
+    -------
+    list of str
+        Names of statistics in SERIES_STATISTICS
+    """
+    if listStats is None:
+        return []
+    if not listStats:
+        return list(PRECOMPUTE_DEFAULTS)
+    for sStat in listStats:
+        if sStat not in SERIES_STATISTICS:
+            raise ValueError(
+                "Unknown statistic in saPrecomputeStats: " + sStat
+            )
+    return list(dict.fromkeys(listStats))
+
+
+def flistUnsummarisedKeys(sArchiveFile, listStats):
+    """
+    List the forward keys whose statistics some simulation does not store.
+
+    fiterSummaryRecords skips the columns of streamed files, and groups
+    archived before saPrecomputeStats was set have no statistics at all.
+
+    Parameters
+    ----------
+    sArchiveFile : str
+        Path to the archive
+    listStats : list of str
+        Statistics from flistPrecomputeStats
+
+    Returns
+    -------
+    list of str
+        Forward keys, sorted
+    """
+    setMissing = set()
+    with h5py.File(sArchiveFile, "r") as hMaster:
+        dictSeriesNames = {}
+        if SERIES_GROUP in hMaster:
+            for k, hSeries in hMaster[SERIES_GROUP].items():
+                if k.endswith(":forward"):
+                    listNames = hSeries["names"].asstr()[()]
+                    daLengths = np.diff(
+                        hSeries["offsets"][:len(listNames) + 1]
+                    )
+                    dictSeriesNames[k] = {
+                        sName for sName, iLength in zip(listNames, daLengths)
+                        if iLength
+                    }
+        for sName in flistSimulationGroups(hMaster):
+            hSim = hMaster[sName]
+            # keys the log lists without a forward file to read are empty
+            listForward = [
+                k for k in hSim.keys()
+                if k.endswith(":forward") and hSim[k].size
+            ]
+            listForward += [
+                k for k, setNames in dictSeriesNames.items()
+                if sName in setNames
+            ]
+            dictSummary = fdictReadSummary(hSim)
+            for k in listForward:
+                sPrefix = k.rpartition(":")[0] + ":"
+                if any(sPrefix + sStat not in dictSummary
+                       for sStat in listStats):
+                    setMissing.add(k)
+    return sorted(setMissing)
+
+
+class SimulationPrefetcher:
+    """
+    Read the raw files of upcoming simulations on background threads.
+
+    Iterating gives (folder, buffers) for each folder of iterFolders, in
+    order, where buffers holds the contents of the folder's input, log and
+    output files for the parsers' buffers argument. While the caller works
+    on one folder, the files of up to iPrefetchDepth more are read. Files
+    that would take the bytes held past iPrefetchMB, and files large enough
+    to be streamed, are left for the parsers to read from disk.
+
+    Parameters
+    ----------
+    iterFolders : iterable of str
+        Simulation folders, such as from fiterClaimSimulations
+    listNames : list of str
+        Input and log file names of every simulation
+    dictPrefetch : dict, optional
+        Settings from fdictPrefetchOptions
+    """
+
+    def __init__(self, iterFolders, listNames, dictPrefetch=None):
+        dictPrefetch = fdictPrefetchOptions(dictPrefetch)
+        self.iterFolders = iterFolders
+        self.setNames = set(listNames)
+        self.iDepth = dictPrefetch["iPrefetchDepth"]
+        self.iBudget = dictPrefetch["iPrefetchMB"] * 1024 ** 2
+        self.iHeld = 0
+        self.lock = threading.Lock()
+
+    def __iter__(self):
+        if self.iDepth == 0:
+            for sFolder in self.iterFolders:
+                yield sFolder, None
+            return
+
+        iterFolders = iter(self.iterFolders)
+        dequePending = collections.deque()
+        pool = ThreadPoolExecutor(max_workers=self.iDepth)
+        try:
+            while True:
+                # the current folder and iDepth more are always in flight
+                while len(dequePending) <= self.iDepth:
+                    sFolder = next(iterFolders, None)
+                    if sFolder is None:
+                        break
+                    dequePending.append(
+                        (sFolder, pool.submit(self.fdictReadFolder, sFolder))
+                    )
+                if not dequePending:
+                    return
+                sFolder, future = dequePending.popleft()
+                buffers = future.result()
+                try:
+                    yield sFolder, buffers
+                finally:
+                    self.fnRelease(sum(len(b) for b in buffers.values()))
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def flistFolderFiles(self, sFolder):
+        """Return the directory entries of a simulation's files."""
+        listEntries = [
+            entry for entry in os.scandir(sFolder)
+            if entry.is_file() and (
+                entry.name in self.setNames
+                or entry.name.endswith(PREFETCH_SUFFIXES)
+            )
+        ]
+        sSeasonal = os.path.join(sFolder, SEASONAL_FOLDER)
+        if os.path.isdir(sSeasonal):
+            listEntries += [
+                entry for entry in os.scandir(sSeasonal) if entry.is_file()
+            ]
+        return listEntries
+
+    def fdictReadFolder(self, sFolder):
+        """Read a simulation's files, within the memory budget."""
+        buffers = {}
+        try:
+            listEntries = self.flistFolderFiles(sFolder)
+        except OSError:
+            # the parsers report the missing folder
+            return buffers
+        for entry in listEntries:
+            try:
+                iSize = entry.stat().st_size
+                if iSize >= STREAM_MIN_BYTES or not self.fbReserve(iSize):
+                    continue
+                with open(entry.path, "rb") as f:
+                    byContents = f.read()
+            except OSError:
+                continue
+            # the file may have changed size since it was listed
+            self.fnRelease(iSize - len(byContents))
+            buffers[os.path.normpath(entry.path)] = byContents
+        return buffers
+
+    def fbReserve(self, iBytes):
+        """Count iBytes against the budget, or return False if over it."""
+        with self.lock:
+            if self.iHeld + iBytes > self.iBudget:
+                return False
+            self.iHeld += iBytes
+            return True
+
+    def fnRelease(self, iBytes):
+        """Return iBytes to the budget."""
+        with self.lock:
+            self.iHeld -= iBytes
 
 
 def fbCheckGroupExists(hMaster, sGroupName):
@@ -286,8 +996,85 @@ def fnProcessSimulationData(sFolder, sSystemName, listBodies, sLogFile,
     )
 
 
+def fiterSimulationRecords(sFolder, sSystemName, listBodies, sLogFile,
+                           listInfiles, dictVplanetHelp, bVerbose,
+                           buffers=None, listStats=None):
+    """
+    Yield a simulation's data one output file at a time.
+
+    Takes the same parameters as fnProcessSimulationData, but holds no more
+    than one output file in memory. buffers holds the contents of files
+    already read by a SimulationPrefetcher, and listStats the statistics
+    from flistPrecomputeStats to add for each forward key.
+
+    Yields
+    ------
+    tuple
+        (key, units, values) records, as from fiterGatherData
+    """
+    iterRecords = fiterGatherData(
+        sSystemName,
+        listBodies,
+        sLogFile,
+        listInfiles,
+        dictVplanetHelp,
+        sFolder,
+        bVerbose,
+        buffers,
+    )
+    if listStats:
+        return fiterSummaryRecords(iterRecords, listStats)
+    return iterRecords
+
+
+def fiterSummaryRecords(iterRecords, listStats):
+    """
+    Add records of statistics of each forward key to a simulation's records.
+
+    The statistics are computed from each forward record as it passes,
+    while its values are in memory, with the same kernels ExtractColumn
+    uses, so reading them back gives what computing them would. Columns of
+    files large enough to be streamed are not in memory and get none.
+
+    Parameters
+    ----------
+    iterRecords : iterable
+        (key, units, values) records, as from fiterGatherData
+    listStats : list of str
+        Names of statistics in SERIES_STATISTICS
+
+    Yields
+    ------
+    tuple
+        Every record of iterRecords, each forward record followed by one
+        record per statistic, keyed body:variable:statistic, with a value
+        per row of the forward record
+    """
+    for k, units, values in iterRecords:
+        yield k, units, values
+        # keys the log lists without a forward file to read have no values
+        if not k.endswith(":forward") or not values or not all(
+            isinstance(value, np.ndarray) for value in values
+        ):
+            continue
+        listRows = [np.ravel(value).astype(np.float64) for value in values]
+        daLengths = np.array([len(daRow) for daRow in listRows], dtype=int)
+        daOffsets = np.zeros(len(listRows) + 1, dtype=np.int64)
+        np.cumsum(daLengths, out=daOffsets[1:])
+        column = RaggedColumn(
+            np.concatenate(listRows),
+            daOffsets,
+            daLengths[:, np.newaxis],
+        )
+        sPrefix = k.rpartition(":")[0] + ":"
+        for sStat in listStats:
+            daStat = SERIES_STATISTICS[sStat](column)
+            yield sPrefix + sStat, units, list(daStat)
+
+
 def fnWriteSimulationToArchive(hMaster, dictData, sGroupName,
-                              dictVplanetHelp, bVerbose):
+                              dictVplanetHelp, bVerbose, sManifest=None,
+                              bRagged=False, dictStorage=None):
     """
     Write simulation data dictionary to HDF5 archive.
 
@@ -295,27 +1082,475 @@ def fnWriteSimulationToArchive(hMaster, dictData, sGroupName,
     ----------
     hMaster : h5py.File
         Opened HDF5 file handle
-    dictData : dict
-        Data dictionary to write
+    dictData : dict or iterable
+        Data dictionary to write, or (key, units, values) records as from
+        fiterSimulationRecords, which are written batch by batch
     sGroupName : str
         Group name (with leading /)
     dictVplanetHelp : dict
         VPLanet help dictionary
     bVerbose : bool
         Verbose output flag
+    sManifest : str, optional
+        Manifest from fsSimulationManifest, stored on the group once all
+        of its data is written
+    bRagged : bool, optional
+        Append the series keys to the ragged layout instead of writing them
+        into the group (default False)
+    dictStorage : dict, optional
+        Chunking and compression settings from fdictStorageOptions
 
     Returns
     -------
     None
     """
-    DictToBP(
-        dictData,
-        dictVplanetHelp,
-        hMaster,
-        bVerbose,
-        sGroupName,
-        archive=True,
+    writer = SimulationWriter(
+        hMaster, sGroupName, dictVplanetHelp, bVerbose, sManifest, bRagged,
+        dictStorage,
     )
+    try:
+        if isinstance(dictData, dict):
+            writer.fnWrite(dictData)
+        else:
+            for dictBatch in fiterRecordBatches(dictData):
+                writer.fnWrite(dictBatch)
+    except BaseException:
+        writer.fnDiscard()
+        raise
+    writer.fnClose()
+
+
+class SimulationWriter:
+    """
+    Write one simulation into an archive as its data arrives.
+
+    Batches are written as they are passed to fnWrite, into a group named
+    with PARTIAL_PREFIX that fnClose renames once the simulation is
+    complete, and fnDiscard deletes if it never is. With the ragged layout
+    the series go straight to the concatenated arrays and the other keys
+    are held until fnClose. Series that arrive as StreamedBlock batches
+    are written into the group, since other simulations' rows may be
+    appended between their blocks, and moved into the concatenated array
+    with fnMoveToSeries once their last block is in. Statistics from fiterSummaryRecords are held
+    until fnClose too, and stored as the group's SUMMARY_KEYS_ATTR,
+    SUMMARY_ROWS_ATTR and SUMMARY_ATTR attributes rather than as datasets,
+    which cost far more to create than their few values are worth.
+
+    Parameters
+    ----------
+    hMaster : h5py.File
+        Opened HDF5 file handle
+    sGroupName : str
+        Group name (with leading /)
+    dictVplanetHelp : dict
+        VPLanet help dictionary
+    bVerbose : bool
+        Verbose output flag
+    sManifest : str, optional
+        Manifest from fsSimulationManifest, stored on the group by fnClose
+    bRagged : bool, optional
+        Append the series keys to the ragged layout (default False)
+    dictStorage : dict, optional
+        Chunking and compression settings from fdictStorageOptions
+    """
+
+    def __init__(self, hMaster, sGroupName, dictVplanetHelp, bVerbose,
+                 sManifest=None, bRagged=False, dictStorage=None):
+        self.hMaster = hMaster
+        self.sGroupName = sGroupName
+        self.sPartialName = "/" + PARTIAL_PREFIX + sGroupName.strip("/")
+        self.dictVplanetHelp = dictVplanetHelp
+        self.bVerbose = bVerbose
+        self.sManifest = sManifest
+        self.bRagged = bRagged
+        self.dictStorage = dictStorage
+        self.dictHeld = {}
+        self.dictSummary = {}
+
+    def fnWrite(self, dictBatch):
+        """Write one data dictionary batch of the simulation."""
+        if any(k.rpartition(":")[-1] in SERIES_STATISTICS for k in dictBatch):
+            dictData = {}
+            for k, v in dictBatch.items():
+                if k.rpartition(":")[-1] in SERIES_STATISTICS:
+                    self.dictSummary[k] = v
+                else:
+                    dictData[k] = v
+            dictBatch = dictData
+        if self.bRagged:
+            dictSeries = {}
+            dictBlocks = {}
+            for k, v in dictBatch.items():
+                if fbIsStreamedBlock(v):
+                    dictBlocks[k] = v
+                elif fbIsSeriesKey(k):
+                    dictSeries[k] = v
+                else:
+                    self.dictHeld[k] = v
+            if dictBlocks:
+                self.fnWriteGroup(dictBlocks)
+                for k, v in dictBlocks.items():
+                    if v[1].bLast:
+                        fnMoveToSeries(
+                            self.hMaster, self.sGroupName.strip("/"),
+                            self.sPartialName + "/" + k, k,
+                            self.dictStorage,
+                        )
+            if dictSeries:
+                fnAppendSeries(
+                    self.hMaster, self.sGroupName.strip("/"), dictSeries,
+                    self.dictStorage,
+                )
+            return
+        self.fnWriteGroup(dictBatch)
+
+    def fnWriteGroup(self, dictBatch):
+        """Write a data dictionary into the simulation's group."""
+        DictToBP(
+            dictBatch,
+            self.dictVplanetHelp,
+            self.hMaster,
+            self.bVerbose,
+            self.sPartialName,
+            archive=True,
+            storage=self.dictStorage,
+        )
+
+    def fnClose(self):
+        """Write the held keys and the manifest once every batch is in."""
+        self.hMaster.require_group(self.sPartialName)
+        if self.dictHeld:
+            self.fnWriteGroup(self.dictHeld)
+            self.dictHeld = {}
+        if self.dictSummary:
+            # each statistic has a value per row of its forward dataset
+            hGroup = self.hMaster[self.sPartialName]
+            hGroup.attrs[SUMMARY_KEYS_ATTR] = np.array(
+                list(self.dictSummary), dtype=h5py.string_dtype()
+            )
+            hGroup.attrs[SUMMARY_ROWS_ATTR] = np.array(
+                [len(v) - 1 for v in self.dictSummary.values()],
+                dtype=np.int64,
+            )
+            hGroup.attrs[SUMMARY_ATTR] = np.array(
+                [value for v in self.dictSummary.values() for value in v[1:]],
+                dtype=np.float64,
+            )
+            self.dictSummary = {}
+        if self.sManifest is not None:
+            self.hMaster[self.sPartialName].attrs[MANIFEST_ATTR] = \
+                self.sManifest
+        if self.sGroupName in self.hMaster:
+            del self.hMaster[self.sGroupName]
+        self.hMaster.move(self.sPartialName, self.sGroupName)
+
+    def fnDiscard(self):
+        """Delete whatever was written of a simulation that never closed."""
+        if self.sPartialName in self.hMaster:
+            del self.hMaster[self.sPartialName]
+        if self.bRagged and SERIES_GROUP in self.hMaster:
+            for hSeries in self.hMaster[SERIES_GROUP].values():
+                fnCompactSeries(hSeries, {self.sGroupName.strip("/")})
+        self.dictHeld = {}
+        self.dictSummary = {}
+
+
+def fnAppendSeries(hMaster, sName, dictSeries, dictStorage=None):
+    """
+    Append one simulation's series to the ragged layout.
+
+    Each key under SERIES_GROUP holds a 1-D "values" array with every
+    simulation's data end to end, "offsets" into it (one more entry than
+    there are rows), the "shapes" to restore, and the simulation "names".
+    A row only counts once its name is written, so a row cut short by a
+    crash is overwritten by the next append.
+
+    Parameters
+    ----------
+    hMaster : h5py.File
+        Opened HDF5 file handle
+    sName : str
+        Simulation group name, without a leading /
+    dictSeries : dict
+        Series keys of the simulation's data dictionary, as [units, rows...]
+    dictStorage : dict, optional
+        Compression settings from fdictStorageOptions for the values
+
+    Returns
+    -------
+    None
+    """
+    hSeriesRoot = hMaster.require_group(SERIES_GROUP)
+    # columns of large output files are copied after the other keys
+    dictStreams = fdictGroupStreams(dictSeries.items())
+    for k, v in dictSeries.items():
+        if fsStreamPath(v) in dictStreams:
+            continue
+        daValue = np.asarray(fdaStackRows(v[1:]), dtype=np.float64)
+        if daValue.ndim > SERIES_MAX_NDIM:
+            raise ValueError(
+                "Series " + k + " has more than "
+                + str(SERIES_MAX_NDIM) + " dimensions"
+            )
+
+        hSeries = fhRequireSeries(
+            hSeriesRoot, k, v[0], dictStorage, daValue.size
+        )
+        iStart = fiSeriesEnd(hSeries)
+        iEnd = iStart + daValue.size
+
+        fnGrowSeries(hSeries, iEnd)
+        hSeries["values"][iStart:iEnd] = daValue.ravel()
+        fnCloseSeriesRow(hSeries, sName, iEnd, daValue.shape)
+
+    for listColumns in dictStreams.values():
+        listSeries = []
+        for k, v in listColumns:
+            hSeries = fhRequireSeries(
+                hSeriesRoot, k, v[0], dictStorage, v[1].fiEstimateRows()
+            )
+            listSeries.append((hSeries, fiSeriesEnd(hSeries), v[1].iColumn))
+
+        iRows = 0
+        for daBlock in listColumns[0][1][1].fiterBlocks():
+            iNext = iRows + daBlock.shape[0]
+            for hSeries, iStart, iColumn in listSeries:
+                fnGrowSeries(hSeries, iStart + iNext)
+                hSeries["values"][iStart + iRows:iStart + iNext] = \
+                    daBlock[:, iColumn]
+            iRows = iNext
+
+        for hSeries, iStart, iColumn in listSeries:
+            fnCloseSeriesRow(hSeries, sName, iStart + iRows, (1, iRows))
+
+
+def fnMoveToSeries(hMaster, sName, sDataset, k, dictStorage=None):
+    """
+    Move a streamed (1, rows) dataset into the ragged layout.
+
+    The values are copied SERIES_COPY_BLOCK at a time, so the column is
+    never held in memory whole, and the dataset is then deleted.
+
+    Parameters
+    ----------
+    hMaster : h5py.File
+        Opened HDF5 file handle
+    sName : str
+        Simulation group name, without a leading /
+    sDataset : str
+        Path of the dataset
+    k : str
+        Series key
+    dictStorage : dict, optional
+        Compression settings from fdictStorageOptions for the values
+
+    Returns
+    -------
+    None
+    """
+    hDataset = hMaster[sDataset]
+    iRows = hDataset.shape[1]
+    hSeries = fhRequireSeries(
+        hMaster.require_group(SERIES_GROUP), k, hDataset.attrs["Units"],
+        dictStorage, iRows,
+    )
+    iStart = fiSeriesEnd(hSeries)
+    fnGrowSeries(hSeries, iStart + iRows)
+    for iFrom in range(0, iRows, SERIES_COPY_BLOCK):
+        iTo = min(iFrom + SERIES_COPY_BLOCK, iRows)
+        hSeries["values"][iStart + iFrom:iStart + iTo] = \
+            hDataset[0, iFrom:iTo]
+    fnCloseSeriesRow(hSeries, sName, iStart + iRows, (1, iRows))
+    del hMaster[sDataset]
+
+
+def fhRequireSeries(hSeriesRoot, k, sUnits, dictStorage=None,
+                    iRowSize=None):
+    """
+    Return the ragged layout group of a series key, creating it if needed.
+
+    Parameters
+    ----------
+    hSeriesRoot : h5py.Group
+        The SERIES_GROUP group
+    k : str
+        Series key
+    sUnits : str
+        Units, stored on a new group
+    dictStorage : dict, optional
+        Compression settings from fdictStorageOptions for the values
+    iRowSize : int, optional
+        Number of values in the first row, from which a new key's chunks
+        are sized (default SERIES_CHUNK values per chunk)
+
+    Returns
+    -------
+    h5py.Group
+        The key's group
+    """
+    if k in hSeriesRoot:
+        return hSeriesRoot[k]
+
+    dictFilters = {}
+    if dictStorage is not None:
+        dictFilters = fdictFilterOptions(dictStorage[fsStorageKind(k)])
+    hSeries = hSeriesRoot.create_group(k)
+    hSeries.create_dataset(
+        "values", shape=(0,), maxshape=(None,), dtype=np.float64,
+        chunks=(fiSeriesChunk(iRowSize),),
+        fletcher32="scaleoffset" not in dictFilters, **dictFilters
+    )
+    # the index is compressed, so its partly filled chunks take little room
+    hSeries.create_dataset(
+        "offsets", data=np.zeros(1, dtype=np.int64),
+        maxshape=(None,), chunks=(SERIES_INDEX_CHUNK,), compression="gzip",
+    )
+    hSeries.create_dataset(
+        "shapes", shape=(0, SERIES_MAX_NDIM + 1),
+        maxshape=(None, SERIES_MAX_NDIM + 1), dtype=np.int64,
+        chunks=(SERIES_INDEX_CHUNK, SERIES_MAX_NDIM + 1), compression="gzip",
+    )
+    hSeries.create_dataset(
+        "names", shape=(0,), maxshape=(None,),
+        dtype=h5py.string_dtype(), chunks=(SERIES_INDEX_CHUNK,),
+        compression="gzip",
+    )
+    hSeries.attrs["Units"] = sUnits
+    return hSeries
+
+
+def fiSeriesChunk(iRowSize=None):
+    """
+    Return the chunk length of a series whose first row has iRowSize values.
+
+    This is the smallest power of two that holds the row, kept between
+    SERIES_MIN_CHUNK and SERIES_CHUNK.
+    """
+    if iRowSize is None:
+        return SERIES_CHUNK
+    iChunk = SERIES_MIN_CHUNK
+    while iChunk < min(iRowSize, SERIES_CHUNK):
+        iChunk *= 2
+    return iChunk
+
+
+def fiSeriesEnd(hSeries):
+    """Return where the next row of a ragged layout series starts."""
+    return int(hSeries["offsets"][hSeries["names"].shape[0]])
+
+
+def fnGrowSeries(hSeries, iEnd):
+    """
+    Make room for values up to iEnd in a ragged layout series.
+
+    The values are never shrunk: after fnCompactSeries, the space past the
+    last row is filled by the rows appended next instead of being freed,
+    since HDF5 does not reuse freed chunks once the file is closed.
+    """
+    if hSeries["values"].shape[0] < iEnd:
+        hSeries["values"].resize((iEnd,))
+
+
+def fnCompactSeries(hSeries, setNames):
+    """
+    Remove the rows of some simulations from a ragged layout series.
+
+    Rows of the simulations in setNames are dropped, as is any row that a
+    later row of the same simulation replaced, and the remaining rows are
+    moved down over them, SERIES_COPY_BLOCK values at a time, so each
+    simulation is left with at most one row. The values keep their length
+    for fnGrowSeries to reuse.
+
+    Parameters
+    ----------
+    hSeries : h5py.Group
+        The key's group, from fhRequireSeries
+    setNames : set of str
+        Simulation group names whose rows are removed
+
+    Returns
+    -------
+    int
+        Number of rows removed
+    """
+    listNames = list(hSeries["names"].asstr()[()])
+    iRows = len(listNames)
+    dictLast = {sName: iRow for iRow, sName in enumerate(listNames)}
+    daKeep = np.array(
+        [
+            dictLast[sName] == iRow and sName not in setNames
+            for iRow, sName in enumerate(listNames)
+        ],
+        dtype=bool,
+    )
+    if daKeep.all():
+        return 0
+
+    daOffsets = hSeries["offsets"][:iRows + 1]
+    daLengths = np.diff(daOffsets)
+    hValues = hSeries["values"]
+    daKept = np.flatnonzero(daKeep)
+    iDest = 0
+    # consecutive rows that are kept are moved together
+    for daRun in np.split(daKept, np.flatnonzero(np.diff(daKept) != 1) + 1):
+        if not len(daRun):
+            continue
+        iSource = int(daOffsets[daRun[0]])
+        iStop = int(daOffsets[daRun[-1] + 1])
+        if iSource != iDest:
+            # moving down block by block never overwrites an unread value
+            for iFrom in range(iSource, iStop, SERIES_COPY_BLOCK):
+                iTo = min(iFrom + SERIES_COPY_BLOCK, iStop)
+                hValues[iDest + iFrom - iSource:iDest + iTo - iSource] = \
+                    hValues[iFrom:iTo]
+        iDest += iStop - iSource
+
+    iKept = len(daKept)
+    daNewOffsets = np.zeros(iKept + 1, dtype=np.int64)
+    np.cumsum(daLengths[daKept], out=daNewOffsets[1:])
+    daShapes = hSeries["shapes"][:iRows][daKeep]
+    hSeries["names"].resize((iKept,))
+    if iKept:
+        hSeries["names"][:] = np.array(
+            [listNames[iRow] for iRow in daKept], dtype=object
+        )
+        hSeries["shapes"][:iKept] = daShapes
+    hSeries["shapes"].resize((iKept, SERIES_MAX_NDIM + 1))
+    hSeries["offsets"].resize((iKept + 1,))
+    hSeries["offsets"][:] = daNewOffsets
+    return iRows - iKept
+
+
+def fnCloseSeriesRow(hSeries, sName, iEnd, tShape):
+    """
+    Record a row whose values have been written up to iEnd.
+
+    Parameters
+    ----------
+    hSeries : h5py.Group
+        The key's group, from fhRequireSeries
+    sName : str
+        Simulation group name
+    iEnd : int
+        Offset just past the row's last value
+    tShape : tuple of int
+        Shape to restore the row to
+
+    Returns
+    -------
+    None
+    """
+    iRows = hSeries["names"].shape[0]
+    hSeries["offsets"].resize((iRows + 2,))
+    hSeries["offsets"][iRows + 1] = iEnd
+    daShape = np.zeros(SERIES_MAX_NDIM + 1, dtype=np.int64)
+    daShape[0] = len(tShape)
+    daShape[1:len(tShape) + 1] = tShape
+    hSeries["shapes"].resize((iRows + 1, SERIES_MAX_NDIM + 1))
+    hSeries["shapes"][iRows] = daShape
+    # the row only counts once its name is written
+    hSeries["names"].resize((iRows + 1,))
+    hSeries["names"][iRows] = sName
 
 
 def par_worker(
@@ -329,6 +1564,12 @@ def par_worker(
     vplanet_help,
     h5_file,
     verbose,
+    claim_stats=None,
+    worker_index=0,
+    ragged=False,
+    storage=None,
+    prefetch=None,
+    stats=None,
 ):
     """
     Parallel worker process for archive creation.
@@ -358,36 +1599,542 @@ def par_worker(
         Path to HDF5 archive file
     verbose : bool
         Verbose output flag
+    claim_stats : multiprocessing.Array, optional
+        Shared claim statistics, CLAIM_STATS_FIELDS entries per worker
+    worker_index : int, optional
+        This worker's slot in claim_stats
+    ragged : bool, optional
+        Write series keys in the ragged layout (default False)
+    storage : dict, optional
+        Chunking and compression settings from fdictStorageOptions
+    prefetch : dict, optional
+        Read-ahead settings from fdictPrefetchOptions
+    stats : list of str, optional
+        Statistics to store for each forward key, from flistPrecomputeStats
 
     Returns
     -------
     None
     """
-    while True:
-        # Get next simulation to process
-        sFolder = fnGetNextSimulation(checkpoint_file, lock)
-        if sFolder is None:
-            return  # All done
+    with OpenCheckpoint(checkpoint_file, lock) as cp:
+        for sFolder, buffers in SimulationPrefetcher(
+            fiterClaimSimulations(cp, claim_stats, worker_index),
+            in_files + [log_file], prefetch,
+        ):
+            sGroupName = "/" + sFolder.split("/")[-1]
+
+            # Process and write simulation data
+            lock.acquire()
+            with h5py.File(
+                h5_file, "a", libver=ARCHIVE_LIBVER
+            ) as hMaster:
+                if not fbCheckGroupExists(hMaster, sGroupName):
+                    if not quiet:
+                        print("Creating", sGroupName, "...")
+
+                    sManifest = fsSimulationManifest(sFolder)
+                    iterRecords = fiterSimulationRecords(
+                        sFolder, system_name, body_list, log_file,
+                        in_files, vplanet_help, verbose, buffers, stats
+                    )
+
+                    fnWriteSimulationToArchive(
+                        hMaster, iterRecords, sGroupName, vplanet_help,
+                        verbose, sManifest, ragged, storage
+                    )
+
+            lock.release()
+
+            # Mark complete
+            cp.fnMarkComplete(sFolder)
+
+
+def fnRunSingleWriter(
+    iCores,
+    sCheckpointFile,
+    sSystemName,
+    listBodies,
+    sLogFile,
+    listInfiles,
+    bQuiet,
+    lockFile,
+    dictVplanetHelp,
+    sArchiveFile,
+    bVerbose,
+    arrClaimStats=None,
+    bRagged=False,
+    dictStorage=None,
+    dictPrefetch=None,
+    listStats=None,
+):
+    """
+    Build the archive with parallel parsers and a single HDF5 writer.
+
+    Starts one parser process per core. Parsers never touch the archive;
+    they hand finished simulations to this process over a bounded queue,
+    and this process keeps the archive open and writes every group.
+    Raises RuntimeError if a parser fails, once the simulations it left
+    unfinished have been returned to the to-do state.
+
+    Parameters
+    ----------
+    iCores : int
+        Number of parser processes
+    sCheckpointFile : str
+        Path to checkpoint file
+    sSystemName : str
+        System name
+    listBodies : list
+        List of body names
+    sLogFile : str
+        Log file name
+    listInfiles : list
+        List of input file names
+    bQuiet : bool
+        Quiet mode flag
+    lockFile : multiprocessing.Lock
+        Lock for thread-safe checkpoint access
+    dictVplanetHelp : dict
+        VPLanet help dictionary
+    sArchiveFile : str
+        Path to HDF5 archive file
+    bVerbose : bool
+        Verbose output flag
+    arrClaimStats : multiprocessing.Array, optional
+        Shared claim statistics, CLAIM_STATS_FIELDS entries per parser
+    bRagged : bool, optional
+        Write series keys in the ragged layout (default False)
+    dictStorage : dict, optional
+        Chunking and compression settings from fdictStorageOptions
+    dictPrefetch : dict, optional
+        Read-ahead settings for each parser, from fdictPrefetchOptions
+    listStats : list of str, optional
+        Statistics to store for each forward key, from flistPrecomputeStats
+
+    Returns
+    -------
+    None
+    """
+    queueSims = mp.Queue(maxsize=max(1, iCores) * QUEUE_DEPTH_PER_PARSER)
+    listParsers = []
+    for i in range(iCores):
+        listParsers.append(
+            mp.Process(
+                target=par_parser,
+                args=(
+                    sCheckpointFile,
+                    sSystemName,
+                    listBodies,
+                    sLogFile,
+                    listInfiles,
+                    lockFile,
+                    dictVplanetHelp,
+                    queueSims,
+                    bVerbose,
+                    arrClaimStats,
+                    i,
+                    dictPrefetch,
+                    listStats,
+                ),
+            )
+        )
+    for p in listParsers:
+        p.start()
+
+    try:
+        fnArchiveWriter(
+            queueSims,
+            listParsers,
+            sCheckpointFile,
+            lockFile,
+            sArchiveFile,
+            dictVplanetHelp,
+            bQuiet,
+            bVerbose,
+            bRagged,
+            dictStorage,
+        )
+    except BaseException:
+        # nothing would drain the queue the parsers block on
+        for p in listParsers:
+            p.terminate()
+        raise
+    finally:
+        for p in listParsers:
+            p.join()
+
+    listFailed = [
+        str(i) for i, p in enumerate(listParsers) if p.exitcode != 0
+    ]
+    if listFailed:
+        raise RuntimeError(
+            "Parser process " + ", ".join(listFailed) + " exited with an "
+            "error; unfinished simulations are queued again for the next run"
+        )
 
-        sGroupName = "/" + sFolder.split("/")[-1]
 
-        # Process and write simulation data
-        lock.acquire()
-        with h5py.File(h5_file, "a") as hMaster:
-            if not fbCheckGroupExists(hMaster, sGroupName):
-                if not quiet:
-                    print("Creating", sGroupName, "...")
+def par_parser(
+    checkpoint_file,
+    system_name,
+    body_list,
+    log_file,
+    in_files,
+    lock,
+    vplanet_help,
+    sim_queue,
+    verbose,
+    claim_stats=None,
+    worker_index=0,
+    prefetch=None,
+    stats=None,
+):
+    """
+    Parallel parser process for single-writer archive creation.
+
+    Claims simulations from the checkpoint and parses them without holding
+    the lock. Each simulation is put on the queue for the writer as
+    (folder, manifest, batch) items, one per batch of records as its files
+    are read, then (folder, manifest, None) once it is complete. Files
+    large enough to be streamed are parsed here too, and sent as batches
+    of StreamedBlock, so the writer never parses. A None sentinel is always
+    put on exit so the writer knows this parser is done.
 
-                dictData = fnProcessSimulationData(
+    Parameters
+    ----------
+    checkpoint_file : str
+        Path to checkpoint file
+    system_name : str
+        System name
+    body_list : list
+        List of body names
+    log_file : str
+        Log file name
+    in_files : list
+        List of input files
+    lock : multiprocessing.Lock
+        Lock for thread-safe checkpoint access
+    vplanet_help : dict
+        VPLanet help dictionary
+    sim_queue : multiprocessing.Queue
+        Bounded queue shared with the writer
+    verbose : bool
+        Verbose output flag
+    claim_stats : multiprocessing.Array, optional
+        Shared claim statistics, CLAIM_STATS_FIELDS entries per worker
+    worker_index : int, optional
+        This worker's slot in claim_stats
+    prefetch : dict, optional
+        Read-ahead settings from fdictPrefetchOptions
+    stats : list of str, optional
+        Statistics to store for each forward key, from flistPrecomputeStats
+
+    Returns
+    -------
+    None
+    """
+    try:
+        with OpenCheckpoint(checkpoint_file, lock) as cp:
+            for sFolder, buffers in SimulationPrefetcher(
+                fiterClaimSimulations(cp, claim_stats, worker_index),
+                in_files + [log_file], prefetch,
+            ):
+                # Taken before parsing, so a file changed mid-parse shows
+                # up as stale on the next update
+                sManifest = fsSimulationManifest(sFolder)
+                iterRecords = fiterSimulationRecords(
                     sFolder, system_name, body_list, log_file,
-                    in_files, vplanet_help, verbose
+                    in_files, vplanet_help, verbose, buffers, stats
                 )
+                # Blocks while the queue is full, throttling this parser
+                for dictBatch in fiterRecordBatches(iterRecords):
+                    for dictBlocks in fiterStreamedBatches(dictBatch):
+                        sim_queue.put((sFolder, sManifest, dictBlocks))
+                sim_queue.put((sFolder, sManifest, None))
+    finally:
+        sim_queue.put(None)
+
+
+def fnArchiveWriter(queueSims, listParsers, sCheckpointFile, lockFile,
+                    sArchiveFile, dictVplanetHelp, bQuiet, bVerbose,
+                    bRagged=False, dictStorage=None):
+    """
+    Write parsed simulations from the queue into the archive.
 
-                fnWriteSimulationToArchive(
-                    hMaster, dictData, sGroupName, vplanet_help, verbose
-                )
+    Keeps the archive open for the whole run. Each simulation is flushed
+    to disk before it is marked complete in the checkpoint file. Returns
+    once every parser has sent its sentinel, or has died without one, after
+    deleting the groups of simulations that never completed and returning
+    them, with any others still in progress, to the to-do state.
+
+    Parameters
+    ----------
+    queueSims : multiprocessing.Queue
+        Queue of (folder, manifest, batch) tuples from par_parser, with
+        None sentinels
+    listParsers : list of multiprocessing.Process
+        Parser processes feeding the queue
+    sCheckpointFile : str
+        Path to checkpoint file
+    lockFile : multiprocessing.Lock
+        Lock for thread-safe checkpoint access
+    sArchiveFile : str
+        Path to HDF5 archive file
+    dictVplanetHelp : dict
+        VPLanet help dictionary
+    bQuiet : bool
+        Quiet mode flag
+    bVerbose : bool
+        Verbose output flag
+    bRagged : bool, optional
+        Write series keys in the ragged layout (default False)
+    dictStorage : dict, optional
+        Chunking and compression settings from fdictStorageOptions
+
+    Returns
+    -------
+    None
+    """
+    iFinished = 0
+    # simulations whose batches are still arriving
+    dictWriters = {}
+    with OpenCheckpoint(sCheckpointFile, lockFile) as cp, \
+            h5py.File(sArchiveFile, "a", libver=ARCHIVE_LIBVER) as hMaster:
+        try:
+            while iFinished < len(listParsers):
+                try:
+                    item = queueSims.get(timeout=1)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in listParsers):
+                        break
+                    continue
+
+                if item is None:
+                    iFinished += 1
+                    continue
+
+                sFolder, sManifest, dictBatch = item
+                if sFolder not in dictWriters:
+                    # None marks a simulation whose group is already archived
+                    writer = None
+                    sGroupName = "/" + sFolder.split("/")[-1]
+                    if not fbCheckGroupExists(hMaster, sGroupName):
+                        if not bQuiet:
+                            print("Creating", sGroupName, "...")
+                        writer = SimulationWriter(
+                            hMaster, sGroupName, dictVplanetHelp, bVerbose,
+                            sManifest, bRagged, dictStorage
+                        )
+                    dictWriters[sFolder] = writer
+                writer = dictWriters[sFolder]
+
+                if dictBatch is not None:
+                    if writer is not None:
+                        writer.fnWrite(dictBatch)
+                    continue
+
+                del dictWriters[sFolder]
+                if writer is not None:
+                    writer.fnClose()
+                    hMaster.flush()
+                cp.fnMarkComplete(sFolder)
+        finally:
+            # simulations a parser stopped sending part way through
+            for sFolder, writer in dictWriters.items():
+                if not bQuiet:
+                    print("Discarding", sFolder, "...")
+                if writer is not None:
+                    writer.fnDiscard()
+            hMaster.flush()
+            # the parsers are done, or about to be stopped, so nothing still
+            # in progress will finish
+            cp.flistResetInProgress()
+
+
+def fsShardFolder(sArchiveFile):
+    """
+    Return the folder that holds the shards of a sharded archive.
+
+    Parameters
+    ----------
+    sArchiveFile : str
+        Path to the root HDF5 archive file
+
+    Returns
+    -------
+    str
+        Path to the shard folder, next to the archive
+    """
+    return os.path.splitext(sArchiveFile)[0] + "_shards"
+
+
+def fsShardFile(sShardFolder, iShard):
+    """
+    Return the path of one worker's shard file.
+
+    Parameters
+    ----------
+    sShardFolder : str
+        Path to the shard folder
+    iShard : int
+        Worker index
+
+    Returns
+    -------
+    str
+        Path to the shard file
+    """
+    return os.path.join(sShardFolder, "shard_%03d.bpa" % iShard)
+
+
+def par_shard_worker(
+    shard_file,
+    checkpoint_file,
+    system_name,
+    body_list,
+    log_file,
+    in_files,
+    quiet,
+    lock,
+    vplanet_help,
+    verbose,
+    claim_stats=None,
+    worker_index=0,
+    storage=None,
+    prefetch=None,
+    stats=None,
+):
+    """
+    Parallel worker process for sharded archive creation.
+
+    Keeps its own shard file open for the whole run, so workers never wait
+    on each other to write. The only shared state is the checkpoint.
+
+    Parameters
+    ----------
+    shard_file : str
+        Path to this worker's shard file
+    checkpoint_file : str
+        Path to checkpoint file
+    system_name : str
+        System name
+    body_list : list
+        List of body names
+    log_file : str
+        Log file name
+    in_files : list
+        List of input files
+    quiet : bool
+        Quiet mode flag
+    lock : multiprocessing.Lock
+        Lock for thread-safe checkpoint access
+    vplanet_help : dict
+        VPLanet help dictionary
+    verbose : bool
+        Verbose output flag
+    claim_stats : multiprocessing.Array, optional
+        Shared claim statistics, CLAIM_STATS_FIELDS entries per worker
+    worker_index : int, optional
+        This worker's slot in claim_stats
+    storage : dict, optional
+        Chunking and compression settings from fdictStorageOptions
+    prefetch : dict, optional
+        Read-ahead settings from fdictPrefetchOptions
+    stats : list of str, optional
+        Statistics to store for each forward key, from flistPrecomputeStats
+
+    Returns
+    -------
+    None
+    """
+    with OpenCheckpoint(checkpoint_file, lock) as cp, \
+            h5py.File(shard_file, "a", libver=ARCHIVE_LIBVER) as hShard:
+        # Drop anything a previous, interrupted run left half written
+        for sName in list(hShard.keys()):
+            if sName.startswith(PARTIAL_PREFIX):
+                del hShard[sName]
+
+        for sFolder, buffers in SimulationPrefetcher(
+            fiterClaimSimulations(cp, claim_stats, worker_index),
+            in_files + [log_file], prefetch,
+        ):
+            sName = sFolder.split("/")[-1]
+            if not quiet:
+                print("Creating", "/" + sName, "...")
+
+            sManifest = fsSimulationManifest(sFolder)
+            iterRecords = fiterSimulationRecords(
+                sFolder, system_name, body_list, log_file,
+                in_files, vplanet_help, verbose, buffers, stats
+            )
+            fnWriteSimulationToArchive(
+                hShard, iterRecords, "/" + sName, vplanet_help, verbose,
+                sManifest, dictStorage=storage
+            )
+            hShard.flush()
+
+            cp.fnMarkComplete(sFolder)
+
+
+def fnLinkShards(sArchiveFile, sShardFolder):
+    """
+    Mount every group in the shards into the root archive.
+
+    Each group becomes an HDF5 external link in the root file. Links use
+    paths relative to the root, so the root and its shard folder can be
+    moved together. Groups already present in the root are left alone.
+
+    Parameters
+    ----------
+    sArchiveFile : str
+        Path to the root HDF5 archive file
+    sShardFolder : str
+        Path to the shard folder
+
+    Returns
+    -------
+    None
+    """
+    sRootDir = os.path.dirname(os.path.abspath(sArchiveFile))
+    with h5py.File(sArchiveFile, "a") as hRoot:
+        for sShard in sorted(os.listdir(sShardFolder)):
+            sShardPath = os.path.join(sShardFolder, sShard)
+            sLinkPath = os.path.relpath(sShardPath, sRootDir)
+            with h5py.File(sShardPath, "r") as hShard:
+                for sName in hShard.keys():
+                    if sName.startswith(PARTIAL_PREFIX) or sName in hRoot:
+                        continue
+                    hRoot[sName] = h5py.ExternalLink(sLinkPath, "/" + sName)
+
+
+def fnMergeShards(sArchiveFile, sShardFolder):
+    """
+    Copy every shard group into the root archive and delete the shards.
 
-        lock.release()
+    Replaces the external links made by fnLinkShards with real groups, so
+    the root becomes an ordinary self-contained archive. Groups are copied
+    with H5Ocopy, which moves the stored chunks without decoding them.
 
-        # Mark complete
-        fnMarkSimulationComplete(checkpoint_file, sFolder, lock)
+    Parameters
+    ----------
+    sArchiveFile : str
+        Path to the root HDF5 archive file
+    sShardFolder : str
+        Path to the shard folder
+
+    Returns
+    -------
+    None
+    """
+    with h5py.File(sArchiveFile, "a", libver=ARCHIVE_LIBVER) as hRoot:
+        for sShard in sorted(os.listdir(sShardFolder)):
+            with h5py.File(os.path.join(sShardFolder, sShard), "r") as hShard:
+                for sName in hShard.keys():
+                    if sName.startswith(PARTIAL_PREFIX):
+                        continue
+                    link = hRoot.get(sName, getlink=True)
+                    if isinstance(link, h5py.ExternalLink):
+                        del hRoot[sName]
+                    elif link is not None:
+                        continue
+                    hShard.copy(hShard[sName], hRoot, name=sName)
+    shutil.rmtree(sShardFolder)
@@ -23,6 +23,12 @@ def Main(
     archive,
     deleterawdata,
     ignorecorrupt,
+    mode="writer",
+    merge=False,
+    update=False,
+    layout="groups",
+    storage=None,
+    prefetch=None,
 ):
     # folder,bplArchive,output,bodyFileList,primaryFile,IncludeList,ExcludeList,Ulysses = ReadFile(file,verbose)
     #
@@ -73,10 +79,23 @@ def Main(
 
     if archive == True:
         print("Creating BPA file...")
-        Archive(bpInputFile, cores, quiet, overwrite, ignorecorrupt, verbose)
+        Archive(
+            bpInputFile,
+            cores,
+            quiet,
+            overwrite,
+            ignorecorrupt,
+            verbose,
+            mode,
+            merge,
+            update,
+            layout,
+            storage,
+            prefetch,
+        )
     else:
         print("Creating BPF file...")
-        Filter(bpInputFile, quiet, verbose, ignorecorrupt, overwrite)
+        Filter(bpInputFile, quiet, verbose, ignorecorrupt, overwrite, cores)
 
 
 def Arguments():
@@ -118,6 +137,77 @@ def Arguments():
         action="store_true",
         help="ignore data corruption for MD5 Checksum",
     )
+    parser.add_argument(
+        "-mode",
+        "--mode",
+        choices=["writer", "lock", "shard"],
+        default="writer",
+        help="archive build mode: parallel parsers with one HDF5 writer "
+        "(writer), workers that take turns writing (lock), or one file per "
+        "worker linked from the archive (shard)",
+    )
+    parser.add_argument(
+        "-merge",
+        "--merge",
+        action="store_true",
+        help="copy shards into a single archive file after a sharded build",
+    )
+    parser.add_argument(
+        "-layout",
+        "--layout",
+        choices=["groups", "ragged"],
+        default="groups",
+        help="store time series in each simulation's group (groups), or "
+        "concatenated across simulations with an offsets index (ragged)",
+    )
+    parser.add_argument(
+        "-compression",
+        "--compression",
+        choices=["gzip", "lzf", "none"],
+        help="compression for time series in the archive (overrides "
+        "sCompression in the input file)",
+    )
+    parser.add_argument(
+        "-compressionlevel",
+        "--compressionlevel",
+        type=int,
+        help="gzip level from 0 to 9 (overrides iCompressionLevel)",
+    )
+    parser.add_argument(
+        "-noshuffle",
+        "--noshuffle",
+        action="store_true",
+        help="do not shuffle bytes before compressing (overrides bShuffle)",
+    )
+    parser.add_argument(
+        "-scaleoffset",
+        "--scaleoffset",
+        type=int,
+        help="keep only this many decimal digits of time series values, "
+        "a lossy filter that also disables their checksums (overrides "
+        "iScaleOffset)",
+    )
+    parser.add_argument(
+        "-prefetch",
+        "--prefetch",
+        type=int,
+        help="simulations each worker reads ahead while parsing, 0 to turn "
+        "reading ahead off (overrides iPrefetchDepth)",
+    )
+    parser.add_argument(
+        "-prefetchmb",
+        "--prefetchmb",
+        type=int,
+        help="megabytes of read-ahead files each worker may hold (overrides "
+        "iPrefetchMB)",
+    )
+    parser.add_argument(
+        "-u",
+        "--update",
+        action="store_true",
+        help="add new simulations to an existing archive and rebuild only "
+        "the ones whose files changed",
+    )
     # adds the quiet and verbose as mutually exclusive groups
     group = parser.add_mutually_exclusive_group()
     group.add_argument(
@@ -132,6 +222,22 @@ def Arguments():
 
     args = parser.parse_args()
 
+    storage = {}
+    if args.compression is not None:
+        storage["sCompression"] = args.compression
+    if args.compressionlevel is not None:
+        storage["iCompressionLevel"] = args.compressionlevel
+    if args.noshuffle:
+        storage["bShuffle"] = False
+    if args.scaleoffset is not None:
+        storage["iScaleOffset"] = args.scaleoffset
+
+    prefetch = {}
+    if args.prefetch is not None:
+        prefetch["iPrefetchDepth"] = args.prefetch
+    if args.prefetchmb is not None:
+        prefetch["iPrefetchMB"] = args.prefetchmb
+
     Main(
         args.bpInputFile,
         args.cores,
@@ -141,4 +247,10 @@ def Arguments():
         args.archive,
         args.deleterawdata,
         args.ignorecorrupt,
+        args.mode,
+        args.merge,
+        args.update,
+        args.layout,
+        storage,
+        prefetch,
     )
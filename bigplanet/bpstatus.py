@@ -2,6 +2,8 @@ import argparse
 import os
 import sys
 
+from .checkpoint import OpenCheckpoint
+
 
 def bpstatus(input_file):
 
@@ -15,24 +17,15 @@ def bpstatus(input_file):
                 % input_file
             )
 
-    count_done = 0
-    count_todo = 0
-    count_ip = 0
     checkpoint_file = os.getcwd() + "/." + folder_name + "_BPL"
     if os.path.isfile(checkpoint_file) == False:
         raise Exception("BigPlanet must be running prior to using bpstatus")
     else:
-        with open(checkpoint_file, "r") as cp:
-            content = [line.strip().split() for line in cp.readlines()]
-            for number, line in enumerate(content):
-                status = line[1]
-
-                if status == "1":
-                    count_done += 1
-                elif status == "-1":
-                    count_todo += 1
-                elif status == "0":
-                    count_ip += 1
+        with OpenCheckpoint(checkpoint_file) as cp:
+            summary = cp.fdictSummary()
+        count_done = summary["done"]
+        count_ip = summary["in_progress"]
+        count_todo = summary["remaining"]
 
         print("--BigPlanet Status--")
         print("Number of Simulations completed: " + str(count_done))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+from .read import fsCacheDir
+
+# Parsed files live in this folder of the bigplanet cache directory
+PARSE_CACHE_FOLDER = "parsed"
+PARSE_CACHE_MB = 1024
+
+# Parsed output files are numeric arrays and are stored as .npy files;
+# parsed log and input files are dictionaries of strings, pickled after
+# ENTRY_MAGIC, which marks the format of these entries.
+ENTRY_SUFFIXES = {"log": ".pkl", "input": ".pkl", "output": ".npy"}
+ENTRY_MAGIC = b"BPCACHE1"
+
+
+class EntryUnpickler(pickle.Unpickler):
+    """
+    Unpickle a log or input entry, which holds only builtin containers.
+
+    Dicts, lists, tuples, strings and numbers need no class lookups, so
+    any lookup is refused: loading an entry never imports or calls
+    anything, whoever wrote it.
+    """
+
+    def find_class(self, sModule, sName):
+        raise pickle.UnpicklingError(
+            "Cache entries cannot hold " + sModule + "." + sName
+        )
+
+
+def ftFileStamp(sPath):
+    """
+    Describe a file well enough to tell when it changes.
+
+    Parameters
+    ----------
+    sPath : str
+        Path to the file
+
+    Returns
+    -------
+    tuple
+        Absolute path, size in bytes and mtime in ns. Size and mtime are
+        None for a file that does not exist.
+    """
+    try:
+        stat = os.stat(sPath)
+    except OSError:
+        return (os.path.abspath(sPath), None, None)
+    return (os.path.abspath(sPath), stat.st_size, stat.st_mtime_ns)
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed simulation files, for filtering raw folders.
+
+    Each entry holds what one log, input or output file parsed to, keyed
+    by the file's path, size and mtime, so an edited or rerun simulation
+    is parsed again. The least recently used entries are removed once the
+    cache grows past its size cap.
+
+    Parameters
+    ----------
+    sDir : str, optional
+        Directory holding the entries (default "parsed" under fsCacheDir)
+    iMaxBytes : int, optional
+        Size cap in bytes (default PARSE_CACHE_MB megabytes)
+    vplanet_help : dict, optional
+        Parsed vplanet -H output. Input file entries depend on it through
+        their units, so they are only reused with the same help.
+    """
+
+    def __init__(self, sDir=None, iMaxBytes=None, vplanet_help=None):
+        if sDir is None:
+            sDir = os.path.join(fsCacheDir(), PARSE_CACHE_FOLDER)
+        if iMaxBytes is None:
+            iMaxBytes = PARSE_CACHE_MB * 1024 ** 2
+        self.sDir = sDir
+        self.iMaxBytes = iMaxBytes
+        self.sHelpDigest = hashlib.sha1(
+            json.dumps(vplanet_help, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        self.iBytes = None
+
+    def fsEntryFile(self, sKind, listPaths):
+        """
+        Return the entry file for parsing the first of listPaths.
+
+        Parameters
+        ----------
+        sKind : str
+            "log", "input" or "output"
+        listPaths : list of str
+            The parsed file, then any other file its result depends on
+
+        Returns
+        -------
+        str
+            Path to the entry, which may not exist
+        """
+        listKey = [sKind] + [list(ftFileStamp(sPath)) for sPath in listPaths]
+        if sKind == "input":
+            listKey.append(self.sHelpDigest)
+        sDigest = hashlib.sha1(json.dumps(listKey).encode("utf-8")).hexdigest()
+        return os.path.join(self.sDir, sDigest + ENTRY_SUFFIXES[sKind])
+
+    def fLoad(self, sKind, listPaths, fnParse):
+        """
+        Return a file's parsed contents, parsing it only on a cache miss.
+
+        Parameters
+        ----------
+        sKind : str
+            "log", "input" or "output"
+        listPaths : list of str
+            The parsed file, then any other file its result depends on,
+            e.g. vpl.in for the units of an input file
+        fnParse : callable
+            Parses the file when it is not cached. Returns a dict of
+            builtin containers, strings and numbers for log and input
+            files, and an array for output files.
+
+        Returns
+        -------
+        dict or np.ndarray
+            The parsed contents
+        """
+        sEntry = self.fsEntryFile(sKind, listPaths)
+        try:
+            result = self.fReadEntry(sEntry)
+        except (OSError, ValueError):
+            result = fnParse()
+            self.fnWriteEntry(sEntry, result)
+        else:
+            try:
+                # a hit makes the entry the most recently used
+                os.utime(sEntry)
+            except OSError:
+                pass
+        return result
+
+    def fReadEntry(self, sEntry):
+        """
+        Read one entry, raising OSError if it does not exist and ValueError
+        if it cannot be read.
+        """
+        if sEntry.endswith(".npy"):
+            return np.load(sEntry, allow_pickle=False)
+        with open(sEntry, "rb") as f:
+            if f.read(len(ENTRY_MAGIC)) != ENTRY_MAGIC:
+                raise ValueError("Not a cache entry: " + sEntry)
+            try:
+                return EntryUnpickler(f).load()
+            except (EOFError, pickle.UnpicklingError) as error:
+                raise ValueError(str(error)) from error
+
+    def fnWriteEntry(self, sEntry, result):
+        """
+        Write one entry atomically, then evict old entries if over the cap.
+
+        Failing to write, e.g. on a full or read-only disk, is not an error.
+        """
+        try:
+            os.makedirs(self.sDir, exist_ok=True)
+            iFd, sTmp = tempfile.mkstemp(dir=self.sDir, suffix=".tmp")
+            with os.fdopen(iFd, "wb") as f:
+                if sEntry.endswith(".npy"):
+                    np.save(f, np.asarray(result), allow_pickle=False)
+                else:
+                    f.write(ENTRY_MAGIC)
+                    pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(sTmp, sEntry)
+            iSize = os.path.getsize(sEntry)
+        except (OSError, ValueError, pickle.PicklingError):
+            return
+        if self.iBytes is None:
+            self.iBytes = sum(iBytes for _, iBytes, _ in self.flistEntries())
+        else:
+            self.iBytes += iSize
+        if self.iBytes > self.iMaxBytes:
+            self.fnEvict()
+
+    def flistEntries(self):
+        """(path, size, mtime) of every entry, least recently used first."""
+        listEntries = []
+        try:
+            iterEntries = os.scandir(self.sDir)
+        except OSError:
+            return listEntries
+        with iterEntries:
+            for entry in iterEntries:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.is_file():
+                    listEntries.append(
+                        (entry.path, stat.st_size, stat.st_mtime_ns)
+                    )
+        listEntries.sort(key=lambda tEntry: tEntry[2])
+        return listEntries
+
+    def fnEvict(self):
+        """Remove the least recently used entries until under the cap."""
+        listEntries = self.flistEntries()
+        self.iBytes = sum(iBytes for _, iBytes, _ in listEntries)
+        for sEntry, iBytes, _ in listEntries:
+            if self.iBytes <= self.iMaxBytes:
+                break
+            try:
+                os.remove(sEntry)
+            except OSError:
+                continue
+            self.iBytes -= iBytes
@@ -0,0 +1,527 @@
+#!/usr/bin/env python
+
+import math
+import os
+import sqlite3
+
+# First bytes of every SQLite database file, used to tell the two checkpoint
+# formats apart without relying on the file name.
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+# Checkpoint states, shared by both backends
+STATUS_TODO = -1
+STATUS_IN_PROGRESS = 0
+STATUS_DONE = 1
+
+# Batched claiming hands each worker a share of what is left, so batches
+# start large and shrink towards one as the queue drains. The factor sets
+# how many rounds the remaining work is split into per worker.
+CLAIM_BATCH_MAX = 64
+CLAIM_BATCH_FACTOR = 2
+
+# SQLite's WAL mode keeps its index in shared memory, which only works when
+# every process runs on one host, so on these network and cluster
+# filesystems the SQLite checkpoint uses a rollback journal instead.
+NETWORK_FILESYSTEMS = (
+    "9p",
+    "afs",
+    "beegfs",
+    "ceph",
+    "cifs",
+    "fuse.ceph",
+    "fuse.sshfs",
+    "gpfs",
+    "lustre",
+    "nfs",
+    "nfs4",
+    "panfs",
+    "smb3",
+    "smbfs",
+)
+
+
+def fiClaimBatchSize(iRemaining, iWorkers, iMaxBatch=CLAIM_BATCH_MAX):
+    """
+    Choose how many simulations a worker should claim at once.
+
+    Guided self-scheduling: each claim takes the remaining work divided by
+    CLAIM_BATCH_FACTOR times the number of workers, capped at iMaxBatch.
+    Large sweeps get few checkpoint round trips, while the last claims are
+    single simulations so no worker is left with a long tail.
+
+    Parameters
+    ----------
+    iRemaining : int
+        Number of simulations not yet claimed
+    iWorkers : int
+        Number of workers claiming from the checkpoint
+    iMaxBatch : int, optional
+        Largest batch to hand out (default CLAIM_BATCH_MAX)
+
+    Returns
+    -------
+    int
+        Batch size, at least 1
+    """
+    iBatch = math.ceil(iRemaining / (CLAIM_BATCH_FACTOR * max(1, iWorkers)))
+    return max(1, min(iMaxBatch, iBatch))
+
+
+def fbIsSQLiteCheckpoint(sCheckpointFile):
+    """
+    Check whether a checkpoint file is an SQLite database.
+
+    Parameters
+    ----------
+    sCheckpointFile : str
+        Path to checkpoint file
+
+    Returns
+    -------
+    bool
+        True if the file exists and starts with the SQLite header
+    """
+    if not os.path.isfile(sCheckpointFile):
+        return False
+    with open(sCheckpointFile, "rb") as f:
+        return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+
+
+def fsFilesystemType(sPath, sMountsFile="/proc/mounts"):
+    """
+    Return the type of the filesystem that holds a path.
+
+    Parameters
+    ----------
+    sPath : str
+        Path to a file or directory
+    sMountsFile : str, optional
+        Mount table to read (default /proc/mounts)
+
+    Returns
+    -------
+    str or None
+        Type of the longest mount point containing sPath, e.g. "nfs4", or
+        None if the mount table cannot be read, as on macOS
+    """
+    sPath = os.path.realpath(sPath)
+    sType = None
+    iLongest = -1
+    try:
+        with open(sMountsFile, "r") as f:
+            for sLine in f:
+                listFields = sLine.split()
+                if len(listFields) < 3:
+                    continue
+                # spaces in mount points are escaped as \040
+                sMount = listFields[1].replace("\\040", " ")
+                bContains = sPath == sMount or sPath.startswith(
+                    sMount.rstrip("/") + "/"
+                )
+                if bContains and len(sMount) > iLongest:
+                    iLongest = len(sMount)
+                    sType = listFields[2]
+    except OSError:
+        return None
+    return sType
+
+
+def fsJournalMode(sCheckpointFile):
+    """
+    Return the SQLite journal mode for a checkpoint file.
+
+    WAL, unless the file is on one of the NETWORK_FILESYSTEMS, where
+    DELETE: a rollback journal needs only the POSIX file locks these
+    filesystems provide, e.g. NFS with its lock daemon, or Lustre mounted
+    with the flock option.
+    """
+    sType = fsFilesystemType(os.path.dirname(os.path.abspath(sCheckpointFile)))
+    if sType in NETWORK_FILESYSTEMS:
+        return "DELETE"
+    return "WAL"
+
+
+def OpenCheckpoint(sCheckpointFile, lockFile=None, backend=None):
+    """
+    Open a checkpoint file with the backend that matches its format.
+
+    Parameters
+    ----------
+    sCheckpointFile : str
+        Path to checkpoint file
+    lockFile : multiprocessing.Lock, optional
+        Lock guarding the text backend. The SQLite backend uses database
+        transactions instead and ignores it.
+    backend : str, optional
+        "text" or "sqlite". Only needed for a file that does not exist yet;
+        existing files are detected from their header.
+
+    Returns
+    -------
+    TextCheckpoint or SQLiteCheckpoint
+        Checkpoint store for the file
+    """
+    if os.path.isfile(sCheckpointFile):
+        if fbIsSQLiteCheckpoint(sCheckpointFile):
+            backend = "sqlite"
+        else:
+            backend = "text"
+    if backend == "sqlite":
+        return SQLiteCheckpoint(sCheckpointFile)
+    if backend is None or backend == "text":
+        return TextCheckpoint(sCheckpointFile, lockFile)
+    raise ValueError("Unknown checkpoint backend: " + str(backend))
+
+
+def RemoveCheckpoint(sCheckpointFile):
+    """
+    Delete a checkpoint file along with any SQLite journal files.
+
+    Parameters
+    ----------
+    sCheckpointFile : str
+        Path to checkpoint file
+
+    Returns
+    -------
+    None
+    """
+    for sSuffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.isfile(sCheckpointFile + sSuffix):
+            os.remove(sCheckpointFile + sSuffix)
+
+
+class TextCheckpoint:
+    """
+    The original plain-text checkpoint file.
+
+    One "<folder> <status>" line per simulation between a two line header
+    and a "THE END" footer. Every operation reads and rewrites the whole
+    file, so it is kept for reading older checkpoints and for small sweeps.
+    """
+
+    sBackend = "text"
+
+    def __init__(self, sCheckpointFile, lockFile=None):
+        self.sCheckpointFile = sCheckpointFile
+        self.lockFile = lockFile
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        pass
+
+    def _acquire(self):
+        if self.lockFile is not None:
+            self.lockFile.acquire()
+
+    def _release(self):
+        if self.lockFile is not None:
+            self.lockFile.release()
+
+    def _flistRead(self):
+        listData = []
+        with open(self.sCheckpointFile, "r") as f:
+            for sLine in f:
+                if sLine.strip():
+                    listData.append(sLine.strip().split())
+        return listData
+
+    def _fnWrite(self, listData):
+        with open(self.sCheckpointFile, "w") as f:
+            for listLine in listData:
+                f.writelines(" ".join(listLine) + "\n")
+
+    def fnCreate(self, sInputFile, listSims):
+        """Write a new checkpoint with every simulation marked to do."""
+        with open(self.sCheckpointFile, "w") as cp:
+            cp.write("Vspace File: " + os.getcwd() + "/" + sInputFile + "\n")
+            cp.write(
+                "Total Number of Simulations: " + str(len(listSims)) + "\n"
+            )
+            for f in range(len(listSims)):
+                cp.write(listSims[f] + " " + "-1 \n")
+            cp.write("THE END \n")
+
+    def fsClaimNext(self):
+        """Mark the first simulation to do as in progress and return it."""
+        self._acquire()
+        try:
+            listData = self._flistRead()
+            sFolder = ""
+            for listLine in listData:
+                if listLine[1] == str(STATUS_TODO):
+                    sFolder = listLine[0]
+                    listLine[1] = str(STATUS_IN_PROGRESS)
+                    break
+            if not sFolder:
+                return None
+            self._fnWrite(listData)
+        finally:
+            self._release()
+        return os.path.abspath(sFolder)
+
+    def flistClaimBatch(self, iWorkers=1, iMaxBatch=CLAIM_BATCH_MAX):
+        """Claim a batch of simulations sized by fiClaimBatchSize."""
+        self._acquire()
+        try:
+            listData = self._flistRead()
+            iRemaining = sum(
+                1 for listLine in listData if listLine[1] == str(STATUS_TODO)
+            )
+            iBatch = fiClaimBatchSize(iRemaining, iWorkers, iMaxBatch)
+            listFolders = []
+            for listLine in listData:
+                if len(listFolders) == iBatch:
+                    break
+                if listLine[1] == str(STATUS_TODO):
+                    listFolders.append(os.path.abspath(listLine[0]))
+                    listLine[1] = str(STATUS_IN_PROGRESS)
+            if listFolders:
+                self._fnWrite(listData)
+        finally:
+            self._release()
+        return listFolders
+
+    def fnMarkComplete(self, sFolder):
+        """Mark a simulation as complete."""
+        self._acquire()
+        try:
+            listData = self._flistRead()
+            for listLine in listData:
+                if listLine[0] == sFolder:
+                    listLine[1] = str(STATUS_DONE)
+                    break
+            self._fnWrite(listData)
+        finally:
+            self._release()
+
+    def flistResetInProgress(self):
+        """Return in-progress simulations to the to-do state and list them."""
+        self._acquire()
+        try:
+            listData = self._flistRead()
+            listReset = []
+            for listLine in listData:
+                if listLine[1] == str(STATUS_IN_PROGRESS):
+                    listLine[1] = str(STATUS_TODO)
+                    listReset.append(listLine[0])
+            self._fnWrite(listData)
+        finally:
+            self._release()
+        return listReset
+
+    def fdictSummary(self):
+        """Count simulations in each state."""
+        dictSummary = {"done": 0, "in_progress": 0, "remaining": 0}
+        for listLine in self._flistRead():
+            if listLine[1] == str(STATUS_DONE):
+                dictSummary["done"] += 1
+            elif listLine[1] == str(STATUS_IN_PROGRESS):
+                dictSummary["in_progress"] += 1
+            elif listLine[1] == str(STATUS_TODO):
+                dictSummary["remaining"] += 1
+        dictSummary["total"] = sum(dictSummary.values())
+        return dictSummary
+
+
+class SQLiteCheckpoint:
+    """
+    Checkpoint stored in an SQLite database.
+
+    Simulations are indexed by state, so claiming and completing a
+    simulation touch a single row, and a small counts table keeps the
+    status summary current without scanning. Each process must open its
+    own store; connections are not shared across fork.
+
+    The database is in WAL mode, except on network filesystems, where
+    fsJournalMode picks a rollback journal. Concurrent claims there rely
+    on the filesystem's POSIX locks, so it must provide them to every
+    host that runs workers.
+    """
+
+    sBackend = "sqlite"
+
+    def __init__(self, sCheckpointFile):
+        self.sCheckpointFile = sCheckpointFile
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _fConnect(self):
+        if self._conn is None:
+            # Autocommit mode so that transactions are opened explicitly
+            # with BEGIN IMMEDIATE, which serialises writers across processes
+            self._conn = sqlite3.connect(
+                self.sCheckpointFile, timeout=600, isolation_level=None
+            )
+            sJournalMode = fsJournalMode(self.sCheckpointFile)
+            self._conn.execute("PRAGMA journal_mode=" + sJournalMode)
+            # NORMAL is only safe against power loss in WAL mode
+            if sJournalMode == "WAL":
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            else:
+                self._conn.execute("PRAGMA synchronous=FULL")
+        return self._conn
+
+    def _fnSetCount(self, conn, iStatus, iDelta):
+        conn.execute(
+            "UPDATE counts SET n = n + ? WHERE status = ?", (iDelta, iStatus)
+        )
+
+    def fnCreate(self, sInputFile, listSims):
+        """Write a new checkpoint with every simulation marked to do."""
+        self.close()
+        RemoveCheckpoint(self.sCheckpointFile)
+        conn = self._fConnect()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute(
+            "CREATE TABLE sims (id INTEGER PRIMARY KEY, "
+            "folder TEXT UNIQUE NOT NULL, status INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX sims_status ON sims (status, id)")
+        conn.execute(
+            "CREATE TABLE counts "
+            "(status INTEGER PRIMARY KEY, n INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO meta VALUES ('Vspace File', ?)",
+            (os.getcwd() + "/" + sInputFile,),
+        )
+        conn.executemany(
+            "INSERT INTO sims (folder, status) VALUES (?, ?)",
+            ((sSim, STATUS_TODO) for sSim in listSims),
+        )
+        conn.executemany(
+            "INSERT INTO counts VALUES (?, ?)",
+            [
+                (STATUS_TODO, len(listSims)),
+                (STATUS_IN_PROGRESS, 0),
+                (STATUS_DONE, 0),
+            ],
+        )
+        conn.execute("COMMIT")
+
+    def fsClaimNext(self):
+        """Mark the first simulation to do as in progress and return it."""
+        conn = self._fConnect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, folder FROM sims WHERE status = ? "
+                "ORDER BY id LIMIT 1",
+                (STATUS_TODO,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE sims SET status = ? WHERE id = ?",
+                (STATUS_IN_PROGRESS, row[0]),
+            )
+            self._fnSetCount(conn, STATUS_TODO, -1)
+            self._fnSetCount(conn, STATUS_IN_PROGRESS, 1)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return os.path.abspath(row[1])
+
+    def flistClaimBatch(self, iWorkers=1, iMaxBatch=CLAIM_BATCH_MAX):
+        """Claim a batch of simulations sized by fiClaimBatchSize."""
+        conn = self._fConnect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            iRemaining = conn.execute(
+                "SELECT n FROM counts WHERE status = ?", (STATUS_TODO,)
+            ).fetchone()[0]
+            rows = conn.execute(
+                "SELECT id, folder FROM sims WHERE status = ? "
+                "ORDER BY id LIMIT ?",
+                (
+                    STATUS_TODO,
+                    fiClaimBatchSize(iRemaining, iWorkers, iMaxBatch),
+                ),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE sims SET status = ? WHERE id = ?",
+                ((STATUS_IN_PROGRESS, row[0]) for row in rows),
+            )
+            self._fnSetCount(conn, STATUS_TODO, -len(rows))
+            self._fnSetCount(conn, STATUS_IN_PROGRESS, len(rows))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [os.path.abspath(row[1]) for row in rows]
+
+    def fnMarkComplete(self, sFolder):
+        """Mark a simulation as complete."""
+        conn = self._fConnect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, status FROM sims WHERE folder = ?", (sFolder,)
+            ).fetchone()
+            if row is not None and row[1] != STATUS_DONE:
+                conn.execute(
+                    "UPDATE sims SET status = ? WHERE id = ?",
+                    (STATUS_DONE, row[0]),
+                )
+                self._fnSetCount(conn, row[1], -1)
+                self._fnSetCount(conn, STATUS_DONE, 1)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def flistResetInProgress(self):
+        """Return in-progress simulations to the to-do state and list them."""
+        conn = self._fConnect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            listReset = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT folder FROM sims WHERE status = ? ORDER BY id",
+                    (STATUS_IN_PROGRESS,),
+                )
+            ]
+            conn.execute(
+                "UPDATE sims SET status = ? WHERE status = ?",
+                (STATUS_TODO, STATUS_IN_PROGRESS),
+            )
+            self._fnSetCount(conn, STATUS_IN_PROGRESS, -len(listReset))
+            self._fnSetCount(conn, STATUS_TODO, len(listReset))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return listReset
+
+    def fdictSummary(self):
+        """Count simulations in each state."""
+        dictCounts = dict(
+            self._fConnect().execute("SELECT status, n FROM counts").fetchall()
+        )
+        dictSummary = {
+            "done": dictCounts.get(STATUS_DONE, 0),
+            "in_progress": dictCounts.get(STATUS_IN_PROGRESS, 0),
+            "remaining": dictCounts.get(STATUS_TODO, 0),
+        }
+        dictSummary["total"] = sum(dictSummary.values())
+        return dictSummary
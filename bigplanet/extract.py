@@ -14,7 +14,32 @@ import pandas as pd
 from scipy import stats
 
 from .read import GetVplanetHelp
-from .process import DictToBP
+from .process import DictToBP, fsStorageKind
+
+# Top-level archive names starting with this prefix are reserved for
+# bigplanet's own tables and are never simulation groups.
+RESERVED_PREFIX = "_"
+
+# Consolidated scalar columns, one float64 dataset per key with one row per
+# simulation, in the order given by the COLUMNS_INDEX dataset.
+COLUMNS_GROUP = "_columns"
+COLUMNS_INDEX = "_index"
+
+# Aggregations stored as a single value per simulation
+SCALAR_AGGREGATIONS = ("initial", "final", "option")
+
+# In the ragged layout, forward, backward and seasonal climate data live
+# under this group instead of in the simulation groups: one group per key
+# holding every simulation's values end to end, with offsets into them.
+SERIES_GROUP = "_series"
+
+# Statistics of forward data stored by saPrecomputeStats, as attributes of
+# each simulation group: the statistic keys, the number of rows of each
+# (one per row of its forward dataset), and their values end to end in the
+# same order.
+SUMMARY_KEYS_ATTR = "SummaryKeys"
+SUMMARY_ROWS_ATTR = "SummaryRows"
+SUMMARY_ATTR = "Summary"
 
 
 def BPLFile(hf, ignore_corrupt=False):
@@ -25,6 +50,9 @@ def BPLFile(hf, ignore_corrupt=False):
     Data integrity is now verified using HDF5's built-in Fletcher32 checksums
     on individual datasets rather than file-level MD5 checksums.
 
+    Archives built in shard mode are read the same way: their groups are
+    external links that HDF5 follows into the shard files.
+
     Parameters
     ----------
     hf : str
@@ -40,6 +68,859 @@ def BPLFile(hf, ignore_corrupt=False):
     return h5py.File(hf, "r")
 
 
+class BigPlanetArchive:
+    """
+    A BigPlanet archive or filtered file, indexed once.
+
+    Listing the groups of an archive with many simulations is slow, and
+    every extract function needs them. A handle lists them the first time
+    they are needed, along with the extractable keys, their units and
+    whether the consolidated columns are current, and keeps them for as
+    long as it is open. It supports the read-only parts of h5py.File used
+    here, so the extract functions take a handle wherever they take a
+    file, and it also has them as methods. The file must not be changed
+    while the handle is open.
+
+    Parameters
+    ----------
+    hf : str or h5py.File
+        Path to the file, or the file already opened. A file opened here
+        is closed with the handle.
+    ignore_corrupt : bool, optional
+        Passed to BPLFile when hf is a path
+    """
+
+    def __init__(self, hf, ignore_corrupt=False):
+        self.bOwnsFile = not isinstance(hf, h5py.Group)
+        if self.bOwnsFile:
+            hf = BPLFile(hf, ignore_corrupt)
+        self.hf = hf
+        self.listGroups = None
+        self.listKeys = None
+        self.bColumnsCurrent = None
+        self.dictUnits = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+    def __getitem__(self, sName):
+        return self.hf[sName]
+
+    def __contains__(self, sName):
+        return sName in self.hf
+
+    def keys(self):
+        return self.hf.keys()
+
+    @property
+    def id(self):
+        return self.hf.id
+
+    @property
+    def attrs(self):
+        return self.hf.attrs
+
+    @property
+    def filename(self):
+        return self.hf.filename
+
+    def close(self):
+        """Close the file, if the handle opened it."""
+        if self.bOwnsFile:
+            self.hf.close()
+
+    def flistGroups(self):
+        """Simulation groups, or dataset keys of a filtered file."""
+        if self.listGroups is None:
+            self.listGroups = flistSimulationGroups(self.hf)
+        return self.listGroups
+
+    def fbIsArchive(self):
+        """True for an archive, False for a filtered file."""
+        listGroups = self.flistGroups()
+        return bool(listGroups) and ":" not in listGroups[0]
+
+    def flistKeys(self):
+        """Keys that can be extracted, as flistArchiveKeys."""
+        if self.listKeys is None:
+            self.listKeys = flistReadKeys(self)
+        return self.listKeys
+
+    def fbColumnsAreCurrent(self):
+        """Whether the consolidated columns match the simulation groups."""
+        if self.bColumnsCurrent is None:
+            self.bColumnsCurrent = fbColumnsAreCurrent(
+                self.hf, self.flistGroups()
+            )
+        return self.bColumnsCurrent
+
+    def ExtractColumn(self, k):
+        return ExtractColumn(self, k)
+
+    def ExtractColumnArray(self, k):
+        return ExtractColumnArray(self, k)
+
+    def ExtractColumns(self, keys):
+        return ExtractColumns(self, keys)
+
+    def to_dataframe(self, keys=None):
+        """
+        Return keys as the columns of a DataFrame, as ExtractColumns.
+
+        Parameters
+        ----------
+        keys : list of str, optional
+            Keys to extract (default every initial, final and option key
+            from flistArchiveKeys)
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per simulation and one column per key
+        """
+        if keys is None:
+            keys = [
+                k for k in self.flistKeys()
+                if k.rpartition(":")[2] in SCALAR_AGGREGATIONS
+            ]
+        return ExtractColumns(self, keys)
+
+    def ExtractUnits(self, k):
+        if k not in self.dictUnits:
+            self.dictUnits[k] = fsReadUnits(self, k)
+        return self.dictUnits[k]
+
+    def ExtractUniqueValues(self, k):
+        return ExtractUniqueValues(self, k)
+
+    def ForwardData(self, k):
+        return ForwardData(self, k)
+
+
+def flistSimulationGroups(hf):
+    """
+    Return the top-level names of a BigPlanet file, minus reserved ones.
+
+    For an archive these are the simulation groups; for a filtered file they
+    are the dataset keys.
+
+    Parameters
+    ----------
+    hf : h5py.File
+        Opened BigPlanet file
+
+    Returns
+    -------
+    list of str
+        Top-level names in file order
+    """
+    if isinstance(hf, BigPlanetArchive):
+        return hf.flistGroups()
+    return [
+        sName for sName in hf.keys() if not sName.startswith(RESERVED_PREFIX)
+    ]
+
+
+def flistArchiveKeys(hf):
+    """
+    Return the keys that can be extracted from an archive.
+
+    These are the body:variable:aggregation datasets of the first simulation
+    group, plus any series the archive keeps in the ragged layout. Options
+    with text values, such as file names, are left out since ExtractColumn
+    only returns numbers.
+
+    Parameters
+    ----------
+    hf : h5py.File
+        Opened archive
+
+    Returns
+    -------
+    list of str
+        Keys in file order
+    """
+    if isinstance(hf, BigPlanetArchive):
+        return hf.flistKeys()
+    return flistReadKeys(hf)
+
+
+def flistReadKeys(hf):
+    """List the extractable keys of an archive, as flistArchiveKeys."""
+    listKeys = []
+    key_list = flistSimulationGroups(hf)
+    for k in hf[key_list[0]].keys() if key_list else []:
+        if k.count(":") != 2:
+            continue
+        if not fbIsSeriesKey(k):
+            try:
+                float(hf[key_list[0] + "/" + k][0])
+            except ValueError:
+                continue
+        listKeys.append(k)
+    if key_list:
+        listKeys += list(fdictReadSummary(hf[key_list[0]]))
+    if SERIES_GROUP in hf:
+        listKeys += [k for k in hf[SERIES_GROUP].keys() if k not in listKeys]
+    return listKeys
+
+
+def fdictReadSummary(hSim):
+    """
+    Read the statistics stored with one simulation group.
+
+    Parameters
+    ----------
+    hSim : h5py.Group
+        Simulation group
+
+    Returns
+    -------
+    dict
+        float64 array of each statistic key, with a value per row of its
+        forward dataset, empty if none are stored
+    """
+    if SUMMARY_KEYS_ATTR not in hSim.attrs:
+        return {}
+    listKeys = [
+        k.decode("utf-8") if isinstance(k, bytes) else str(k)
+        for k in hSim.attrs[SUMMARY_KEYS_ATTR]
+    ]
+    daValues = np.asarray(hSim.attrs[SUMMARY_ATTR], dtype=np.float64)
+    daRows = np.asarray(
+        hSim.attrs.get(SUMMARY_ROWS_ATTR, np.ones(len(listKeys))),
+        dtype=np.int64,
+    )
+    daOffsets = np.concatenate(([0], np.cumsum(daRows)))
+    return {
+        k: daValues[daOffsets[i]:daOffsets[i + 1]]
+        for i, k in enumerate(listKeys)
+    }
+
+
+def fdaReadScalarColumn(hf, k, key_list):
+    """
+    Read a scalar column from the archive's consolidated columns.
+
+    The columns are only used if their index lists exactly the simulation
+    groups in key_list, so an archive changed after the columns were built
+    falls back to reading each group.
+
+    Parameters
+    ----------
+    hf : h5py.File
+        Opened archive
+    k : str
+        Column name, e.g. 'earth:Obliquity:final'
+    key_list : list of str
+        Simulation groups, from flistSimulationGroups
+
+    Returns
+    -------
+    np.ndarray or None
+        The column as float64, or None if it is not available
+    """
+    if isinstance(hf, BigPlanetArchive):
+        bCurrent = hf.fbColumnsAreCurrent()
+    else:
+        bCurrent = fbColumnsAreCurrent(hf, key_list)
+    if not bCurrent or k not in hf[COLUMNS_GROUP]:
+        return None
+    return hf[COLUMNS_GROUP][k][()]
+
+
+def fbColumnsAreCurrent(hf, key_list):
+    """
+    Check that an archive's consolidated columns cover its simulations.
+
+    Parameters
+    ----------
+    hf : h5py.File
+        Opened archive
+    key_list : list of str
+        Simulation groups, from flistSimulationGroups
+
+    Returns
+    -------
+    bool
+        True if the columns' index lists exactly the groups in key_list
+    """
+    if COLUMNS_GROUP not in hf:
+        return False
+    hColumns = hf[COLUMNS_GROUP]
+    if COLUMNS_INDEX not in hColumns:
+        return False
+    index = hColumns[COLUMNS_INDEX]
+    if index.shape[0] != len(key_list):
+        return False
+    return list(index.asstr()[()]) == key_list
+
+
+def fdaReadNumbers(dataset):
+    """
+    Read a dataset of single values as float64.
+
+    Values are stored as numbers, but archives written by older versions of
+    BigPlanet hold them as text, which is converted here in one step.
+
+    Parameters
+    ----------
+    dataset : h5py.Dataset
+        Dataset of initial, final or option values
+
+    Returns
+    -------
+    np.ndarray
+        The values as float64
+    """
+    daValues = np.asarray(dataset[()])
+    if daValues.dtype.kind == "O":
+        daValues = daValues.astype("S")
+    return daValues.astype(np.float64)
+
+
+def fbIsSeriesKey(k):
+    """
+    Return True if a key holds a time series rather than a single value.
+
+    Parameters
+    ----------
+    k : str
+        Dataset key, e.g. 'earth:Obliquity:forward'
+
+    Returns
+    -------
+    bool
+        True for forward, backward and seasonal climate keys
+    """
+    return fsStorageKind(k) != "scalar"
+
+
+class RaggedSeries:
+    """
+    One series key of an archive stored in the ragged layout.
+
+    The values of every simulation are read with a single HDF5 read, and
+    indexing by simulation name returns a view into them, reshaped to the
+    shape the simulation's dataset would have had in its own group. If a
+    simulation was written more than once, its last row is used.
+
+    Parameters
+    ----------
+    hf : h5py.File
+        Opened archive
+    k : str
+        Series key, e.g. 'earth:Obliquity:forward'
+    """
+
+    def __init__(self, hf, k):
+        hSeries = hf[SERIES_GROUP][k]
+        listNames = hSeries["names"].asstr()[()]
+        iRows = len(listNames)
+        self.daOffsets = hSeries["offsets"][:iRows + 1]
+        # values past the last row are left over from removed rows
+        self.daValues = hSeries["values"][:self.daOffsets[-1]]
+        self.daShapes = hSeries["shapes"][:iRows]
+        self.sUnits = hSeries.attrs.get("Units", "")
+        self.dictRow = {}
+        for iRow, sName in enumerate(listNames):
+            self.dictRow[sName] = iRow
+
+    def __len__(self):
+        return len(self.dictRow)
+
+    def __contains__(self, sName):
+        return sName in self.dictRow
+
+    def __getitem__(self, sName):
+        iRow = self.dictRow[sName]
+        iNdim = self.daShapes[iRow, 0]
+        return self.daValues[
+            self.daOffsets[iRow]:self.daOffsets[iRow + 1]
+        ].reshape(self.daShapes[iRow, 1:iNdim + 1])
+
+
+def fiterSeriesData(hf, key_list, k):
+    """
+    Yield the data of one key for each simulation group of an archive.
+
+    Simulations stored in the ragged layout give a RaggedSeries view;
+    the others give their dataset. Either can be iterated row by row.
+
+    Parameters
+    ----------
+    hf : h5py.File
+        Opened archive
+    key_list : list of str
+        Simulation groups, from flistSimulationGroups
+    k : str
+        Dataset key
+
+    Yields
+    ------
+    np.ndarray or h5py.Dataset
+        The data for each simulation, in the order of key_list
+    """
+    series = None
+    if SERIES_GROUP in hf and k in hf[SERIES_GROUP]:
+        series = RaggedSeries(hf, k)
+    for key in key_list:
+        if series is not None and key in series:
+            yield series[key]
+        else:
+            yield hf[key + "/" + k]
+
+
+class RaggedColumn:
+    """
+    The rows of one series key across every simulation, end to end.
+
+    Row i is daValues[daOffsets[i]:daOffsets[i + 1]] reshaped to
+    daShapes[i], and indexing returns it as a view. Each simulation group
+    adds the rows of its dataset, so a forward key has one row per
+    simulation holding its time series.
+
+    Parameters
+    ----------
+    daValues : np.ndarray
+        Values of every row, flattened and concatenated
+    daOffsets : np.ndarray
+        Start of each row in daValues, plus the end of the last one
+    daShapes : np.ndarray
+        Shape of each row, one row of daShapes per row of the column
+    """
+
+    def __init__(self, daValues, daOffsets, daShapes):
+        self.daValues = daValues
+        self.daOffsets = daOffsets
+        self.daShapes = daShapes
+
+    def __len__(self):
+        return len(self.daOffsets) - 1
+
+    def __getitem__(self, iRow):
+        iRow = range(len(self))[iRow]
+        return self.daValues[
+            self.daOffsets[iRow]:self.daOffsets[iRow + 1]
+        ].reshape(self.daShapes[iRow])
+
+    def __iter__(self):
+        for iRow in range(len(self)):
+            yield self[iRow]
+
+    def fdaLengths(self):
+        """Number of values in each row."""
+        return np.diff(self.daOffsets)
+
+    def fdaStack(self):
+        """
+        Return the rows as one array, with a leading axis over rows.
+
+        Returns
+        -------
+        np.ndarray
+            View of the values with shape (rows,) + row shape
+
+        Raises
+        ------
+        ValueError
+            If the rows do not all have the same shape
+        """
+        if len(self) == 0:
+            return self.daValues.reshape(0, 0)
+        if not (self.daShapes == self.daShapes[0]).all():
+            raise ValueError("Rows of different shapes cannot be stacked")
+        return self.daValues.reshape((len(self),) + tuple(self.daShapes[0]))
+
+    def fdaReduce(self, ufunc):
+        """
+        Reduce each row with a ufunc, in one call over every row.
+
+        Parameters
+        ----------
+        ufunc : np.ufunc
+            Binary ufunc such as np.add or np.minimum
+
+        Returns
+        -------
+        np.ndarray
+            float64 array with one value per row, NaN for empty rows
+        """
+        daLengths = self.fdaLengths()
+        daResult = np.full(len(self), np.nan)
+        bFull = daLengths > 0
+        if bFull.any():
+            # reduceat reduces from each start to the next one, and empty
+            # rows add no values, so only the starts of full rows are used
+            daResult[bFull] = ufunc.reduceat(
+                self.daValues, self.daOffsets[:-1][bFull]
+            )
+        return daResult
+
+    def fdaMean(self):
+        """Mean of each row."""
+        with np.errstate(invalid="ignore"):
+            return self.fdaReduce(np.add) / self.fdaLengths()
+
+    def fdaStandardDeviation(self):
+        """Sample standard deviation of each row, as statistics.stdev."""
+        daLengths = self.fdaLengths()
+        daDeviations = self.daValues - np.repeat(self.fdaMean(), daLengths)
+        column = RaggedColumn(
+            daDeviations * daDeviations, self.daOffsets, self.daShapes
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(column.fdaReduce(np.add) / (daLengths - 1))
+
+    def fdaMin(self):
+        """Smallest value of each row."""
+        return self.fdaReduce(np.minimum)
+
+    def fdaMax(self):
+        """Largest value of each row."""
+        return self.fdaReduce(np.maximum)
+
+    def fdaFirst(self):
+        """First value of each row."""
+        return self.fdaTake(self.daOffsets[:-1])
+
+    def fdaLast(self):
+        """Last value of each row."""
+        return self.fdaTake(self.daOffsets[1:] - 1)
+
+    def fdaTake(self, daIndices):
+        """Values at one index per row, NaN for empty rows."""
+        daResult = np.full(len(self), np.nan)
+        bFull = self.fdaLengths() > 0
+        daResult[bFull] = self.daValues[daIndices[bFull]]
+        return daResult
+
+    def fdaGeometricMean(self):
+        """Geometric mean of each row, as scipy.stats.gmean."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            column = RaggedColumn(
+                np.log(self.daValues), self.daOffsets, self.daShapes
+            )
+            return np.exp(column.fdaMean())
+
+    def ftModes(self):
+        """
+        Most common value of each row and how often it occurs.
+
+        Like scipy.stats.mode, the smallest value wins a tie and NaNs count
+        as equal to each other and larger than any number.
+
+        Returns
+        -------
+        daModes : np.ndarray
+            float64 array with one value per row, NaN for empty rows
+        daCounts : np.ndarray
+            int64 array with the number of times each mode occurs
+        """
+        daRows = np.repeat(np.arange(len(self)), self.fdaLengths())
+        daOrder = np.lexsort((self.daValues, daRows))
+        daSorted = self.daValues[daOrder]
+        daRows = daRows[daOrder]
+
+        # split the sorted values into runs of one value in one row
+        bNan = np.isnan(daSorted)
+        bNewRun = np.ones(len(daSorted), dtype=bool)
+        bNewRun[1:] = (daSorted[1:] != daSorted[:-1]) & ~(bNan[1:] & bNan[:-1])
+        bNewRun[1:] |= daRows[1:] != daRows[:-1]
+        daRunStarts = np.flatnonzero(bNewRun)
+        daRunCounts = np.diff(np.append(daRunStarts, len(daSorted)))
+        daRunRows = daRows[daRunStarts]
+
+        # the longest run of each row, the first (smallest value) on a tie
+        daBest = np.lexsort(
+            (np.arange(len(daRunStarts)), -daRunCounts, daRunRows)
+        )
+        bFirst = np.ones(len(daBest), dtype=bool)
+        bFirst[1:] = daRunRows[daBest[1:]] != daRunRows[daBest[:-1]]
+        daBest = daBest[bFirst]
+
+        daModes = np.full(len(self), np.nan)
+        daCounts = np.zeros(len(self), dtype=np.int64)
+        daModes[daRunRows[daBest]] = daSorted[daRunStarts[daBest]]
+        daCounts[daRunRows[daBest]] = daRunCounts[daBest]
+        return daModes, daCounts
+
+    def fdaMode(self):
+        """Most common value of each row, as ftModes."""
+        return self.ftModes()[0]
+
+
+def fcolReadSeries(hf, k, key_list=None):
+    """
+    Read one series key of every simulation into a RaggedColumn.
+
+    The column's size is known from the dataset shapes before anything is
+    read, so each simulation's dataset is read with a single HDF5 call
+    straight into its place in one preallocated buffer. Datasets are
+    opened and read through h5py's low-level API, since with one small
+    dataset per simulation the high-level wrappers cost more than the
+    reads.
+
+    Parameters
+    ----------
+    hf : h5py.File
+        Opened archive or filtered file
+    k : str
+        Series key, e.g. 'earth:Obliquity:forward'
+    key_list : list of str, optional
+        Simulation groups, from flistSimulationGroups
+
+    Returns
+    -------
+    RaggedColumn
+        The rows of the key, in the order of key_list
+    """
+    if key_list is None:
+        key_list = flistSimulationGroups(hf)
+    if ":" in key_list[0]:
+        listSources = [hf[k].id]
+    else:
+        series = None
+        if SERIES_GROUP in hf and k in hf[SERIES_GROUP]:
+            series = RaggedSeries(hf, k)
+        listSources = []
+        for key in key_list:
+            if series is not None and key in series:
+                listSources.append(series[key])
+            else:
+                listSources.append(
+                    h5py.h5d.open(hf.id, (key + "/" + k).encode("utf-8"))
+                )
+
+    listShapes = []
+    for source in listSources:
+        listShapes += [source.shape[1:]] * source.shape[0]
+    iNdim = len(listShapes[0]) if listShapes else 0
+    daShapes = np.array(listShapes, dtype=np.int64).reshape(
+        len(listShapes), iNdim
+    )
+    daOffsets = np.zeros(len(listShapes) + 1, dtype=np.int64)
+    np.cumsum(np.prod(daShapes, axis=1), out=daOffsets[1:])
+
+    daValues = np.empty(daOffsets[-1], dtype=np.float64)
+    iRow = 0
+    for source in listSources:
+        iRows = source.shape[0]
+        daDest = daValues[
+            daOffsets[iRow]:daOffsets[iRow + iRows]
+        ].reshape(source.shape)
+        if isinstance(source, np.ndarray):
+            daDest[...] = source
+        elif daDest.size:
+            source.read(h5py.h5s.ALL, h5py.h5s.ALL, daDest)
+        iRow += iRows
+    return RaggedColumn(daValues, daOffsets, daShapes)
+
+
+def fdaExtractScalars(hf, k, key_list=None):
+    """
+    Read the initial, final or option values of one key as float64.
+
+    Uses the archive's consolidated columns when they are up to date, and
+    otherwise reads each simulation's dataset whole.
+
+    Parameters
+    ----------
+    hf : h5py.File
+        Opened archive or filtered file
+    k : str
+        Scalar key, e.g. 'earth:Obliquity:final'
+    key_list : list of str, optional
+        Simulation groups, from flistSimulationGroups
+
+    Returns
+    -------
+    np.ndarray
+        One value per simulation, in the order of key_list
+    """
+    if key_list is None:
+        key_list = flistSimulationGroups(hf)
+    if ":" in key_list[0]:
+        return fdaReadNumbers(hf[k])
+    column = fdaReadScalarColumn(hf, k, key_list)
+    if column is not None:
+        return column
+    if not key_list:
+        return np.empty(0, dtype=np.float64)
+    return np.concatenate(
+        [fdaReadNumbers(hf[key + "/" + k]) for key in key_list]
+    )
+
+
+def fdaReadScalarRows(hf, listKeys, key_list):
+    """
+    Read several scalar keys of every simulation in one pass over the groups.
+
+    Each simulation group is opened once and all of listKeys read from it,
+    through h5py's low-level API as in fcolReadSeries, instead of walking
+    every group once per key.
+
+    Parameters
+    ----------
+    hf : h5py.File
+        Opened archive
+    listKeys : list of str
+        Scalar keys, e.g. 'earth:Obliquity:final'
+    key_list : list of str
+        Simulation groups, from flistSimulationGroups
+
+    Returns
+    -------
+    np.ndarray
+        float64 array with one row per simulation and one column per key
+
+    Raises
+    ------
+    KeyError
+        If a simulation does not have one of the keys
+    ValueError
+        If a simulation has more than one value for a key
+    """
+    listNames = [k.encode("utf-8") for k in listKeys]
+    daValues = np.empty((len(key_list), len(listKeys)), dtype=np.float64)
+    daValue = np.empty(1, dtype=np.float64)
+    for iSim, key in enumerate(key_list):
+        gid = h5py.h5g.open(hf.id, key.encode("utf-8"))
+        for iKey, sName in enumerate(listNames):
+            dsid = h5py.h5d.open(gid, sName)
+            if dsid.shape != (1,):
+                raise ValueError(
+                    f"{key} has {dsid.shape} values for {listKeys[iKey]}"
+                )
+            if dsid.dtype.kind in "fiu":
+                dsid.read(h5py.h5s.ALL, h5py.h5s.ALL, daValue)
+                daValues[iSim, iKey] = daValue[0]
+            else:
+                daValues[iSim, iKey] = fdaReadNumbers(h5py.Dataset(dsid))[0]
+    return daValues
+
+
+# Statistics of forward data, computed on every simulation's series at
+# once from the RaggedColumn of the forward key
+SERIES_STATISTICS = {
+    "mean": RaggedColumn.fdaMean,
+    "stddev": RaggedColumn.fdaStandardDeviation,
+    "min": RaggedColumn.fdaMin,
+    "max": RaggedColumn.fdaMax,
+    "mode": RaggedColumn.fdaMode,
+    "geomean": RaggedColumn.fdaGeometricMean,
+    "first": RaggedColumn.fdaFirst,
+    "last": RaggedColumn.fdaLast,
+}
+
+# scipy does not export the type of its mode results, which ExtractColumn
+# returns for :mode, so it is taken from a result
+ModeResult = type(stats.mode(np.zeros(1)))
+
+
+def fdaReadSummary(hf, k, key_list):
+    """
+    Read a statistic stored with the data, instead of computing it.
+
+    Archives built with saPrecomputeStats hold statistics of each forward
+    key as attributes of every simulation group, and in the consolidated
+    columns; filtered files hold any statistic they were filtered with.
+
+    Parameters
+    ----------
+    hf : h5py.File
+        Opened archive or filtered file
+    k : str
+        Statistic key, e.g. 'earth:Obliquity:mean'
+    key_list : list of str
+        Simulation groups, from flistSimulationGroups
+
+    Returns
+    -------
+    np.ndarray or None
+        The statistic of each simulation, or None if it is not stored for
+        every simulation
+    """
+    if ":" in key_list[0]:
+        return fdaReadNumbers(hf[k]) if k in hf else None
+    column = fdaReadScalarColumn(hf, k, key_list)
+    if column is not None:
+        return column
+    listStats = []
+    for key in key_list:
+        dictSummary = fdictReadSummary(hf[key])
+        if k not in dictSummary:
+            # e.g. simulations archived before the statistics were turned on,
+            # or whose forward file was streamed
+            return None
+        listStats.append(dictSummary[k])
+    return np.concatenate(listStats)
+
+
+def ExtractColumnArray(hf, k):
+    """
+    Returns all the data for a single key (column) as NumPy arrays.
+
+    Reads each dataset whole rather than element by element, so this is
+    much faster than ExtractColumn on large archives.
+
+    Parameters
+    ----------
+    hf : File
+        The HDF5 where the data is stored.
+    k : str
+        the name of the column that is to be extracted, as for
+        ExtractColumn
+
+    Returns
+    -------
+    np.ndarray or RaggedColumn
+        For initial, final and option values and for statistics, a
+        float64 array with one value per simulation. For forward, backward
+        and climate data, a RaggedColumn with one row per row of each
+        simulation's dataset. For OutputOrder and GridOutputOrder, an
+        array of the names and units. Statistics stored in the file are
+        read rather than computed from the forward data.
+    """
+    key_list = flistSimulationGroups(hf)
+    archive = ":" not in key_list[0]
+
+    var = k.split(":")[1]
+
+    if var == "OutputOrder" or var == "GridOutputOrder":
+        if archive == True:
+            dataset = hf[key_list[0] + "/" + k]
+        else:
+            dataset = hf[k]
+        return np.array(
+            [value.decode("UTF-8") for value in np.ravel(dataset[()])],
+            dtype=str,
+        )
+
+    aggreg = k.split(":")[2]
+
+    if aggreg == "forward" or aggreg == "backward" or aggreg == "climate":
+        return fcolReadSeries(hf, k, key_list)
+
+    if aggreg in SERIES_STATISTICS:
+        daSummary = fdaReadSummary(hf, k, key_list)
+        if daSummary is not None:
+            return daSummary
+        forward = k.rpartition(":")[0] + ":forward"
+        column = fcolReadSeries(hf, forward, key_list)
+        return SERIES_STATISTICS[aggreg](column)
+
+    if aggreg == "initial" or aggreg == "final" or aggreg == "option":
+        return fdaExtractScalars(hf, k, key_list)
+
+    print("ERROR: Uknown aggregation option: ", aggreg)
+    exit()
+
+
 def ExtractColumn(hf, k):
     """
     Returns all the data for a single key (column) in a given HDF5 file.
@@ -62,101 +943,98 @@ def ExtractColumn(hf, k):
 
             Note: The following statistics only will work with forward data
             mean (mean), mode (mode), standard deviation (stddev),
-            min (min), max (max), gemoetric mean (geomean)
+            min (min), max (max), gemoetric mean (geomean),
+            first value (first), last value (last)
 
     Returns
     -------
-    data : np.array
-        A numpy array of the column of table of values
+    data : list
+        The values of the column. ExtractColumnArray returns the same data
+        as NumPy arrays.
 
 
     """
-    data = []
-    archive = False
-
-    key_list = list(hf.keys())
+    if k.endswith(":mode"):
+        # the mode keeps scipy's result, with its count, for each simulation
+        forward = k.rpartition(":")[0] + ":forward"
+        daModes, daCounts = fcolReadSeries(hf, forward).ftModes()
+        return [
+            ModeResult(dMode, iCount)
+            for dMode, iCount in zip(daModes, daCounts)
+        ]
+
+    data = ExtractColumnArray(hf, k)
+    if isinstance(data, RaggedColumn):
+        return list(data)
+    return data.tolist()
+
+
+def ExtractColumns(hf, keys):
+    """
+    Returns several keys (columns) of a given HDF5 file as one DataFrame.
 
-    if ":" not in key_list[0]:
-        archive = True
+    Calling ExtractColumn once per key walks every simulation group once
+    per key. ExtractColumns reads all initial, final and option keys in a
+    single pass over the groups, or from the consolidated columns when
+    they are up to date.
 
-    var = k.split(":")[1]
+    Parameters
+    ----------
+    hf : File
+        The HDF5 where the data is stored.
+    keys : list of str
+        the names of the columns that are to be extracted. Each must have
+        one value per simulation: an initial, final or option value, or a
+        statistic of forward data.
 
-    if var == "OutputOrder" or var == "GridOutputOrder":
-        if archive == True:
-            dataset = hf[key_list[0] + "/" + k]
-            for d in dataset:
-                for value in d:
-                    data.append(value.decode("UTF-8"))
-        else:
-            for v in hf[k]:
-                for item in v:
-                    data.append(item.decode("UTF-8"))
+    Returns
+    -------
+    df : pd.DataFrame
+        One column per key. Archives are indexed by simulation name, and
+        filtered files by row number. df.attrs["Units"] maps each key to
+        its units.
+
+    Raises
+    ------
+    ValueError
+        If a key holds a series, such as forward data, or OutputOrder
+    """
+    key_list = flistSimulationGroups(hf)
+    archive = ":" not in key_list[0]
 
-    else:
+    dictColumns = {}
+    listRead = []
+    for k in keys:
         aggreg = k.split(":")[2]
-
-        if aggreg == "forward" or aggreg == "backward" or aggreg == "climate":
-            if archive == True:
-                for key in key_list:
-                    dataset = hf[key + "/" + k]
-                    for d in dataset:
-                        data.append(d)
+        if aggreg in SCALAR_AGGREGATIONS:
+            if archive:
+                column = fdaReadScalarColumn(hf, k, key_list)
             else:
-                dataset = hf[k]
-                for d in dataset:
-                    data.append(d)
-
-        elif aggreg == "mean":
-            argument = ForwardData(hf, k)
-            # print(argument)
-            for i in argument:
-                data.append((st.mean(i)))
-
-        elif aggreg == "stddev":
-            argument = ForwardData(hf, k)
-            # print(argument)
-            for i in argument:
-                data.append((st.stdev(i)))
-
-        elif aggreg == "min":
-            argument = ForwardData(hf, k)
-            # print(argument)
-            for i in argument:
-                data.append((min(i)))
-
-        elif aggreg == "max":
-            argument = ForwardData(hf, k)
-            # print(argument)
-            for i in argument:
-                data.append((max(i)))
-
-        elif aggreg == "mode":
-            argument = ForwardData(hf, k)
-            # print(argument)
-            for i in argument:
-                data.append((stats.mode(i)))
-
-        elif aggreg == "geomean":
-            argument = ForwardData(hf, k)
-            # print(argument)
-            for i in argument:
-                data.append((stats.gmean(i)))
-
-        elif aggreg == "initial" or aggreg == "final" or aggreg == "option":
-            if archive == True:
-                for key in key_list:
-                    dataset = hf[key + "/" + k]
-                    for d in dataset:
-                        data.append(float(d))
+                column = fdaReadNumbers(hf[k])
+            if column is None:
+                listRead.append(k)
             else:
-                for d in hf[k]:
-                    data.append(float(d))
-
+                dictColumns[k] = column
+        elif aggreg in SERIES_STATISTICS:
+            dictColumns[k] = ExtractColumnArray(hf, k)
         else:
-            print("ERROR: Uknown aggregation option: ", aggreg)
-            exit()
-
-    return data
+            raise ValueError(f"{k} does not have one value per simulation")
+    if listRead:
+        daValues = fdaReadScalarRows(hf, listRead, key_list)
+        for iKey, k in enumerate(listRead):
+            dictColumns[k] = daValues[:, iKey]
+
+    index = pd.Index(key_list, name="simulation") if archive else None
+    df = pd.DataFrame({k: dictColumns[k] for k in keys}, index=index)
+    dictUnits = {}
+    for k in keys:
+        if k.split(":")[2] in SERIES_STATISTICS:
+            # statistics have the units of the forward data they summarise
+            dictUnits[k] = ExtractUnits(hf, k.rpartition(":")[0] + ":forward")
+        else:
+            dictUnits[k] = ExtractUnits(hf, k)
+    df.attrs["Units"] = dictUnits
+    return df
 
 
 def ExtractUnits(hf, k):
@@ -188,33 +1066,30 @@ def ExtractUnits(hf, k):
     units : string
         A string value of the units
     """
-    key_list = list(hf.keys())
+    if isinstance(hf, BigPlanetArchive):
+        return hf.ExtractUnits(k)
+    return fsReadUnits(hf, k)
+
 
+def fsReadUnits(hf, k):
+    """Read the Units attribute of a key, as ExtractUnits."""
+    key_list = flistSimulationGroups(hf)
+
+    if ":" not in key_list[0] and SERIES_GROUP in hf and k in hf[SERIES_GROUP]:
+        return hf[SERIES_GROUP][k].attrs.get("Units")
     if ":" not in key_list[0]:
-        dataset = hf[key_list[0] + "/" + k]
+        sPath = key_list[0] + "/" + k
     else:
-        dataset = hf[k]
-    return dataset.attrs.get("Units")
+        sPath = k
+    if sPath not in hf and k.rpartition(":")[-1] in SERIES_STATISTICS:
+        # a statistic stored as an attribute has its forward key's units
+        return fsReadUnits(hf, k.rpartition(":")[0] + ":forward")
+    return hf[sPath].attrs.get("Units")
 
 
 def ForwardData(hf, k):
-    data = []
-    key_list = list(hf.keys())
     forward = k.rpartition(":")[0] + ":forward"
-    # if hf is an archive file
-    if ":" not in key_list[0]:
-        for key in key_list:
-            dataset = hf[key + "/" + forward]
-            for d in dataset:
-                data.append(d)
-                # for v in d:
-                # data.append(v)
-    else:
-        dataset = hf[forward]
-        for d in dataset:
-            data.append(d)
-
-    return data
+    return list(fcolReadSeries(hf, forward))
 
 
 def HFD5Decoder(dataset):
@@ -257,21 +1132,7 @@ def ExtractUniqueValues(hf, k):
     unique : np.array
         A numpy array of the unique values in key
     """
-    key_list = list(hf.keys())
-    data = []
-    archive = False
-
-    if ":" not in key_list[0]:
-        archive = True
-
-    if archive == True:
-        for key in key_list:
-            dataset = hf[key + "/" + k]
-            for d in dataset:
-                data.append(float(d.decode("UTF-8")))
-    else:
-        for d in hf[k]:
-            data.append(float(d.decode("UTF-8")))
+    data = fdaExtractScalars(hf, k)
 
     unique = np.unique(data).tolist()
     return unique
@@ -364,6 +1225,9 @@ def ArchiveToFiltered(inputfile, columns, exportfile):
         True/False boolean determing if the output file will be in VR Ulysses format
         If True, the output file will have headers, and be named 'User.csv'
     """
+    if not isinstance(inputfile, BigPlanetArchive):
+        with BigPlanetArchive(inputfile) as archive:
+            return ArchiveToFiltered(archive, columns, exportfile)
     export = {}
     units = {}
     for i in columns:
@@ -413,6 +1277,11 @@ def ArchiveToCSV(
         True/False boolean determing if the output file will be in VR Ulysses format
         If True, the output file will have headers, and be named 'User.csv'
     """
+    if not isinstance(inputfile, BigPlanetArchive):
+        with BigPlanetArchive(inputfile) as archive:
+            return ArchiveToCSV(
+                archive, columns, exportfile, delim, header, ulysses, group
+            )
     export = []
     units = []
 
@@ -421,7 +1290,7 @@ def ArchiveToCSV(
             export.append(ExtractColumn(inputfile, i))
             units.append(ExtractUnits(inputfile, i))
         else:
-            data = inputfile[group][i][0]
+            data = next(fiterSeriesData(inputfile, [group], i))[0]
             for i in data:
                 export.append(i)
 
@@ -2,9 +2,13 @@
 
 import argparse
 import csv
+import fnmatch
+import functools
+import json
 import multiprocessing as mp
 import os
 import pathlib
+import shutil
 import subprocess as sub
 import sys
 
@@ -12,10 +16,28 @@ import h5py
 import numpy as np
 import pandas as pd
 
+from .archive import fsSimulationManifest
+from .cache import PARSE_CACHE_MB, ParseCache
 from .extract import *
 from .read import *
 from .process import *
 
+# The last part of a key decides which files SplitsaKey reads it from
+LOG_AGGREGATIONS = ("initial", "final", "OutputOption", "GridOutputOption")
+FORWARD_AGGREGATIONS = (
+    "forward", "mean", "mode", "max", "min", "geomean", "stddev"
+)
+
+# Finished simulations of a raw-data filter are listed next to its output,
+# in a hidden file with this suffix, until the output is written. Without a
+# parse cache, what they parsed to is kept in a ParseCache in a folder with
+# FILTER_CACHE_SUFFIX added, from which a resumed filter rebuilds them.
+FILTER_JOURNAL_SUFFIX = ".journal"
+FILTER_CACHE_SUFFIX = ".cache"
+
+# Largest number of simulations handed to a filter worker at once
+FILTER_CHUNK_MAX = 64
+
 
 def fbCheckOutputExists(sOutputPath, iUlysses, bOverride):
     """Check if output file exists and determine if should proceed."""
@@ -27,24 +49,25 @@ def fbCheckOutputExists(sOutputPath, iUlysses, bOverride):
     return True
 
 
-def fnProcessLogKeys(listInclude, dictData, sSystemName, listBodyNames,
-                     sLogFile, sFolder, bVerbose):
+def fnProcessLogKeys(selKeys, dictData, sSystemName, listBodyNames,
+                     sLogFile, sFolder, bVerbose, cache=None, log=None):
     """Process log file keys (initial/final values)."""
     if bVerbose:
         print("Processing Log file", sLogFile)
-    return ProcessLogFile(
-        sLogFile, dictData, sFolder, bVerbose, incl=listInclude
-    )
+    if log is None:
+        log = ParsedLog(sLogFile, sFolder, bVerbose, cache=cache)
+    return log.fdictSelect(dictData, selKeys)
 
 
-def fnProcessOptionKeys(listInclude, listInfiles, dictData, sFolder,
-                        dictVplanetHelp, bVerbose):
+def fnProcessOptionKeys(selKeys, listInfiles, dictData, sFolder,
+                        dictVplanetHelp, bVerbose, cache=None):
     """Process option/input file keys."""
     for sInfile in listInfiles:
         if bVerbose:
             print("Processing input file", sInfile)
         dictData = ProcessInputfile(
-            dictData, sInfile, sFolder, dictVplanetHelp, bVerbose, incl=listInclude
+            dictData, sInfile, sFolder, dictVplanetHelp, bVerbose,
+            incl=selKeys, cache=cache,
         )
     return dictData
 
@@ -53,85 +76,311 @@ def fsGetOutputFilename(sBody, sSystemName, dictData, sFileType):
     """Determine output filename based on sOutFile or defaults."""
     sOutfileKey = sBody + ":sOutFile:option"
     if sOutfileKey in dictData:
-        return dictData[sOutfileKey]
+        sOutfile = dictData[sOutfileKey]
+        # parsed options are [units, value, ...]; the last is this simulation's
+        if isinstance(sOutfile, list):
+            sOutfile = sOutfile[-1]
+        return sOutfile
     return f"{sSystemName}.{sBody}.{sFileType}"
 
 
-def fnProcessForwardKeys(listInclude, listBodyNames, dictData, sSystemName,
-                         sLogFile, sFolder, bVerbose):
+def fbOutputFileExists(sFolder, sFile, bVerbose):
+    """Check that an output file matched by the selected keys was written."""
+    if os.path.isfile(os.path.join(sFolder, sFile)):
+        return True
+    if bVerbose:
+        print("Skipping missing output file", os.path.join(sFolder, sFile))
+    return False
+
+
+def fnProcessForwardKeys(selKeys, listBodyNames, dictData, sSystemName,
+                         sLogFile, sFolder, bVerbose, cache=None, log=None):
     """Process forward evolution file keys."""
+    if log is None:
+        log = ParsedLog(sLogFile, sFolder, bVerbose, cache=cache)
     print("Forward file data requested")
     for sBody in listBodyNames:
         print(sBody)
-        if not any(sBody in s for s in listInclude):
+        if not selKeys.fbMatchesBody(sBody):
             continue
 
         sForwardName = fsGetOutputFilename(sBody, sSystemName, dictData, "forward")
+        if not fbOutputFileExists(sFolder, sForwardName, bVerbose):
+            continue
 
-        listHeader = [sBody + ":" + "OutputOrder"]
-        dictHeading = {}
         print("Obtaining Header for Logfile...")
-        dictHeading = ProcessLogFile(
-            sLogFile, dictHeading, sFolder, bVerbose, incl=listHeader
-        )
+        dictHeading = log.fdictHeading(sBody)
 
         print("Processing Forward File", sForwardName)
         dictData = ProcessOutputfile(
             sForwardName, dictData, sBody, dictHeading, ":forward",
-            sFolder, bVerbose, incl=listInclude,
+            sFolder, bVerbose, incl=selKeys, cache=cache,
         )
     return dictData
 
 
-def fnProcessBackwardKeys(listInclude, listBodyNames, dictData, sSystemName,
-                          sLogFile, sFolder, bVerbose):
+def fnProcessBackwardKeys(selKeys, listBodyNames, dictData, sSystemName,
+                          sLogFile, sFolder, bVerbose, cache=None, log=None):
     """Process backward evolution file keys."""
+    if log is None:
+        log = ParsedLog(sLogFile, sFolder, bVerbose, cache=cache)
     print("Processing Backwards File")
     for sBody in listBodyNames:
-        if not any(sBody in s for s in listInclude):
+        if not selKeys.fbMatchesBody(sBody):
             continue
 
         sBackwardName = fsGetOutputFilename(sBody, sSystemName, dictData, "backward")
+        if not fbOutputFileExists(sFolder, sBackwardName, bVerbose):
+            continue
 
-        listHeader = [sBody + ":" + "OutputOrder"]
-        dictHeading = {}
-        dictHeading = ProcessLogFile(
-            sLogFile, dictHeading, sFolder, bVerbose, incl=listHeader
-        )
+        dictHeading = log.fdictHeading(sBody)
         dictData = ProcessOutputfile(
             sBackwardName, dictData, sBody, dictHeading, ":backward",
-            sFolder, bVerbose, incl=listInclude,
+            sFolder, bVerbose, incl=selKeys, cache=cache,
         )
     return dictData
 
 
-def fnProcessClimateKeys(listInclude, listBodyNames, dictData, sSystemName,
-                         sLogFile, sFolder, bVerbose):
+def fnProcessClimateKeys(selKeys, listBodyNames, dictData, sSystemName,
+                         sLogFile, sFolder, bVerbose, cache=None, log=None):
     """Process climate file keys."""
+    if log is None:
+        log = ParsedLog(sLogFile, sFolder, bVerbose, cache=cache)
     for sBody in listBodyNames:
-        if not any(sBody in s for s in listInclude):
+        if not selKeys.fbMatchesBody(sBody):
             continue
 
-        listHeader = [sBody + ":" + "GridOutputOrder"]
         sClimateName = f"{sSystemName}.{sBody}.Climate"
+        if not fbOutputFileExists(sFolder, sClimateName, bVerbose):
+            continue
 
-        dictHeading = {}
-        dictHeading = ProcessLogFile(
-            sLogFile, dictHeading, sFolder, bVerbose, incl=listHeader
-        )
+        dictHeading = log.fdictHeading(sBody, "GridOutputOrder")
         dictData = ProcessOutputfile(
             sClimateName, dictData, sBody, dictHeading, ":climate",
-            sFolder, bVerbose, incl=listInclude,
+            sFolder, bVerbose, incl=selKeys, cache=cache,
         )
     return dictData
 
 
+def fdictFilterSimulation(sFolder, listKinds, sSystemName, listBodyNames,
+                          sLogFile, listInfiles, dictVplanetHelp, bVerbose,
+                          cache=None):
+    """
+    Read the selected keys of one simulation folder.
+
+    Parameters
+    ----------
+    sFolder : str
+        Simulation folder
+    listKinds : list of tuple
+        (kind, KeySelector) for each kind of file to read: "log",
+        "option", "forward", "backward" or "climate"
+    sSystemName : str
+        System name
+    listBodyNames : list of str
+        Body names
+    sLogFile : str
+        Log file name
+    listInfiles : list of str
+        Body and primary input files
+    dictVplanetHelp : dict
+        Parsed vplanet -H output
+    bVerbose : bool
+        Verbose output flag
+    cache : ParseCache, optional
+        Cache of parsed files
+
+    Returns
+    -------
+    dict
+        Data dictionary of this simulation alone
+    """
+    dictData = {}
+    # every handler queries the same log, which is read at most once
+    log = ParsedLog(sLogFile, sFolder, bVerbose, cache=cache)
+    for sKind, selKeys in listKinds:
+        if sKind == "log":
+            dictData = fnProcessLogKeys(selKeys, dictData, sSystemName,
+                                        listBodyNames, sLogFile, sFolder,
+                                        bVerbose, cache, log)
+        elif sKind == "option":
+            dictData = fnProcessOptionKeys(selKeys, listInfiles, dictData,
+                                           sFolder, dictVplanetHelp,
+                                           bVerbose, cache)
+        elif sKind == "forward":
+            dictData = fnProcessForwardKeys(selKeys, listBodyNames, dictData,
+                                            sSystemName, sLogFile, sFolder,
+                                            bVerbose, cache, log)
+        elif sKind == "backward":
+            dictData = fnProcessBackwardKeys(selKeys, listBodyNames, dictData,
+                                             sSystemName, sLogFile, sFolder,
+                                             bVerbose, cache, log)
+        elif sKind == "climate":
+            dictData = fnProcessClimateKeys(selKeys, listBodyNames, dictData,
+                                            sSystemName, sLogFile, sFolder,
+                                            bVerbose, cache, log)
+    return dictData
+
+
+def fsFilterJournal(sOutput):
+    """Path of the journal kept while filtering raw data into sOutput."""
+    sDir, sName = os.path.split(os.path.abspath(sOutput))
+    return os.path.join(sDir, "." + sName + FILTER_JOURNAL_SUFFIX)
+
+
+class FilterJournal:
+    """
+    The simulations a raw-data filter has finished, on disk.
+
+    The journal is a JSON header describing the filter, followed by one
+    [folder, manifest] line per finished simulation. The manifest, from
+    fsSimulationManifest, records the size and mtime of the folder's raw
+    files when they were read. The journal holds no data: a filter that
+    is interrupted resumes from the records of a journal with the same
+    header, and rebuilds their data through its ParseCache. A line cut
+    short by the interruption is dropped, and a folder that no longer
+    matches its manifest is read again.
+
+    Parameters
+    ----------
+    sOutput : str
+        Path to the filtered output file
+    dictHeader : dict
+        JSON settings the results depend on, such as the selected keys
+        and the simulation list
+    """
+
+    def __init__(self, sOutput, dictHeader):
+        self.sPath = fsFilterJournal(sOutput)
+        self.dictHeader = dictHeader
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.fnClose()
+        return False
+
+    def flistResume(self):
+        """
+        Read the saved records and open the journal for appending.
+
+        Returns
+        -------
+        list of str
+            Folders of the finished simulations whose raw files are
+            unchanged; empty if there is no journal or it belongs to
+            another filter
+        """
+        dictManifests = {}
+        iEnd = 0
+        try:
+            with open(self.sPath, "rb") as f:
+                if json.loads(f.readline()) == self.dictHeader:
+                    iEnd = f.tell()
+                    for byLine in f:
+                        if not byLine.endswith(b"\n"):
+                            break
+                        sFolder, sManifest = json.loads(byLine)
+                        dictManifests[sFolder] = sManifest
+                        iEnd = f.tell()
+        except (OSError, ValueError):
+            pass
+
+        if iEnd:
+            self.file = open(self.sPath, "r+b")
+            self.file.truncate(iEnd)
+            self.file.seek(iEnd)
+        else:
+            self.file = open(self.sPath, "wb")
+            self.fnDump(self.dictHeader)
+        # the raw files of the others changed since they were read
+        return [
+            sFolder for sFolder, sManifest in dictManifests.items()
+            if sManifest == fsSimulationManifest(sFolder)
+        ]
+
+    def fnAppend(self, sFolder, sManifest):
+        """
+        Record one finished simulation.
+
+        sManifest is the fsSimulationManifest of sFolder, taken before its
+        files were read.
+        """
+        self.fnDump([sFolder, sManifest])
+
+    def fnDump(self, record):
+        self.file.write(json.dumps(record).encode("utf-8") + b"\n")
+        self.file.flush()
+
+    def fnClose(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def fnRemove(self):
+        """Close and delete the journal once the output is written."""
+        self.fnClose()
+        if os.path.exists(self.sPath):
+            os.remove(self.sPath)
+
+
+def ftJournalSimulation(sFolder, fnFilterSimulation):
+    """
+    Read one folder for the journal.
+
+    Returns
+    -------
+    tuple
+        (manifest, data dictionary), the manifest from fsSimulationManifest
+        taken before the files are read, so a change while they are read
+        is caught on resume
+    """
+    sManifest = fsSimulationManifest(sFolder)
+    return sManifest, fnFilterSimulation(sFolder)
+
+
+def fiterFilterSimulations(listSims, fnFilterSimulation, iCores):
+    """
+    Yield the data dictionary of each simulation, in the order of listSims.
+
+    Parameters
+    ----------
+    listSims : list of str
+        Simulation folders
+    fnFilterSimulation : callable
+        Reads one folder, as fdictFilterSimulation with its other
+        arguments bound. Must be picklable when iCores > 1.
+    iCores : int
+        Number of worker processes; 1 reads in this process
+
+    Yields
+    ------
+    tuple
+        (folder, data dictionary)
+    """
+    iCores = max(1, min(iCores, len(listSims)))
+    if iCores == 1:
+        for sFolder in listSims:
+            yield sFolder, fnFilterSimulation(sFolder)
+        return
+
+    iChunk = max(1, min(FILTER_CHUNK_MAX, len(listSims) // (4 * iCores)))
+    with mp.Pool(iCores) as pool:
+        yield from zip(
+            listSims, pool.imap(fnFilterSimulation, listSims, iChunk)
+        )
+
+
 def fnWriteFilteredOutput(dictData, sOutput, iUlysses, dictVplanetHelp, bVerbose):
     """Write filtered data to HDF5 or CSV."""
     if iUlysses == 1:
         DictToCSV(dictData, ulysses=True)
     else:
-        with h5py.File(sOutput, "w") as hFilter:
+        with h5py.File(
+            sOutput, "w", libver=ARCHIVE_LIBVER
+        ) as hFilter:
             DictToBP(
                 dictData, dictVplanetHelp, hFilter, bVerbose,
                 group_name=None, archive=False,
@@ -162,23 +411,25 @@ def SplitsaKey(saKeylist, verbose):
     for item in saKeylist:
         # to figure out what list they belong in, we have to rpartion them and look at the last word
         spl = item.rpartition(":")
-        if (
-            spl[-1] == "initial"
-            or spl[-1] == "final"
-            or spl[-1] == "OutputOption"
-            or spl[-1] == "GridOutputOption"
-        ):
+        # a pattern such as 'earth:*' can select keys from several files
+        if fbIsKeyPattern(spl[-1]):
+            for listKeys, tAggregations in (
+                (loglist, LOG_AGGREGATIONS),
+                (forwardlist, FORWARD_AGGREGATIONS),
+                (bodylist, ("option",)),
+                (climatelist, ("climate",)),
+                (backwardlist, ("backward",)),
+            ):
+                if not spl[1] or any(
+                    fnmatch.fnmatchcase(sAggregation, spl[-1])
+                    for sAggregation in tAggregations
+                ):
+                    listKeys.append(item)
+            continue
+        if spl[-1] in LOG_AGGREGATIONS:
             loglist.append(item)
         # check if its forward or any of the statsitical functions
-        elif (
-            spl[-1] == "forward"
-            or spl[-1] == "mean"
-            or spl[-1] == "mode"
-            or spl[-1] == "max"
-            or spl[-1] == "min"
-            or spl[-1] == "geomean"
-            or spl[-1] == "stddev"
-        ):
+        elif spl[-1] in FORWARD_AGGREGATIONS:
             forwardlist.append(item)
         # checks if its a body file
         elif spl[-1] == "option":
@@ -198,12 +449,14 @@ def SplitsaKey(saKeylist, verbose):
     return loglist, bodylist, forwardlist, climatelist, backwardlist
 
 
-def Filter(file, quiet, verbose, ignorecorrupt, override):
+def Filter(file, quiet, verbose, ignorecorrupt, override, cores=1):
     """
     Create filtered BigPlanet file from archive or raw data.
 
     Orchestrates filtering by reading configuration, checking if archive
     exists (fast path) or processing raw simulation data (slow path).
+    The slow path reads the simulations on cores processes and keeps a
+    journal of finished simulations, so an interrupted filter resumes.
     """
     (folder, bplArchive, output, bodyFileList, primaryFile, IncludeList,
      ExcludeList, Ulysses, SimName) = ReadFile(file, verbose, archive=False)
@@ -216,24 +469,47 @@ def Filter(file, quiet, verbose, ignorecorrupt, override):
         print("Overriding output file...")
         sub.run(["rm", output])
 
+    # without saKeyInclude, every key not in saKeyExclude is kept
+    if not IncludeList:
+        IncludeList = None
+    selKeys = KeySelector(IncludeList, ExcludeList)
+
     # Fast path: extract from archive if exists
     if os.path.isfile(bplArchive):
-        hArchive = BPLFile(bplArchive, ignorecorrupt)
-        fnExtractFromArchive(hArchive, IncludeList, output, Ulysses, SimName)
+        with BigPlanetArchive(bplArchive, ignorecorrupt) as hArchive:
+            listKeys = selKeys.flistSelect(flistArchiveKeys(hArchive))
+            fnExtractFromArchive(hArchive, listKeys, output, Ulysses, SimName)
         return
 
     # Slow path: process from raw simulation data
     print("WARNING: BPA File does not exist. Obtaining data from source folder. This make take some time...")
 
-    if not IncludeList:
+    if IncludeList is None and not ExcludeList:
         return
 
     vplHelp = GetVplanetHelp()
     infile_list = bodyFileList + [primaryFile]
 
+    # repeated filters of the same folders can reuse what each file parsed
+    # to, and so can a filter resuming from its journal
+    dictCache = ReadParseCacheOptions(file)
+    iCacheMB = dictCache.get("iParseCacheMB", PARSE_CACHE_MB)
+    sJournalCache = None
+    if dictCache.get("bParseCache"):
+        cache = ParseCache(iMaxBytes=iCacheMB * 1024 ** 2, vplanet_help=vplHelp)
+    else:
+        sJournalCache = fsFilterJournal(output) + FILTER_CACHE_SUFFIX
+        cache = ParseCache(
+            sJournalCache, iCacheMB * 1024 ** 2, vplanet_help=vplHelp
+        )
+
     loglist, optionList, forwardlist, climatelist, backwardlist = SplitsaKey(
-        IncludeList, verbose
+        IncludeList or ["*"], verbose
     )
+    # one selector per kind of file, so bodies are only read for their keys
+    selForward = KeySelector(forwardlist, ExcludeList)
+    selBackward = KeySelector(backwardlist, ExcludeList)
+    selClimate = KeySelector(climatelist, ExcludeList)
 
     if SimName:
         simList = GetSims(folder, simname=SimName)
@@ -244,28 +520,50 @@ def Filter(file, quiet, verbose, ignorecorrupt, override):
 
     system_name, body_names = GetSNames(infile_list, simList)
     log_file = GetLogName(infile_list, simList, system_name)
-    data = {}
-
-    for sim in simList:
-        if loglist:
-            data = fnProcessLogKeys(IncludeList, data, system_name, body_names,
-                                   log_file, sim, verbose)
-            print(data)
 
-        if optionList:
-            data = fnProcessOptionKeys(IncludeList, infile_list, data, sim,
-                                      vplHelp, verbose)
-
-        if forwardlist:
-            data = fnProcessForwardKeys(forwardlist, body_names, data,
-                                       system_name, log_file, sim, verbose)
-
-        if backwardlist:
-            data = fnProcessBackwardKeys(backwardlist, body_names, data,
-                                        system_name, log_file, sim, verbose)
-
-        if climatelist:
-            data = fnProcessClimateKeys(climatelist, body_names, data,
-                                       system_name, log_file, sim, verbose)
+    listKinds = [
+        (sKind, selKind)
+        for sKind, listKind, selKind in (
+            ("log", loglist, selKeys),
+            ("option", optionList, selKeys),
+            ("forward", forwardlist, selForward),
+            ("backward", backwardlist, selBackward),
+            ("climate", climatelist, selClimate),
+        )
+        if listKind
+    ]
+    fnFilterSimulation = functools.partial(
+        fdictFilterSimulation, listKinds=listKinds, sSystemName=system_name,
+        listBodyNames=body_names, sLogFile=log_file, listInfiles=infile_list,
+        dictVplanetHelp=vplHelp, bVerbose=verbose, cache=cache,
+    )
 
-    fnWriteFilteredOutput(data, output, Ulysses, vplHelp, verbose)
+    dictHeader = {
+        "sims": simList,
+        "infiles": infile_list,
+        "include": IncludeList,
+        "exclude": ExcludeList,
+    }
+    data = {}
+    with FilterJournal(output, dictHeader) as journal:
+        setDone = set(journal.flistResume())
+        if setDone and not quiet:
+            print(f"Resuming filter: {len(setDone)} of {len(simList)} "
+                  "simulations already read")
+
+        # finished simulations are rebuilt from the cache, in order
+        for sFolder, (sManifest, dictSim) in fiterFilterSimulations(
+            simList,
+            functools.partial(
+                ftJournalSimulation, fnFilterSimulation=fnFilterSimulation
+            ),
+            cores,
+        ):
+            if sFolder not in setDone:
+                journal.fnAppend(sFolder, sManifest)
+            fdictMergeParsed(data, dictSim)
+
+        fnWriteFilteredOutput(data, output, Ulysses, vplHelp, verbose)
+        journal.fnRemove()
+    if sJournalCache is not None:
+        shutil.rmtree(sJournalCache, ignore_errors=True)
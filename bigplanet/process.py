@@ -1,19 +1,274 @@
 #!/usr/bin/env python
 
+import fnmatch
+import functools
+import io
+import mmap
 import os
+import re
+import warnings
 
 import h5py
 import numpy as np
 import pandas as pd
 
+COMPRESSIONS = ("gzip", "lzf", "none")
+
+# Storage settings for each kind of dataset. "forward" covers forward and
+# backward time series, "climate" the seasonal climate grids, and "scalar"
+# everything else: initial, final and option values and output orders.
+# Options from bpl.in or the command line apply to forward and climate data.
+STORAGE_DEFAULTS = {
+    "forward": {
+        "sCompression": "gzip",
+        "iCompressionLevel": 4,
+        "bShuffle": True,
+        "iScaleOffset": None,
+    },
+    "climate": {
+        "sCompression": "gzip",
+        "iCompressionLevel": 4,
+        "bShuffle": True,
+        "iScaleOffset": None,
+    },
+    "scalar": {
+        "sCompression": "none",
+        "iCompressionLevel": None,
+        "bShuffle": False,
+        "iScaleOffset": None,
+    },
+}
+
+# Chunks are sized to hold about this many bytes
+CHUNK_TARGET_BYTES = 64 * 1024
+
+# Files that datasets are written into are opened with these format bounds.
+# HDF5 1.10 indexes a dataset of one chunk with no B-tree, so the Fletcher32
+# checksum of a single value costs a few bytes instead of a few kB.
+ARCHIVE_LIBVER = ("v110", "v110")
+
+# Arrays smaller than this are not compressed: each chunked dataset carries
+# an index of a few kB, more than compression can save on small data.
+COMPRESS_MIN_BYTES = 4096
+
+# Output files at least this large are not read into memory. Their columns
+# are left as StreamedColumn references and copied into resizable datasets
+# one block of about STREAM_BLOCK_BYTES at a time, by the process that parses
+# them. The archive's parsers hand the blocks to its writer as StreamedBlock
+# batches.
+STREAM_MIN_BYTES = 256 * 1024 ** 2
+STREAM_BLOCK_BYTES = 16 * 1024 ** 2
+
+# Records of a simulation are written, or handed to the archive writer, in
+# batches of about this many bytes of array data
+RECORD_BATCH_BYTES = 8 * 1024 ** 2
+
+# Seasonal climate grids VPLanet writes for each body with a GridOutputOrder
+SEASONAL_CLIMATE_GRIDS = (
+    "DailyInsol",
+    "PlanckB",
+    "SeasonalDivF",
+    "SeasonalFIn",
+    "SeasonalFMerid",
+    "SeasonalFOut",
+    "SeasonalIceBalance",
+    "SeasonalTemp",
+)
+
+# saKeyInclude and saKeyExclude entries containing any of these characters
+# are shell-style patterns rather than exact keys
+WILDCARD_CHARS = "*?["
+
+# The dimensions VPLanet reports option units in, with the option that sets
+# the unit of each. Pressure and energy have no sUnit option of their own and
+# are written in terms of the others.
+UNIT_OPTIONS = (
+    ("length", "sUnitLength"),
+    ("angle", "sUnitAngle"),
+    ("temperature", "sUnitTemp"),
+    ("mass", "sUnitMass"),
+    ("time", "sUnitTime"),
+)
+COMPOSITE_DIMENSIONS = (
+    ("pressure", "(mass*length^-1*time^-2)"),
+    ("energy", "(mass*length^2*time^-2)"),
+)
+
+
+def fbIsKeyPattern(sKey):
+    """Return True if a saKeyInclude/saKeyExclude entry is a pattern."""
+    return any(c in sKey for c in WILDCARD_CHARS)
+
+
+def ftCompileKeys(listKeys):
+    """
+    Compile a list of keys and patterns for fast matching.
+
+    Parameters
+    ----------
+    listKeys : list of str
+        Exact keys, prefixes ending in a single '*' (e.g. 'earth:*') or
+        shell-style patterns (e.g. '*:Obliquity:final')
+
+    Returns
+    -------
+    tuple
+        (set of exact keys, tuple of prefixes, compiled regular expression
+        or None)
+    """
+    setExact = set()
+    listPrefixes = []
+    listPatterns = []
+    for sKey in listKeys:
+        if not fbIsKeyPattern(sKey):
+            setExact.add(sKey)
+        elif sKey.endswith("*") and not fbIsKeyPattern(sKey[:-1]):
+            listPrefixes.append(sKey[:-1])
+        else:
+            listPatterns.append(fnmatch.translate(sKey))
+    rePatterns = None
+    if listPatterns:
+        rePatterns = re.compile("|".join(listPatterns))
+    return setExact, tuple(listPrefixes), rePatterns
+
+
+def fbKeyMatches(tCompiled, sKey):
+    """Return True if sKey matches keys compiled with ftCompileKeys."""
+    setExact, tPrefixes, rePatterns = tCompiled
+    if sKey in setExact:
+        return True
+    if tPrefixes and sKey.startswith(tPrefixes):
+        return True
+    return rePatterns is not None and rePatterns.match(sKey) is not None
+
+
+class KeySelector:
+    """
+    Compiled saKeyInclude and saKeyExclude lists.
+
+    Exact keys are looked up in a set, entries ending in '*' are matched as
+    prefixes and any other shell-style patterns by one compiled regular
+    expression. Each key's result is cached, so the parsers pay for a key
+    once per run rather than once per line, entry and simulation.
+
+    Parameters
+    ----------
+    listInclude : list of str, optional
+        Keys or patterns to keep. None keeps every key not excluded.
+    listExclude : list of str, optional
+        Keys or patterns to drop, even if they are included
+    """
+
+    def __init__(self, listInclude=None, listExclude=None):
+        self.listInclude = None
+        self.tInclude = None
+        if listInclude is not None:
+            self.listInclude = list(listInclude)
+            self.tInclude = ftCompileKeys(self.listInclude)
+        self.tExclude = ftCompileKeys(listExclude or [])
+        self.dictCache = {}
+
+    def fbMatch(self, sKey):
+        """Return True if sKey is included and not excluded."""
+        bMatch = self.dictCache.get(sKey)
+        if bMatch is None:
+            bMatch = (
+                self.tInclude is None or fbKeyMatches(self.tInclude, sKey)
+            ) and not fbKeyMatches(self.tExclude, sKey)
+            self.dictCache[sKey] = bMatch
+        return bMatch
+
+    __contains__ = fbMatch
+
+    def fbMatchesBody(self, sBody):
+        """Return True if any key of body sBody could be included."""
+        if self.listInclude is None:
+            return True
+        for sKey in self.listInclude:
+            sKeyBody, sColon, sRest = sKey.partition(":")
+            if sKeyBody == sBody:
+                return True
+            if not fbIsKeyPattern(sKeyBody):
+                continue
+            # a pattern without a colon, such as '*Obliquity*', can match
+            # keys of any body
+            if not sColon or fnmatch.fnmatchcase(sBody, sKeyBody):
+                return True
+        return False
+
+    def flistSelect(self, listKeys):
+        """
+        Return the selected keys, expanding patterns against listKeys.
+
+        Exact included keys are returned in the order given, whether or not
+        they are in listKeys (statistics such as 'earth:TMan:mean' are
+        computed rather than stored), followed by the keys of listKeys that
+        match a prefix or pattern.
+
+        Parameters
+        ----------
+        listKeys : list of str
+            Keys available to patterns
+
+        Returns
+        -------
+        list of str
+            Selected keys, without duplicates
+        """
+        listSelected = []
+        if self.listInclude is not None:
+            listSelected = [
+                sKey for sKey in dict.fromkeys(self.listInclude)
+                if not fbIsKeyPattern(sKey) and self.fbMatch(sKey)
+            ]
+        setSelected = set(listSelected)
+        for sKey in listKeys:
+            if sKey not in setSelected and self.fbMatch(sKey):
+                listSelected.append(sKey)
+                setSelected.add(sKey)
+        return listSelected
+
+
+def fselKeySelector(incl=None, excl=None):
+    """
+    Return the KeySelector for a parser's incl and excl arguments.
+
+    Parameters
+    ----------
+    incl : list of str or KeySelector, optional
+        Keys to keep, or an already compiled selector (excl is then ignored)
+    excl : list of str, optional
+        Keys to drop
+
+    Returns
+    -------
+    KeySelector or None
+        None when every key is kept
+    """
+    if isinstance(incl, KeySelector):
+        return incl
+    if incl is None and not excl:
+        return None
+    return KeySelector(incl, excl)
 
-def ProcessLogFile(logfile, data, folder, verbose, incl=None, excl=None):
+
+def ProcessLogFile(
+    logfile, data, folder, verbose, incl=None, excl=None, buffers=None,
+    cache=None,
+):
+    selKeys = fselKeySelector(incl, excl)
     prop = ""
     body = "system"
     path = os.path.join(folder, logfile)
+    if cache is not None:
+        dictParsed = cache.fLoad(
+            "log", [path],
+            lambda: ProcessLogFile(logfile, {}, folder, verbose, buffers=buffers),
+        )
+        return fdictMergeParsed(data, dictParsed, selKeys)
     if verbose == True:
         print(path)
-    with open(path, "r+", errors="ignore") as log:
+    with fhOpenFile(path, buffers, errors="ignore") as log:
         content = [line.strip() for line in log.readlines()]
 
     for line in content:
@@ -53,18 +308,7 @@ def ProcessLogFile(logfile, data, folder, verbose, incl=None, excl=None):
             fv_value = line[line.find(":") + 1 :].strip()
             key_name = body + ":" + fv_param + ":" + prop
 
-            # make this into a function
-            if incl is not None:
-                for i in incl:
-                    if key_name == i:
-                        # make this into a function
-                        if key_name in data:
-                            data[key_name].append(fv_value)
-                        else:
-                            data[key_name] = [units, fv_value]
-                    else:
-                        continue
-            else:
+            if selKeys is None or selKeys.fbMatch(key_name):
                 if key_name in data:
                     data[key_name].append(fv_value)
                 else:
@@ -91,28 +335,11 @@ def ProcessLogFile(logfile, data, folder, verbose, incl=None, excl=None):
 
                 key_name_forward = body + ":" + var + ":forward"
 
-                # make this into a function
-                if incl is not None:
-                    for j in incl:
-                        if key_name_forward == j:
-                            # make this into a function
-                            if key_name_forward not in data:
-                                data[key_name_forward] = [units]
-                        else:
-                            continue
-                else:
+                if selKeys is None or selKeys.fbMatch(key_name_forward):
                     if key_name_forward not in data:
                         data[key_name_forward] = [units]
 
-            if incl is not None:
-                for k in incl:
-                    if key_name == k:
-                        # make this into a function
-                        if key_name not in data:
-                            data[key_name] = out_params
-                    else:
-                        continue
-            else:
+            if selKeys is None or selKeys.fbMatch(key_name):
                 if key_name not in data:
                     data[key_name] = out_params
 
@@ -140,35 +367,590 @@ def ProcessLogFile(logfile, data, folder, verbose, incl=None, excl=None):
 
                 key_name_climate = body + ":" + var + ":climate"
 
-                # make this into a function
-                if incl is not None:
-                    for j in incl:
-                        if key_name_climate == j:
-                            # make this into a function
-                            if key_name_climate not in data:
-                                data[key_name_climate] = [units]
-                else:
+                if selKeys is None or selKeys.fbMatch(key_name_climate):
                     if key_name_climate not in data:
                         data[key_name_climate] = [units]
 
-            if incl is not None:
-                for k in incl:
-                    if key_name == k:
-                        # make this into a function
-                        if key_name not in data:
-                            data[key_name] = out_params
-                    else:
-                        continue
-            else:
+            if selKeys is None or selKeys.fbMatch(key_name):
                 if key_name not in data:
                     data[key_name] = out_params
 
     return data
 
 
+class ParsedLog:
+    """
+    The log file of one simulation, parsed once and queried by key.
+
+    Every kind of key a filter reads needs the log: initial and final
+    values come from it, and so do the OutputOrder and GridOutputOrder
+    headings of each body's output files. The file is read the first
+    time it is queried, and not again.
+
+    Parameters
+    ----------
+    logfile : str
+        Log file name
+    folder : str
+        Simulation folder
+    verbose : bool
+        Verbose output flag
+    buffers : dict, optional
+        Contents of prefetched files, as for fbyPrefetched
+    cache : ParseCache, optional
+        Cache of parsed files
+    """
+
+    def __init__(self, logfile, folder, verbose, buffers=None, cache=None):
+        self.logfile = logfile
+        self.folder = folder
+        self.verbose = verbose
+        self.buffers = buffers
+        self.cache = cache
+        self.dictParsed = None
+
+    def fdictParsed(self):
+        """Everything the log parsed to, unselected."""
+        if self.dictParsed is None:
+            self.dictParsed = ProcessLogFile(
+                self.logfile, {}, self.folder, self.verbose,
+                buffers=self.buffers, cache=self.cache,
+            )
+        return self.dictParsed
+
+    def fdictHeading(self, body, order="OutputOrder"):
+        """
+        Return the output order of one body, as ProcessOutputfile takes it.
+
+        Parameters
+        ----------
+        body : str
+            Body name
+        order : str, optional
+            "OutputOrder" or "GridOutputOrder"
+
+        Returns
+        -------
+        dict
+            The body's order key and its [variable, units] pairs, or an
+            empty dict if the log has none
+        """
+        key_name = body + ":" + order
+        dictParsed = self.fdictParsed()
+        if key_name not in dictParsed:
+            return {}
+        return {key_name: dictParsed[key_name]}
+
+    def fdictSelect(self, data, incl=None, excl=None):
+        """Add the selected keys of the log to data, as ProcessLogFile."""
+        return fdictMergeParsed(data, self.fdictParsed(), incl, excl)
+
+
+def fdictMergeParsed(data, dictParsed, incl=None, excl=None):
+    """
+    Add the selected keys of one parsed file to a data dictionary.
+
+    Gives the same result as parsing the file into data with the same
+    selection, so a whole file can be parsed once and cached. Data
+    dictionaries of whole simulations are combined the same way.
+
+    Parameters
+    ----------
+    data : dict
+        Data dictionary to add to
+    dictParsed : dict
+        Everything one log or input file parsed to, unselected, or the
+        data dictionary of one simulation
+    incl : list, str or KeySelector, optional
+        Keys or patterns to keep, as for fselKeySelector
+    excl : list or str, optional
+        Keys or patterns to drop, as for fselKeySelector
+
+    Returns
+    -------
+    dict
+        data, with the selected keys added
+    """
+    selKeys = fselKeySelector(incl, excl)
+    for k, v in dictParsed.items():
+        if selKeys is not None and not selKeys.fbMatch(k):
+            continue
+        if k not in data:
+            data[k] = list(v)
+        elif not fbIsOrderKey(k):
+            # an OutputOrder key keeps its first value; a value's units
+            # are already in data
+            data[k].extend(v[1:])
+    return data
+
+
+def fbyPrefetched(path, buffers=None):
+    """
+    Return the contents of a file read ahead of time, if it was.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file
+    buffers : dict, optional
+        Contents of prefetched files by normalized path, as from
+        SimulationPrefetcher
+
+    Returns
+    -------
+    bytes or None
+        The file's contents, or None if it has to be read from disk
+    """
+    if not buffers:
+        return None
+    return buffers.get(os.path.normpath(path))
+
+
+def fhOpenFile(path, buffers=None, errors=None):
+    """
+    Open a text file for reading, from its prefetched contents if any.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file
+    buffers : dict, optional
+        Contents of prefetched files, as for fbyPrefetched
+    errors : str, optional
+        How decoding errors are handled, as for open
+
+    Returns
+    -------
+    file object
+        Text file, to be used as a context manager
+    """
+    byContents = fbyPrefetched(path, buffers)
+    if byContents is None:
+        return open(path, "r", errors=errors)
+    return io.TextIOWrapper(io.BytesIO(byContents), errors=errors)
+
+
+def fdaReadOutputFile(path):
+    """
+    Read a whitespace-delimited VPLanet output file into a float64 array.
+
+    Files with rows of unequal length or non-numeric values are read with
+    pandas instead, as they were before this reader existed.
+
+    Parameters
+    ----------
+    path : str or bytes
+        Path to a forward, backward, Climate or seasonal climate file, or
+        the file's contents
+
+    Returns
+    -------
+    np.ndarray
+        2-D array with one row per line and one column per variable
+    """
+    try:
+        with warnings.catch_warnings():
+            # an empty file is left to pandas, which raises for it
+            warnings.simplefilter("ignore", UserWarning)
+            daData = np.loadtxt(
+                io.BytesIO(path) if isinstance(path, bytes) else path,
+                dtype=np.float64, ndmin=2,
+            )
+        if daData.size:
+            return daData
+    except ValueError:
+        pass
+    return pd.read_csv(
+        io.BytesIO(path) if isinstance(path, bytes) else path,
+        header=None, sep=r"\s+",
+    ).to_numpy()
+
+
+def fdaParseBlock(bBlock, iColumns):
+    """
+    Parse a block of whole lines of an output file.
+
+    Parameters
+    ----------
+    bBlock : bytes
+        Lines of the file, ending in a newline or at the end of the file
+    iColumns : int
+        Number of columns in the file
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (rows, iColumns)
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            daBlock = np.loadtxt(io.BytesIO(bBlock), dtype=np.float64, ndmin=2)
+        if daBlock.size == 0:
+            return np.empty((0, iColumns))
+        if daBlock.shape[1] == iColumns:
+            return daBlock
+    except ValueError:
+        pass
+    # short rows are padded with NaN, as fdaReadOutputFile does
+    return pd.read_csv(
+        io.BytesIO(bBlock), header=None, sep=r"\s+", names=range(iColumns)
+    ).to_numpy(dtype=np.float64)
+
+
+class StreamedColumn:
+    """
+    One column of an output file too large to read into memory.
+
+    ProcessOutputfile stores these in place of arrays for files of at
+    least STREAM_MIN_BYTES. DictToBP and the ragged layout writer group the
+    columns of each file and copy them with a single pass over it, through
+    fiterBlocks. Anything else that needs the values can call np.asarray on
+    the column, which reads the whole column into memory.
+
+    Parameters
+    ----------
+    sPath : str
+        Path to the output file
+    iColumn : int
+        Index of this column
+    iColumns : int
+        Number of columns in the file
+    """
+
+    def __init__(self, sPath, iColumn, iColumns):
+        self.sPath = sPath
+        self.iColumn = iColumn
+        self.iColumns = iColumns
+
+    def fiEstimateRows(self):
+        """Estimate the number of rows from the length of the first line."""
+        with open(self.sPath, "rb") as f:
+            iLine = len(f.readline())
+        return max(1, os.path.getsize(self.sPath) // max(iLine, 1))
+
+    def fiterBlocks(self, iBlockBytes=None):
+        """
+        Yield consecutive blocks of rows of the whole file.
+
+        The file is memory mapped and cut at the last newline before each
+        block boundary, so only one block is parsed and held at a time.
+        Pages already parsed are released where the platform allows it, so
+        the mapped file does not stay resident either.
+
+        Parameters
+        ----------
+        iBlockBytes : int, optional
+            Approximate bytes per block (default STREAM_BLOCK_BYTES)
+
+        Yields
+        ------
+        np.ndarray
+            Array of shape (rows, iColumns)
+        """
+        if iBlockBytes is None:
+            iBlockBytes = STREAM_BLOCK_BYTES
+        if os.path.getsize(self.sPath) == 0:
+            return
+        with open(self.sPath, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            bRelease = hasattr(mmap, "MADV_DONTNEED")
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            iSize = len(mm)
+            iStart = 0
+            iReleased = 0
+            while iStart < iSize:
+                iEnd = min(iStart + iBlockBytes, iSize)
+                if iEnd < iSize:
+                    iNewline = mm.rfind(b"\n", iStart, iEnd)
+                    if iNewline < 0:
+                        # a line longer than a block
+                        iNewline = mm.find(b"\n", iEnd)
+                    iEnd = iSize if iNewline < 0 else iNewline + 1
+                daBlock = fdaParseBlock(mm[iStart:iEnd], self.iColumns)
+                iRelease = iEnd // mmap.PAGESIZE * mmap.PAGESIZE
+                if bRelease and iRelease > iReleased:
+                    mm.madvise(
+                        mmap.MADV_DONTNEED, iReleased, iRelease - iReleased
+                    )
+                    iReleased = iRelease
+                if daBlock.shape[0]:
+                    yield daBlock
+                iStart = iEnd
+
+    def __array__(self, dtype=None, copy=None):
+        listBlocks = [
+            daBlock[:, self.iColumn] for daBlock in self.fiterBlocks()
+        ]
+        daColumn = np.concatenate(listBlocks) if listBlocks else np.empty(0)
+        return daColumn if dtype is None else daColumn.astype(dtype)
+
+
+class StreamedBlock:
+    """
+    Consecutive rows of one column of a streamed output file.
+
+    fiterStreamedBatches puts these in place of StreamedColumn entries, so
+    a process that parses a large file can hand it to another process that
+    writes it, one block at a time. DictToBP appends each block to the
+    key's (1, rows) dataset, creating it at the first block.
+
+    Parameters
+    ----------
+    daValues : np.ndarray
+        The block's values of the column
+    iRow : int
+        Row of the file the block starts at
+    iEstimate : int
+        Estimated number of rows in the file, to size the dataset's chunks
+    bLast : bool
+        Whether this is the file's last block
+    """
+
+    def __init__(self, daValues, iRow, iEstimate, bLast):
+        self.daValues = daValues
+        self.iRow = iRow
+        self.iEstimate = iEstimate
+        self.bLast = bLast
+
+
+def fsStreamPath(v):
+    """Return the file of a data dictionary entry that is streamed, or None."""
+    if len(v) == 2 and isinstance(v[1], StreamedColumn):
+        return v[1].sPath
+    return None
+
+
+def fbIsStreamedBlock(v):
+    """Return whether a data dictionary entry is a StreamedBlock."""
+    return len(v) == 2 and isinstance(v[1], StreamedBlock)
+
+
+def fiterStreamedBatches(dictBatch, iBlockBytes=None):
+    """
+    Parse the streamed columns of a batch into batches of blocks.
+
+    A batch from fiterRecordBatches with the StreamedColumn entries of an
+    output file is read one block at a time, and each block is yielded as
+    a batch with a StreamedBlock for every column. Any other batch is
+    yielded as it is.
+
+    Parameters
+    ----------
+    dictBatch : dict
+        Data dictionary of one batch
+    iBlockBytes : int, optional
+        Approximate bytes of the file per block (default
+        STREAM_BLOCK_BYTES)
+
+    Yields
+    ------
+    dict
+        Data dictionaries holding at most one block of the file each
+    """
+    dictStreams = fdictGroupStreams(dictBatch.items())
+    if not dictStreams:
+        yield dictBatch
+        return
+    for listColumns in dictStreams.values():
+        column = listColumns[0][1][1]
+        iEstimate = column.fiEstimateRows()
+        iRow = 0
+        daPrevious = None
+        # one block is held back, so the last one can be marked
+        for daBlock in column.fiterBlocks(iBlockBytes):
+            if daPrevious is not None:
+                yield fdictBlockBatch(
+                    listColumns, daPrevious, iRow, iEstimate, False
+                )
+                iRow += daPrevious.shape[0]
+            daPrevious = daBlock
+        if daPrevious is None:
+            daPrevious = np.empty((0, column.iColumns))
+        yield fdictBlockBatch(listColumns, daPrevious, iRow, iEstimate, True)
+
+
+def fdictBlockBatch(listColumns, daBlock, iRow, iEstimate, bLast):
+    """Return the batch of one block of a file's streamed columns."""
+    return {
+        k: [
+            v[0],
+            StreamedBlock(
+                np.ascontiguousarray(daBlock[:, v[1].iColumn]), iRow,
+                iEstimate, bLast,
+            ),
+        ]
+        for k, v in listColumns
+    }
+
+
+def fdictGroupStreams(listItems):
+    """
+    Group streamed data dictionary entries by the file they come from.
+
+    Parameters
+    ----------
+    listItems : list of tuple
+        (key, value) pairs of a data dictionary
+
+    Returns
+    -------
+    dict
+        Output file path to the list of (key, value) pairs whose only row
+        is a StreamedColumn of it
+    """
+    dictStreams = {}
+    for k, v in listItems:
+        sPath = fsStreamPath(v)
+        if sPath is not None:
+            dictStreams.setdefault(sPath, []).append((k, v))
+    return dictStreams
+
+
+def fnStreamToDatasets(h5_file, listColumns, storage=None):
+    """
+    Copy the streamed columns of one output file into new datasets.
+
+    Each column becomes a (1, rows) dataset, the shape an array row would
+    have had, that is resized as blocks of the file are read.
+
+    Parameters
+    ----------
+    h5_file : h5py.File or h5py.Group
+        Where to create the datasets
+    listColumns : list of tuple
+        (dataset name, key, units, StreamedColumn) for each column, all of
+        the same file
+    storage : dict, optional
+        Settings from fdictStorageOptions
+
+    Returns
+    -------
+    None
+    """
+    iEstimate = listColumns[0][3].fiEstimateRows()
+    listDatasets = []
+    for sDataset, k, sUnits, column in listColumns:
+        dataset = fhCreateStreamedDataset(
+            h5_file, sDataset, k, sUnits, iEstimate, storage
+        )
+        listDatasets.append((dataset, column.iColumn))
+
+    iRows = 0
+    for daBlock in listColumns[0][3].fiterBlocks():
+        iNext = iRows + daBlock.shape[0]
+        for dataset, iColumn in listDatasets:
+            dataset.resize((1, iNext))
+            dataset[0, iRows:iNext] = daBlock[:, iColumn]
+        iRows = iNext
+
+
+def fhCreateStreamedDataset(h5_file, sDataset, k, sUnits, iEstimate,
+                            storage=None):
+    """
+    Create the empty (1, 0) dataset that a streamed column is copied into.
+
+    Parameters
+    ----------
+    h5_file : h5py.File or h5py.Group
+        Where to create the dataset
+    sDataset : str
+        Dataset name
+    k : str
+        Key of the column
+    sUnits : str
+        Units of the column
+    iEstimate : int
+        Estimated number of rows, from which chunks and filters are chosen
+    storage : dict, optional
+        Settings from fdictStorageOptions
+
+    Returns
+    -------
+    h5py.Dataset
+        The new dataset, resizable along its second axis
+    """
+    # a stand-in the size of the whole column, to choose chunks and filters
+    daTemplate = np.broadcast_to(np.float64(0), (1, iEstimate))
+    dictOptions = fdictDatasetOptions(k, daTemplate, storage)
+    dictOptions.setdefault(
+        "chunks", ftChunkShape(daTemplate.shape, daTemplate.itemsize)
+    )
+    dataset = h5_file.create_dataset(
+        sDataset, shape=(1, 0), maxshape=(1, None), dtype=np.float64,
+        **dictOptions
+    )
+    dataset.attrs["Units"] = sUnits
+    return dataset
+
+
+def fnAppendStreamedBlock(h5_file, sDataset, k, sUnits, block, storage=None):
+    """
+    Append a StreamedBlock to its column's dataset.
+
+    The dataset is created at the file's first block, with
+    fhCreateStreamedDataset, and resized to hold each block after it.
+
+    Parameters
+    ----------
+    h5_file : h5py.File or h5py.Group
+        Where the dataset is
+    sDataset : str
+        Dataset name
+    k : str
+        Key of the column
+    sUnits : str
+        Units of the column
+    block : StreamedBlock
+        Block to append
+    storage : dict, optional
+        Settings from fdictStorageOptions
+
+    Returns
+    -------
+    None
+    """
+    if block.iRow == 0:
+        if sDataset in h5_file:
+            del h5_file[sDataset]
+        fhCreateStreamedDataset(
+            h5_file, sDataset, k, sUnits, block.iEstimate, storage
+        )
+    dataset = h5_file[sDataset]
+    iNext = block.iRow + block.daValues.shape[0]
+    dataset.resize((1, iNext))
+    dataset[0, block.iRow:iNext] = block.daValues
+
+
+def fdaStackRows(listRows):
+    """
+    Return the rows stored under a key as one array.
+
+    A single array row, as the output file readers give for each
+    simulation, is returned as a view rather than copied.
+
+    Parameters
+    ----------
+    listRows : list
+        The values of a data dictionary entry, after its units
+
+    Returns
+    -------
+    np.ndarray
+        The rows stacked along a new first axis
+    """
+    if len(listRows) == 1 and isinstance(listRows[0], np.ndarray):
+        return listRows[0][np.newaxis]
+    return np.asarray(listRows)
+
+
 def ProcessOutputfile(
-    file, data, body, Output, prefix, folder, verbose, incl=None, excl=None
+    file, data, body, Output, prefix, folder, verbose, incl=None, excl=None,
+    buffers=None, cache=None,
 ):
+    selKeys = fselKeySelector(incl, excl)
 
     path = os.path.join(folder, file)
     if verbose == True:
@@ -184,8 +966,22 @@ def ProcessOutputfile(
             else:
                 units.append(num[1])
 
-    sorted = pd.read_csv(path, header=None, delim_whitespace=True)
-    sorted = sorted.to_numpy().transpose().tolist()
+    byContents = fbyPrefetched(path, buffers)
+    if byContents is None and os.path.getsize(path) >= STREAM_MIN_BYTES:
+        # the file is copied into the archive column by column when written
+        with open(path, "rb") as f:
+            iColumns = len(f.readline().split())
+        sorted = [StreamedColumn(path, i, iColumns) for i in range(iColumns)]
+    else:
+        source = path if byContents is None else byContents
+        if cache is None:
+            daData = fdaReadOutputFile(source)
+        else:
+            daData = cache.fLoad(
+                "output", [path], lambda: fdaReadOutputFile(source)
+            )
+        # one contiguous row per output variable, so each key holds a view
+        sorted = np.ascontiguousarray(daData.T)
 
     for i, row in enumerate(sorted):
         key_name = body + ":" + header[i] + prefix
@@ -195,19 +991,7 @@ def ProcessOutputfile(
         # else:
         #     data[key_name] = [row]
 
-        # make this into a function
-        if incl is not None:
-            for j in incl:
-                if key_name == j:
-                    # make this into a function
-                    if key_name in data:
-                        data[key_name].append(row)
-                    else:
-                        data[key_name] = [units[i], row]
-
-                else:
-                    continue
-        else:
+        if selKeys is None or selKeys.fbMatch(key_name):
             if key_name in data:
                 data[key_name].append(row)
             else:
@@ -217,18 +1001,25 @@ def ProcessOutputfile(
 
 
 def ProcessSeasonalClimatefile(
-    prefix, data, body, name, folder, verbose, incl=None, excl=None
+    prefix, data, body, name, folder, verbose, incl=None, excl=None,
+    buffers=None,
 ):
+    selKeys = fselKeySelector(incl, excl)
+    key_name = body + ":" + name
+    if selKeys is not None and not selKeys.fbMatch(key_name):
+        return data
+
     file_name = prefix + "." + name + ".0"
     path = os.path.join(folder, "SeasonalClimateFiles/", file_name)
 
     if verbose == True:
         print(path)
 
-    sorted = pd.read_csv(path, header=None, delim_whitespace=True).to_numpy()
-    sorted = sorted.transpose().tolist()
+    byContents = fbyPrefetched(path, buffers)
+    sorted = np.ascontiguousarray(
+        fdaReadOutputFile(path if byContents is None else byContents).T
+    )
 
-    key_name = body + ":" + name
     units = ""
     if (
         name == "DailyInsol"
@@ -251,38 +1042,39 @@ def ProcessSeasonalClimatefile(
     # else:
     #     data[key_name].append(sorted)
 
-    if incl is not None:
-        for i in incl:
-            if key_name == i:
-                # make this into a function
-                if key_name in data:
-                    data[key_name].append(sorted)
-                else:
-                    data[key_name] = [units, sorted]
-            else:
-                continue
+    if key_name in data:
+        data[key_name].append(sorted)
     else:
-        if key_name in data:
-            data[key_name].append(sorted)
-        else:
-            data[key_name] = [units, sorted]
+        data[key_name] = [units, sorted]
 
     return data
 
 
 def ProcessInputfile(
-    data, in_file, folder, vplanet_help, verbose, incl=None, excl=None
+    data, in_file, folder, vplanet_help, verbose, incl=None, excl=None,
+    buffers=None, cache=None,
 ):
+    selKeys = fselKeySelector(incl, excl)
 
     # set the body name equal to the infile name
     body = in_file.partition(".")[0]
     path = os.path.join(folder, in_file)
+    if cache is not None:
+        # the units of the options also depend on vpl.in
+        dictParsed = cache.fLoad(
+            "input", [path, os.path.join(folder, "vpl.in")],
+            lambda: ProcessInputfile(
+                {}, in_file, folder, vplanet_help, verbose, buffers=buffers
+            ),
+        )
+        return fdictMergeParsed(data, dictParsed, selKeys)
     if verbose == True:
         print(path)
     # open the input file and read it into an array
-    with open(path, "r") as file:
+    with fhOpenFile(path, buffers) as file:
 
         content = [line.strip() for line in file.readlines()]
+    unit_system = UnitSystem(content, folder, vplanet_help, buffers)
 
     # for every line in the array check if the line is blank
     # or if the line starts with a #
@@ -315,112 +1107,152 @@ def ProcessInputfile(
 
         key = key.replace("-", "")
         key_name = body + ":" + key + ":option"
+        # skip unwanted options before their units are looked up
+        if selKeys is not None and not selKeys.fbMatch(key_name):
+            continue
 
-        units = ProcessInfileUnits(key, value, folder, path, vplanet_help)
+        units = ProcessInfileUnits(
+            key, value, folder, path, vplanet_help, unit_system
+        )
 
         if "saOutputOrder" in key_name or "saGridOutput" in key_name:
             for i in value:
                 if value[0] == "-":
                     value = value[1:]
 
-        # make this into a function
-        if incl is not None:
-            for i in incl:
-                if key_name == i:
-                    # make this into a function
-                    if key_name in data:
-                        data[key_name].append(value)
-                    else:
-                        data[key_name] = [units, value]
-                else:
-                    continue
+        if key_name in data:
+            data[key_name].append(value)
         else:
-            if key_name in data:
-                data[key_name].append(value)
-            else:
-                data[key_name] = [units, value]
+            data[key_name] = [units, value]
 
     return data
 
 
-def ProcessInfileUnits(name, value, folder, in_file, vplanet_help):
+def fdictUnitSettings(listLines):
+    """
+    Return the sUnit* options set in the lines of an input file.
+
+    Parameters
+    ----------
+    listLines : list of str
+        Lines of a body file or vpl.in.
+
+    Returns
+    -------
+    dict
+        Unit name for each dimension whose sUnit option is set, e.g.
+        {"mass": "kg"}. The first setting of an option wins.
+    """
+    dictOptions = {sOption: sDimension for sDimension, sOption in UNIT_OPTIONS}
+    dictUnits = {}
+    for sLine in listLines:
+        listWords = sLine.partition("#")[0].split()
+        if len(listWords) < 2 or listWords[0] not in dictOptions:
+            continue
+        dictUnits.setdefault(dictOptions[listWords[0]], listWords[1])
+    return dictUnits
+
+
+class UnitSystem:
+    """
+    The units that the options of one input file are given in.
+
+    Each dimension takes its unit from the file's own sUnit* option, then
+    from vpl.in, then from VPLanet's default for that option. vpl.in is
+    read the first time an option with a dimension needs it, and not again.
+
+    Parameters
+    ----------
+    listLines : list of str
+        Lines of the input file.
+    folder : str
+        Simulation folder holding vpl.in.
+    vplanet_help : dict
+        Parsed vplanet -H output, for the default units.
+    buffers : dict, optional
+        Contents of prefetched files, as for fbyPrefetched
+    """
+
+    def __init__(self, listLines, folder, vplanet_help, buffers=None):
+        self.dictUnits = fdictUnitSettings(listLines)
+        self.folder = folder
+        self.vplanet_help = vplanet_help
+        self.buffers = buffers
+        self.tUnits = None
+
+    def ftUnits(self):
+        """Unit of each dimension in UNIT_OPTIONS, None if it has none."""
+        if self.tUnits is None:
+            with fhOpenFile(
+                os.path.join(self.folder, "vpl.in"), self.buffers
+            ) as vplfile:
+                dictPrimary = fdictUnitSettings(vplfile.readlines())
+            listUnits = []
+            for sDimension, sOption in UNIT_OPTIONS:
+                sUnit = self.dictUnits.get(sDimension)
+                if sUnit is None:
+                    sUnit = dictPrimary.get(sDimension)
+                if sUnit is None:
+                    sUnit = self.vplanet_help.get(sOption, {}).get(
+                        "Default Value"
+                    )
+                listUnits.append(sUnit)
+            self.tUnits = tuple(listUnits)
+        return self.tUnits
+
+    def fsUnits(self, sDimension):
+        """Units of a vplanet -H Dimension string in this unit system."""
+        return fsResolveDimension(sDimension, self.ftUnits())
+
+
+@functools.lru_cache(maxsize=1024)
+def fsResolveDimension(sDimension, tUnits):
+    """
+    Write a Dimension string in the given units.
+
+    Simulations in a sweep nearly always share their unit settings, so
+    this is cached on the Dimension and the units together.
+
+    Parameters
+    ----------
+    sDimension : str
+        Dimension from vplanet -H, e.g. "mass*length^-3".
+    tUnits : tuple
+        Unit of each dimension in UNIT_OPTIONS, as from UnitSystem.ftUnits.
+
+    Returns
+    -------
+    str
+        The dimension with each name replaced by its unit.
+    """
+    for sName, sComposite in COMPOSITE_DIMENSIONS:
+        sDimension = sDimension.replace(sName, sComposite)
+    for (sName, sOption), sUnit in zip(UNIT_OPTIONS, tUnits):
+        if sUnit is not None:
+            sDimension = sDimension.replace(sName, sUnit)
+    return sDimension
+
+
+def ProcessInfileUnits(
+    name, value, folder, in_file, vplanet_help, unit_system=None
+):
     # check if the value is negative and has a negative option
     custom_unit = vplanet_help.get(name, {}).get("Custom Units")
     if "-" in value and custom_unit != None:
         unit = custom_unit
         return unit
-    else:
-        dim = vplanet_help.get(name, {}).get("Dimension")
-
-        # since pressure and energy arent sUnits, we have to replace them with the dims for each
-        if dim == None or dim == "nd":
-            unit = "nd"
-            return unit
-
-        if "pressure" in dim:
-            dim = dim.replace("pressure", "(mass*length^-1*time^-2)")
-        if "energy" in dim:
-            dim = dim.replace("energy", "(mass*length^2*time^-2)")
-
-        # check the options file the value was in and see if the Dimension is there
-        with open(in_file, "r+") as infile:
-            infile_lines = infile.readlines()
-
-        for infile_line in infile_lines:
-            if "sUnitLength" in infile_line and "length" in dim:
-                dim = dim.replace("length", infile_line.split()[1])
-            if "sUnitAngle" in infile_line and "angle" in dim:
-                dim = dim.replace("angle", infile_line.split()[1])
-            if "sUnitTemp" in infile_line and "temperature" in dim:
-                dim = dim.replace("temperature", infile_line.split()[1])
-            if "sUnitMass" in infile_line and "mass" in dim:
-                dim = dim.replace("mass", infile_line.split()[1])
-            if "sUnitTime" in infile_line and "time" in dim:
-                dim = dim.replace("time", infile_line.split()[1])
-
-            if infile_line == infile_lines[-1]:
-                # if its not in the options file, it might be in in the vpl.in file
-                with open(os.path.join(folder, "vpl.in"), "r+") as vplfile:
-                    vpl_lines = vplfile.readlines()
-
-                for vpl_line in vpl_lines:
-                    if "sUnitLength" in vpl_line and "length" in dim:
-                        dim = dim.replace("length", vpl_line.split()[1])
-                    if "sUnitAngle" in vpl_line and "angle" in dim:
-                        dim = dim.replace("angle", vpl_line.split()[1])
-                    if "sUnitTemp" in vpl_line and "temperature" in dim:
-                        dim = dim.replace("temperature", vpl_line.split()[1])
-                    if "sUnitMass" in vpl_line and "mass" in dim:
-                        dim = dim.replace("mass", vpl_line.split()[1])
-                    if "sUnitTime" in vpl_line and "time" in dim:
-                        dim = dim.replace("time", vpl_line.split()[1])
-
-                # the only place left is the default of sUnit of the Dimension
-                if vpl_line == vpl_lines[-1]:
-                    if "length" in dim:
-                        dim = dim.replace(
-                            "length",
-                            vplanet_help["sUnitLength"]["Default Value"],
-                        )
-                    if "angle" in dim:
-                        dim = dim.replace(
-                            "angle",
-                            vplanet_help["sUnitAngle"]["Default Value"],
-                        )
-                    if "temperature" in dim:
-                        dim = dim.replace(
-                            "temperature",
-                            vplanet_help["sUnitTemp"]["Default Value"],
-                        )
-                    if "mass" in dim:
-                        dim = dim.replace(
-                            "mass", vplanet_help["sUnitMass"]["Default Value"]
-                        )
-                    if "time" in dim:
-                        dim = dim.replace(
-                            "time", vplanet_help["sUnitTime"]["Default Value"]
-                        )
-        unit = dim
+
+    dim = vplanet_help.get(name, {}).get("Dimension")
+    if dim == None or dim == "nd":
+        unit = "nd"
+        return unit
+
+    # callers looking up many options of one file pass its unit system in,
+    # so the file and vpl.in are only read once
+    if unit_system is None:
+        with open(in_file, "r") as infile:
+            unit_system = UnitSystem(infile.readlines(), folder, vplanet_help)
+    unit = unit_system.fsUnits(dim)
     return unit
 
 
@@ -433,28 +1265,104 @@ def GatherData(
     vplanet_help,
     folder,
     verbose,
+    buffers=None,
 ):
     """
-    ....
+    Collect all of a simulation's data into one data dictionary.
+
+    Parameters
+    ----------
+    data : dict
+        Data dictionary to add to
+    system_name : str
+        System name
+    body_names : list
+        Body names
+    logfile : str
+        Log file name
+    in_files : list
+        Input file names
+    vplanet_help : dict
+        Parsed vplanet -H output
+    folder : str
+        Simulation folder
+    verbose : bool
+        Print each file as it is read
+    buffers : dict, optional
+        Contents of prefetched files, as for fbyPrefetched
+
+    Returns
+    -------
+    dict
+        The data dictionary, with an entry for every key
     """
+    for k, units, values in fiterGatherData(
+        system_name, body_names, logfile, in_files, vplanet_help, folder,
+        verbose, buffers,
+    ):
+        if k in data:
+            data[k].extend(values)
+        else:
+            data[k] = flistRecordEntry(k, units, values)
+    return data
 
-    # for each of the infiles, process the data
+
+def fiterGatherData(
+    system_name,
+    body_names,
+    logfile,
+    in_files,
+    vplanet_help,
+    folder,
+    verbose,
+    buffers=None,
+):
+    """
+    Yield a simulation's data as each of its output files is read.
+
+    The input files and log are read first, since they name the output
+    files and their columns, and kept until the end. Each forward, backward,
+    climate and seasonal climate file is then read and its records yielded
+    before the next is opened, so no more than one output file is held.
+
+    Parameters
+    ----------
+    system_name : str
+        System name
+    body_names : list
+        Body names
+    logfile : str
+        Log file name
+    in_files : list
+        Input file names
+    vplanet_help : dict
+        Parsed vplanet -H output
+    folder : str
+        Simulation folder
+    verbose : bool
+        Print each file as it is read
+    buffers : dict, optional
+        Contents of prefetched files, as for fbyPrefetched. Files that are
+        not in it are read from disk.
+
+    Yields
+    ------
+    tuple
+        (key, units, values) for every key, as from fiterDictRecords
+    """
+    data = {}
     for infile in in_files:
-        data = ProcessInputfile(data, infile, folder, vplanet_help, verbose)
-    # first process the log file
-    # gets the absoulte path for the log file
-    data = ProcessLogFile(logfile, data, folder, verbose)
-    # for each of the body names in the body_list
-    # check and see if they have a grid
-    # if so, then process those particular files
+        data = ProcessInputfile(
+            data, infile, folder, vplanet_help, verbose, buffers=buffers
+        )
+    data = ProcessLogFile(logfile, data, folder, verbose, buffers=buffers)
+
     for body in body_names:
         outputorder = body + ":OutputOrder"
         gridoutputorder = body + ":GridOutputOrder"
         # if output order from the log file isn't empty process it
         if outputorder in data:
-            # OutputOrder = data[outputorder]
-            OutputOrder = {}
-            OutputOrder[outputorder] = data[outputorder]
+            OutputOrder = {outputorder: data[outputorder]}
 
             Outfile = body + ":sOutFile:option"
             if Outfile in data:
@@ -482,52 +1390,427 @@ def GatherData(
                     file_name = system_name + "." + body + ".forward"
                     prefix = ":forward"
 
-            data = ProcessOutputfile(
-                file_name, data, body, OutputOrder, prefix, folder, verbose
+            yield from fiterFileRecords(
+                ProcessOutputfile(
+                    file_name, {}, body, OutputOrder, prefix, folder, verbose,
+                    buffers=buffers,
+                ),
+                data,
             )
 
         # now process the grid output order (if it exists)
         if gridoutputorder in data:
-            GridOutputOrder = {}
-            GridOutputOrder[gridoutputorder] = data[gridoutputorder]
+            GridOutputOrder = {gridoutputorder: data[gridoutputorder]}
             climate_name = system_name + "." + body + ".Climate"
-            data = ProcessOutputfile(
-                climate_name,
+            yield from fiterFileRecords(
+                ProcessOutputfile(
+                    climate_name, {}, body, GridOutputOrder, ":climate",
+                    folder, verbose, buffers=buffers,
+                ),
                 data,
-                body,
-                GridOutputOrder,
-                ":climate",
-                folder,
-                verbose,
             )
             prefix = system_name + "." + body
-            name = [
-                "DailyInsol",
-                "PlanckB",
-                "SeasonalDivF",
-                "SeasonalFIn",
-                "SeasonalFMerid",
-                "SeasonalFOut",
-                "SeasonalIceBalance",
-                "SeasonalTemp",
-            ]
-            for i in range(len(name)):
-                data = ProcessSeasonalClimatefile(
-                    prefix, data, body, name[i], folder, verbose
+            for name in SEASONAL_CLIMATE_GRIDS:
+                yield from fiterFileRecords(
+                    ProcessSeasonalClimatefile(
+                        prefix, {}, body, name, folder, verbose,
+                        buffers=buffers,
+                    ),
+                    data,
                 )
 
-    return data
+    yield from fiterDictRecords(data)
+
+
+def fiterFileRecords(dictFile, data):
+    """
+    Yield the records read from one output file.
+
+    The log lists each column of an output file with its units only, so
+    that entry is dropped from data once the file itself has been read.
+
+    Parameters
+    ----------
+    dictFile : dict
+        Data dictionary of the output file
+    data : dict
+        Data dictionary of the input files and log
+
+    Yields
+    ------
+    tuple
+        (key, units, values) for each key of dictFile
+    """
+    for k in dictFile:
+        data.pop(k, None)
+    yield from fiterDictRecords(dictFile)
+
+
+def fbIsOrderKey(k):
+    """Return True for OutputOrder and GridOutputOrder keys."""
+    var = k.split(":")[1]
+    return "OutputOrder" in var or "GridOutput" in var
+
+
+def fiterDictRecords(data):
+    """
+    Yield the entries of a data dictionary as records.
+
+    Parameters
+    ----------
+    data : dict
+        Data dictionary
+
+    Yields
+    ------
+    tuple
+        (key, units, values). values holds the key's rows; for OutputOrder
+        and GridOutputOrder keys it is the list of [variable, units] pairs,
+        and units is "".
+    """
+    for k, v in data.items():
+        if fbIsOrderKey(k):
+            yield k, "", v
+        else:
+            yield k, v[0], v[1:]
+
+
+def flistRecordEntry(k, units, values):
+    """Return the data dictionary entry of a record."""
+    if fbIsOrderKey(k):
+        return list(values)
+    return [units] + list(values)
+
+
+def fiterRecordBatches(iterRecords, iBatchBytes=None):
+    """
+    Group records into small data dictionaries.
+
+    A batch holds consecutive records with about iBatchBytes of arrays
+    between them. The streamed columns of one output file always form a
+    batch of their own, so the file is copied in a single pass.
+
+    Parameters
+    ----------
+    iterRecords : iterable
+        (key, units, values) records, as from fiterGatherData
+    iBatchBytes : int, optional
+        Array bytes per batch (default RECORD_BATCH_BYTES)
+
+    Yields
+    ------
+    dict
+        Data dictionary of each batch
+    """
+    if iBatchBytes is None:
+        iBatchBytes = RECORD_BATCH_BYTES
+    dictBatch = {}
+    sBatchStream = None
+    iBytes = 0
+    for k, units, values in iterRecords:
+        entry = flistRecordEntry(k, units, values)
+        sStream = fsStreamPath(entry)
+        if dictBatch and sStream != sBatchStream:
+            yield dictBatch
+            dictBatch = {}
+            iBytes = 0
+        dictBatch[k] = entry
+        sBatchStream = sStream
+        if sStream is None:
+            iBytes += sum(
+                value.nbytes for value in values
+                if isinstance(value, np.ndarray)
+            )
+            if iBytes >= iBatchBytes:
+                yield dictBatch
+                dictBatch = {}
+                iBytes = 0
+    if dictBatch:
+        yield dictBatch
+
+
+def fsStorageKind(k):
+    """
+    Return which storage settings a dataset key uses.
+
+    Parameters
+    ----------
+    k : str
+        Dataset key, e.g. 'earth:Obliquity:forward'
+
+    Returns
+    -------
+    str
+        "forward", "climate" or "scalar"
+    """
+    listParts = k.split(":")
+    if len(listParts) == 2:
+        # seasonal climate keys are body:variable
+        if "OutputOrder" in listParts[1]:
+            return "scalar"
+        return "climate"
+    if listParts[-1] == "climate":
+        return "climate"
+    if listParts[-1] == "forward" or listParts[-1] == "backward":
+        return "forward"
+    return "scalar"
+
+
+def fdictStorageOptions(dictOptions=None):
+    """
+    Build the storage settings for each kind of dataset.
+
+    Parameters
+    ----------
+    dictOptions : dict, optional
+        Any of sCompression ("gzip", "lzf" or "none"), iCompressionLevel
+        (0-9, gzip only), bShuffle and iScaleOffset (decimal digits kept by
+        the lossy scale-offset filter). They replace the defaults for
+        forward and climate data.
+
+    Returns
+    -------
+    dict
+        Settings for each kind in STORAGE_DEFAULTS
+    """
+    if dictOptions is None:
+        dictOptions = {}
+    for sOption in dictOptions:
+        if sOption not in STORAGE_DEFAULTS["forward"]:
+            raise ValueError("Unknown storage option: " + str(sOption))
+    if dictOptions.get("sCompression", "none") not in COMPRESSIONS:
+        raise ValueError(
+            "Unknown compression: " + str(dictOptions["sCompression"])
+        )
+    iLevel = dictOptions.get("iCompressionLevel")
+    if iLevel is not None and not 0 <= iLevel <= 9:
+        raise ValueError("iCompressionLevel must be between 0 and 9")
+
+    dictStorage = {}
+    for sKind, dictDefaults in STORAGE_DEFAULTS.items():
+        dictStorage[sKind] = dict(dictDefaults)
+        if sKind != "scalar":
+            dictStorage[sKind].update(dictOptions)
+    return dictStorage
+
+
+def ftChunkShape(tShape, iItemSize, iTargetBytes=CHUNK_TARGET_BYTES):
+    """
+    Choose a chunk shape for a dataset from its shape.
+
+    Starts from the whole array and halves the longest axis until a chunk
+    fits in iTargetBytes, so short series are a single chunk and long ones
+    are split along time.
+
+    Parameters
+    ----------
+    tShape : tuple of int
+        Dataset shape, with no zero-length axes
+    iItemSize : int
+        Bytes per element
+    iTargetBytes : int, optional
+        Largest chunk size in bytes (default CHUNK_TARGET_BYTES)
+
+    Returns
+    -------
+    tuple of int
+        Chunk shape
+    """
+    listChunk = list(tShape)
+    while np.prod(listChunk) * iItemSize > iTargetBytes:
+        iAxis = int(np.argmax(listChunk))
+        if listChunk[iAxis] == 1:
+            break
+        listChunk[iAxis] = (listChunk[iAxis] + 1) // 2
+    return tuple(listChunk)
+
+
+def fdictFilterOptions(dictKind):
+    """
+    Translate one kind's storage settings into h5py filter arguments.
+
+    Parameters
+    ----------
+    dictKind : dict
+        One entry of fdictStorageOptions
+
+    Returns
+    -------
+    dict
+        compression, compression_opts, shuffle and scaleoffset arguments
+        for create_dataset, leaving out the ones that are not used
+    """
+    dictFilters = {}
+    if dictKind["sCompression"] != "none":
+        dictFilters["compression"] = dictKind["sCompression"]
+        if (
+            dictKind["sCompression"] == "gzip"
+            and dictKind["iCompressionLevel"] is not None
+        ):
+            dictFilters["compression_opts"] = dictKind["iCompressionLevel"]
+    if dictKind["bShuffle"]:
+        dictFilters["shuffle"] = True
+    if dictKind["iScaleOffset"] is not None:
+        dictFilters["scaleoffset"] = dictKind["iScaleOffset"]
+    return dictFilters
+
+
+def fdictDatasetOptions(k, arr, dictStorage=None):
+    """
+    Return the create_dataset arguments for one array.
+
+    Fletcher32 is enabled on non-empty numeric arrays, except with the
+    lossy scale-offset filter, which HDF5 does not allow with checksums.
+    The checksum stores even single values as a chunk, which is only cheap
+    in files opened with ARCHIVE_LIBVER. Numeric arrays of at least
+    COMPRESS_MIN_BYTES are chunked with ftChunkShape and filtered with the
+    settings for their kind.
+
+    Parameters
+    ----------
+    k : str
+        Dataset key
+    arr : np.ndarray
+        Data to be written
+    dictStorage : dict, optional
+        Settings from fdictStorageOptions. If None, only the checksum is
+        set.
+
+    Returns
+    -------
+    dict
+        Keyword arguments for create_dataset
+    """
+    # Fletcher32 only works on datasets with at least one dimension and
+    # a numeric type (not strings or objects)
+    bNumeric = arr.ndim > 0 and arr.dtype.kind in ("i", "u", "f", "c")
+    dictOptions = {"fletcher32": bNumeric}
+    if dictStorage is None or not bNumeric or arr.nbytes < COMPRESS_MIN_BYTES:
+        return dictOptions
+
+    dictFilters = fdictFilterOptions(dictStorage[fsStorageKind(k)])
+    if not dictFilters:
+        return dictOptions
+    dictOptions.update(dictFilters)
+    dictOptions["chunks"] = ftChunkShape(arr.shape, arr.dtype.itemsize)
+    if "scaleoffset" in dictFilters:
+        dictOptions["fletcher32"] = False
+    return dictOptions
+
+
+def fsValueKind(var, vplanet_help):
+    """
+    Return how the values of a variable are stored.
+
+    Options take their type from vplanet -H. The output order options and
+    keys hold variable names, and log values and anything else vplanet -H
+    does not list are numbers.
+
+    Parameters
+    ----------
+    var : str
+        Variable name, the middle part of a key
+    vplanet_help : dict
+        Parsed vplanet -H output
+
+    Returns
+    -------
+    str
+        "S" for text, "i" for Int and Bool options, "f" otherwise
+    """
+    if var in ("saOutputOrder", "saGridOutput") or "OutputOrder" in var:
+        return "S"
+    sType = vplanet_help.get(var, {}).get("Type")
+    if sType in ("String", "String-Array"):
+        return "S"
+    if sType in ("Int", "Bool"):
+        return "i"
+    return "f"
+
+
+def fdaTypedValues(listValues, sKind):
+    """
+    Convert the text values of a key to a numeric array.
+
+    Parameters
+    ----------
+    listValues : list of str
+        Values as read from the log or input file
+    sKind : str
+        "i" or "f", as from fsValueKind
+
+    Returns
+    -------
+    np.ndarray
+        int64 for "i" values that are all whole numbers, float64 for other
+        numbers, and a bytes array if any value is not a number, so that
+        unexpected text is archived as it was rather than lost.
+    """
+    try:
+        daValues = np.array(listValues, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array(listValues, dtype="S")
+    if (
+        sKind == "i"
+        and np.all(np.isfinite(daValues))
+        and np.all(daValues == np.round(daValues))
+    ):
+        return daValues.astype(np.int64)
+    return daValues
 
 
 def DictToBP(
-    data, vplanet_help, h5_file, verbose=False, group_name="", archive=True
+    data,
+    vplanet_help,
+    h5_file,
+    verbose=False,
+    group_name="",
+    archive=True,
+    storage=None,
 ):
+    """
+    Write a data dictionary into an HDF5 file or group.
+
+    Parameters
+    ----------
+    data : dict or iterable
+        Data dictionary, or (key, units, values) records as from
+        fiterGatherData. Records are written batch by batch as they arrive,
+        so only one batch is held at a time.
+    vplanet_help : dict
+        Parsed vplanet -H output
+    h5_file : h5py.File
+        Open file to write into
+    verbose : bool, optional
+        Print each dataset as it is written (default False)
+    group_name : str, optional
+        Group of the simulation in an archive
+    archive : bool, optional
+        Write into group_name rather than the top level (default True)
+    storage : dict, optional
+        Settings from fdictStorageOptions
+
+    Returns
+    -------
+    None
+    """
+    if not isinstance(data, dict):
+        for dictBatch in fiterRecordBatches(data):
+            DictToBP(
+                dictBatch, vplanet_help, h5_file, verbose, group_name,
+                archive, storage,
+            )
+        return
+
+    # columns of large output files are copied after the other keys
+    dictStreams = fdictGroupStreams(data.items())
+    listStreamed = []
 
     for k, v in data.items():
 
         var = k.split(":")[1]
 
-        if "OutputOrder" in var or "GridOutput" in var:
+        if fbIsOrderKey(k):
             v_value = v
             v_attr = ""
 
@@ -535,26 +1818,23 @@ def DictToBP(
             v_attr = v[0]
             v_value = v[1:]
 
-        if "Output" in var:
-            tp = "S"
-
-        elif var not in vplanet_help:
-            tp = "float"
-
-        else:
-            if (
-                vplanet_help.get(var, {}).get("Type") == "String"
-                or vplanet_help.get(var, {}).get("Type") == "String-Array"
-            ):
-                tp = "S"
-            else:
-                tp = "float"
+        tp = fsValueKind(var, vplanet_help)
 
         if archive == True and group_name:
             dataset_name = group_name + "/" + k
         else:
             dataset_name = k
 
+        if fsStreamPath(v) in dictStreams:
+            listStreamed.append((dataset_name, k, v_attr, v_value[0]))
+            continue
+
+        if fbIsStreamedBlock(v):
+            fnAppendStreamedBlock(
+                h5_file, dataset_name, k, v_attr, v_value[0], storage
+            )
+            continue
+
         if verbose == True:
             print()
             print("Dataset:", dataset_name)
@@ -563,20 +1843,23 @@ def DictToBP(
             print("Value:", v_value)
             print()
 
-        # Enable Fletcher32 checksum for data integrity verification
-        # Note: Fletcher32 only works on:
-        # 1. Datasets with at least one dimension (not scalars)
-        # 2. Numeric data types (not strings or objects)
-        import numpy as np
-
-        # Convert to numpy array to check dimensions and dtype
-        arr = np.asarray(v_value)
-        # Fletcher32 requires non-scalar numeric data
-        bUseFletcherChecksum = (
-            arr.ndim > 0 and
-            arr.dtype.kind in ('i', 'u', 'f', 'c')  # integer, unsigned, float, complex
+        # Enable Fletcher32 checksum for data integrity verification, and
+        # chunking and compression for large numeric arrays
+        arr = fdaStackRows(v_value)
+        if arr.dtype.kind == "f":
+            v_value = arr
+        elif tp != "S":
+            arr = fdaTypedValues(v_value, tp)
+            if arr.dtype.kind != "S":
+                v_value = arr
+        h5_file.create_dataset(
+            dataset_name, data=v_value, **fdictDatasetOptions(k, arr, storage)
         )
 
-        h5_file.create_dataset(dataset_name, data=v_value, fletcher32=bUseFletcherChecksum)
-
         h5_file[dataset_name].attrs["Units"] = v_attr
+
+    for sPath in dictStreams:
+        listColumns = [t for t in listStreamed if t[3].sPath == sPath]
+        if verbose == True:
+            print("Streaming", sPath)
+        fnStreamToDatasets(h5_file, listColumns, storage)
@@ -1,10 +1,26 @@
 #!/usr/bin/env python
 
+import hashlib
+import json
 import os
+import shlex
+import shutil
 import subprocess as sub
 import sys
+import tempfile
 from itertools import chain
 
+try:
+    from importlib import metadata
+except ImportError:  # Python < 3.8
+    metadata = None
+
+# Parsed `vplanet -H` output shipped with bigplanet, used when vplanet is not
+# on the PATH
+VPLANET_HELP_SNAPSHOT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "vplanet_help.json"
+)
+
 
 def DollarSign(m_bl, m_line, m_num, m_file):
     """Process each line looking for $ at the end, continue until no $ present"""
@@ -26,16 +42,17 @@ def ReadFile(bplSplitFile, verbose=False, archive=False):
     SimName = ""
 
     with open(bplSplitFile, "r") as input:
-        # first thing we check is if both include and exclude are in the file bc that is bad
-        if "saKeyInclude" and "saKeyExclude" in input.read():
+        # now we loop over the file and get the various inputs
+        content = [line.strip().split() for line in input.readlines()]
+
+        # include and exclude lists are mutually exclusive
+        setOptions = set(line[0] for line in content if line)
+        if "saKeyInclude" in setOptions and "saKeyExclude" in setOptions:
             print(
                 "ERROR: saKeyInclude and saKeyExclude are mutually exclusive"
             )
             exit()
 
-    with open(bplSplitFile, "r") as input:
-        # now we loop over the file and get the various inputs
-        content = [line.strip().split() for line in input.readlines()]
         for num, line in enumerate(content):
             if line:
                 # we get the folder where the raw data is stored and have the default output file name set
@@ -144,6 +161,126 @@ def ReadFile(bplSplitFile, verbose=False, archive=False):
         )
 
 
+def ReadStorageOptions(bplSplitFile):
+    """
+    Read the archive storage options from a BigPlanet input file.
+
+    Parameters
+    ----------
+    bplSplitFile : str
+        Path to the bpl.in file
+
+    Returns
+    -------
+    dict
+        The sCompression, iCompressionLevel, bShuffle and iScaleOffset
+        options that are set in the file. bShuffle on its own, or with any
+        value other than 0 or false, turns shuffling on.
+    """
+    dictOptions = {}
+    with open(bplSplitFile, "r") as input:
+        content = [line.strip().split() for line in input.readlines()]
+        for line in content:
+            if line:
+                if line[0] == "sCompression":
+                    dictOptions["sCompression"] = line[1].lower()
+                if line[0] == "iCompressionLevel":
+                    dictOptions["iCompressionLevel"] = int(line[1])
+                if line[0] == "bShuffle":
+                    dictOptions["bShuffle"] = (
+                        len(line) < 2 or line[1].lower() not in ("0", "false")
+                    )
+                if line[0] == "iScaleOffset":
+                    dictOptions["iScaleOffset"] = int(line[1])
+
+    return dictOptions
+
+
+def ReadPrefetchOptions(bplSplitFile):
+    """
+    Read the archive prefetch options from a BigPlanet input file.
+
+    Parameters
+    ----------
+    bplSplitFile : str
+        Path to the bpl.in file
+
+    Returns
+    -------
+    dict
+        The iPrefetchDepth and iPrefetchMB options that are set in the file
+    """
+    dictOptions = {}
+    with open(bplSplitFile, "r") as input:
+        content = [line.strip().split() for line in input.readlines()]
+        for line in content:
+            if line:
+                if line[0] in ("iPrefetchDepth", "iPrefetchMB"):
+                    dictOptions[line[0]] = int(line[1])
+
+    return dictOptions
+
+
+def ReadPrecomputeStats(bplSplitFile):
+    """
+    Read the statistics to store with an archive from a BigPlanet input file.
+
+    Parameters
+    ----------
+    bplSplitFile : str
+        Path to the bpl.in file
+
+    Returns
+    -------
+    list of str or None
+        The statistics listed after saPrecomputeStats, an empty list if it
+        is given without any, or None if it is not set
+    """
+    listStats = None
+    with open(bplSplitFile, "r") as input:
+        content = [line.strip().split() for line in input.readlines()]
+        for num, line in enumerate(content):
+            if line:
+                if line[0] == "saPrecomputeStats":
+                    listStats = []
+                    if len(line) > 1:
+                        DollarSign(listStats, line[1:], num, content)
+                        listStats = list(chain.from_iterable(listStats))
+
+    return listStats
+
+
+def ReadParseCacheOptions(bplSplitFile):
+    """
+    Read the parsed-file cache options from a BigPlanet input file.
+
+    Parameters
+    ----------
+    bplSplitFile : str
+        Path to the bpl.in file
+
+    Returns
+    -------
+    dict
+        The bParseCache and iParseCacheMB options that are set in the
+        file. bParseCache on its own, or with any value other than 0 or
+        false, turns the cache on.
+    """
+    dictOptions = {}
+    with open(bplSplitFile, "r") as input:
+        content = [line.strip().split() for line in input.readlines()]
+        for line in content:
+            if line:
+                if line[0] == "bParseCache":
+                    dictOptions["bParseCache"] = (
+                        len(line) < 2 or line[1].lower() not in ("0", "false")
+                    )
+                if line[0] == "iParseCacheMB":
+                    dictOptions["iParseCacheMB"] = int(line[1])
+
+    return dictOptions
+
+
 def GetDir(vspace_file):
     """Give it input file and returns name of folder where simulations are located."""
 
@@ -224,7 +361,178 @@ def GetSNames(bodyfiles, sims):
 
 
 def GetVplanetHelp():
-    command = r"vplanet -H | egrep -v '^$|^\+' | cut -f 2,4 -d '|' | egrep '^ \*\*|^ Cust|^ Type|^ Dim|^ Defa|^Output Parameters'"
+    """
+    Return the option metadata from the VPLanet help, using a disk cache.
+
+    The parsed help is cached in fsCacheDir() for each vplanet executable,
+    and reused while the executable's path, modification time, size and
+    installed package version are unchanged. Without vplanet on the PATH,
+    the snapshot bundled with bigplanet is returned.
+
+    Returns
+    -------
+    dict
+        For each option, its Type, Custom Unit, Dimension and Default Value
+    """
+    sExecutable = shutil.which("vplanet")
+    if sExecutable is None:
+        return fdictReadHelpSnapshot()
+
+    dictKey = fdictVplanetKey(sExecutable)
+    sCacheFile = fsHelpCacheFile(dictKey["path"])
+    try:
+        with open(sCacheFile, "r") as f:
+            dictCache = json.load(f)
+        if dictCache["key"] == dictKey:
+            return dictCache["help"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    vplanet_dict = ParseVplanetHelp(sExecutable)
+    if not vplanet_dict:
+        print("WARNING: Unable to run", sExecutable, "-H")
+        return fdictReadHelpSnapshot()
+    fnWriteHelpCache(sCacheFile, dictKey, vplanet_dict)
+    return vplanet_dict
+
+
+def fsCacheDir():
+    """
+    Return the directory where bigplanet keeps cached files.
+
+    Uses $BIGPLANET_CACHE_DIR if set, otherwise bigplanet under
+    $XDG_CACHE_HOME or ~/.cache.
+
+    Returns
+    -------
+    str
+        Path to the cache directory, which may not exist yet
+    """
+    sDir = os.environ.get("BIGPLANET_CACHE_DIR")
+    if sDir:
+        return sDir
+    sBase = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(sBase, "bigplanet")
+
+
+def fdictVplanetKey(sExecutable):
+    """
+    Describe a vplanet executable well enough to tell when it changes.
+
+    Parameters
+    ----------
+    sExecutable : str
+        Path to the vplanet executable
+
+    Returns
+    -------
+    dict
+        Resolved path, mtime in ns, size, and the version of the installed
+        vplanet package ("" if vplanet was not installed with pip)
+    """
+    sPath = os.path.realpath(sExecutable)
+    stat = os.stat(sPath)
+    sVersion = ""
+    if metadata is not None:
+        try:
+            sVersion = metadata.version("vplanet")
+        except metadata.PackageNotFoundError:
+            pass
+    return {
+        "path": sPath,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "version": sVersion,
+    }
+
+
+def fsHelpCacheFile(sExecutable):
+    """
+    Return the cache file for one vplanet executable.
+
+    Parameters
+    ----------
+    sExecutable : str
+        Resolved path to the vplanet executable
+
+    Returns
+    -------
+    str
+        Path to the JSON cache file
+    """
+    sDigest = hashlib.sha1(sExecutable.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(fsCacheDir(), "vplanet_help_" + sDigest + ".json")
+
+
+def fnWriteHelpCache(sCacheFile, dictKey, dictHelp):
+    """
+    Write parsed help to the cache, replacing any older entry at once.
+
+    Failing to write, e.g. on a read-only home directory, is not an error.
+
+    Parameters
+    ----------
+    sCacheFile : str
+        Path to the JSON cache file
+    dictKey : dict
+        Executable description from fdictVplanetKey
+    dictHelp : dict
+        Parsed help from ParseVplanetHelp
+
+    Returns
+    -------
+    None
+    """
+    sDir = os.path.dirname(sCacheFile)
+    try:
+        os.makedirs(sDir, exist_ok=True)
+        iFd, sTmp = tempfile.mkstemp(dir=sDir, suffix=".tmp")
+        with os.fdopen(iFd, "w") as f:
+            json.dump({"key": dictKey, "help": dictHelp}, f)
+        os.replace(sTmp, sCacheFile)
+    except OSError:
+        pass
+
+
+def fdictReadHelpSnapshot():
+    """
+    Return the VPLanet help bundled with bigplanet.
+
+    Returns
+    -------
+    dict
+        Parsed help of the VPLanet version recorded in the snapshot
+    """
+    with open(VPLANET_HELP_SNAPSHOT, "r") as f:
+        dictSnapshot = json.load(f)
+    print(
+        "WARNING: vplanet not found. Using the option list of VPLanet",
+        dictSnapshot["vplanet_version"],
+        "bundled with bigplanet.",
+    )
+    return dictSnapshot["help"]
+
+
+def ParseVplanetHelp(sExecutable="vplanet"):
+    """
+    Run `vplanet -H` and parse the metadata of every option.
+
+    Parameters
+    ----------
+    sExecutable : str, optional
+        vplanet executable to run (default "vplanet")
+
+    Returns
+    -------
+    dict
+        For each option, its Type, Custom Unit, Dimension and Default Value
+    """
+    command = (
+        shlex.quote(sExecutable)
+        + r" -H | egrep -v '^$|^\+' | cut -f 2,4 -d '|' | egrep '^ \*\*|^ Cust|^ Type|^ Dim|^ Defa|^Output Parameters'"
+    )
     py_ver = sys.version.split()[0]
     if "3.6" in py_ver:
         proc = sub.run(
@@ -14,6 +14,7 @@ setup(
     author_email="cwilhelm@uw.edu",
     license="MIT",
     packages=["bigplanet"],
+    package_data={"bigplanet": ["data/*.json"]},
     include_package_data=True,
     use_scm_version={
         "version_scheme": "post-release",
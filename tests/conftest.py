@@ -15,6 +15,8 @@ import h5py
 import numpy as np
 import pytest
 
+from tests.fixtures import generators
+
 
 @pytest.fixture
 def tempdir():
@@ -191,6 +193,23 @@ dAge		1e6
     return sim_dir
 
 
+@pytest.fixture
+def synthetic_sweep(tempdir, monkeypatch):
+    """
+    Create a small synthetic parameter sweep and chdir into it.
+
+    Builds three simulations under ``test_sims`` plus a bpl.in that only
+    lists earth.in as a body file (the generators do not write forward
+    files for the sun). Returns the path to bpl.in.
+    """
+    generators.fnCreateMultipleSimulations(tempdir / "test_sims", 3)
+    pathBpl = generators.fnCreateBigPlanetIn(
+        tempdir, "test_sims", listBodyFiles=["earth.in"]
+    )
+    monkeypatch.chdir(tempdir)
+    return pathBpl
+
+
 @pytest.fixture
 def sample_vplanet_help_dict():
     """Return a sample VPLanet help dictionary for testing."""
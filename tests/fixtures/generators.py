@@ -11,6 +11,18 @@ from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 
+# Seasonal climate grids that the archiver reads for every climate body
+SEASONAL_CLIMATE_GRIDS = [
+    "DailyInsol",
+    "PlanckB",
+    "SeasonalDivF",
+    "SeasonalFIn",
+    "SeasonalFMerid",
+    "SeasonalFOut",
+    "SeasonalIceBalance",
+    "SeasonalTemp",
+]
+
 
 def fnCreateMinimalSimulation(
     pathSimDir: pathlib.Path,
@@ -18,7 +30,10 @@ def fnCreateMinimalSimulation(
     listBodyNames: Optional[List[str]] = None,
     iNumTimeSteps: int = 6,
     bIncludeForward: bool = True,
-    bIncludeClimate: bool = False
+    bIncludeClimate: bool = False,
+    iNumLatitudes: int = 10,
+    iNumDays: int = 12,
+    bSystemOutFile: bool = False
 ) -> None:
     """
     Create a minimal VPLanet simulation directory for testing.
@@ -37,6 +52,13 @@ def fnCreateMinimalSimulation(
         Whether to include forward evolution files (default True)
     bIncludeClimate : bool, optional
         Whether to include climate files (default False)
+    iNumLatitudes : int, optional
+        Latitude rows in each seasonal climate grid (default 10)
+    iNumDays : int, optional
+        Day columns in each seasonal climate grid (default 12)
+    bSystemOutFile : bool, optional
+        Name each body's sOutFile after the system, like the forward files
+        written here, rather than after the body (default False)
     """
     if listBodyNames is None:
         listBodyNames = ["sun", "earth"]
@@ -51,7 +73,8 @@ def fnCreateMinimalSimulation(
         if sBody == "sun":
             fnCreateSunIn(pathSimDir)
         else:
-            fnCreateBodyIn(pathSimDir, sBody, bIncludeForward, bIncludeClimate)
+            fnCreateBodyIn(pathSimDir, sBody, bIncludeForward, bIncludeClimate,
+                           sSystemName if bSystemOutFile else None)
 
     # Create log file
     fnCreateLogFile(pathSimDir, sSystemName, listBodyNames, bIncludeForward, bIncludeClimate)
@@ -62,6 +85,12 @@ def fnCreateMinimalSimulation(
             if sBody != "sun":
                 fnCreateForwardFile(pathSimDir, sSystemName, sBody, iNumTimeSteps)
 
+    # Create climate files if requested
+    if bIncludeClimate:
+        for sBody in listBodyNames:
+            if sBody != "sun":
+                fnCreateClimateFiles(pathSimDir, sSystemName, sBody,
+                                     iNumLatitudes, iNumDays)
 
 def fnCreateVplIn(
     pathSimDir: pathlib.Path,
@@ -112,15 +141,23 @@ def fnCreateBodyIn(
     pathSimDir: pathlib.Path,
     sBodyName: str,
     bIncludeForward: bool,
-    bIncludeClimate: bool
+    bIncludeClimate: bool,
+    sSystemName: Optional[str] = None
 ) -> None:
-    """Create a planetary body input file."""
+    """
+    Create a planetary body input file.
+
+    sOutFile is named after sSystemName if given, and otherwise after the
+    body.
+    """
+    if sSystemName is None:
+        sSystemName = sBodyName
     sOutputOrder = "-Time -TMan -TCore -Eccentricity -Obliquity"
     sGridOutput = ""
     sOutFile = ""
 
     if bIncludeForward:
-        sOutFile = f"\nsOutFile {sBodyName}.{sBodyName}.forward"
+        sOutFile = f"\nsOutFile {sSystemName}.{sBodyName}.forward"
 
     if bIncludeClimate:
         sGridOutput = "\nsaGridOutput -DailyInsol -SeasonalTemp"
@@ -283,10 +320,36 @@ def fnCreateForwardFile(
     np.savetxt(pathFile, daData, fmt='%.6e')
 
 
+def fnCreateClimateFiles(
+    pathSimDir: pathlib.Path,
+    sSystemName: str,
+    sBodyName: str,
+    iNumLatitudes: int,
+    iNumDays: int
+) -> None:
+    """Create the Climate file and seasonal climate grids for a body."""
+    daLatitudes = np.linspace(-90, 90, iNumLatitudes)
+    daDays = np.linspace(0, 1, iNumDays, endpoint=False)
+    daInsol = 400 * np.cos(np.radians(daLatitudes))
+    daTemp = 30 - 60 * np.abs(daLatitudes) / 90
+
+    pathFile = pathSimDir / f"{sSystemName}.{sBodyName}.Climate"
+    np.savetxt(pathFile, np.column_stack([daInsol, daTemp]), fmt='%.6e')
+
+    pathClimate = pathSimDir / "SeasonalClimateFiles"
+    pathClimate.mkdir(exist_ok=True)
+    daSeason = 1 + 0.1 * np.sin(2 * np.pi * daDays)
+    for iGrid, sGrid in enumerate(SEASONAL_CLIMATE_GRIDS):
+        daGrid = np.outer(daInsol + iGrid, daSeason)
+        sFilename = f"{sSystemName}.{sBodyName}.{sGrid}.0"
+        np.savetxt(pathClimate / sFilename, daGrid, fmt='%.6e')
+
+
 def fnCreateMultipleSimulations(
     pathBaseDir: pathlib.Path,
     iNumSims: int,
-    sTrialName: str = "sim_"
+    sTrialName: str = "sim_",
+    **kwargs
 ) -> List[pathlib.Path]:
     """
     Create multiple simulation directories for testing parameter sweeps.
@@ -299,6 +362,8 @@ def fnCreateMultipleSimulations(
         Number of simulations to create
     sTrialName : str, optional
         Prefix for trial names (default "sim_")
+    **kwargs
+        Passed to fnCreateMinimalSimulation for every simulation
 
     Returns
     -------
@@ -310,7 +375,7 @@ def fnCreateMultipleSimulations(
     for iSim in range(iNumSims):
         sSimName = f"{sTrialName}{iSim:02d}"
         pathSimDir = pathBaseDir / sSimName
-        fnCreateMinimalSimulation(pathSimDir)
+        fnCreateMinimalSimulation(pathSimDir, **kwargs)
         listSimDirs.append(pathSimDir)
 
     return listSimDirs
@@ -8,11 +8,13 @@ management and multiprocessing worker functions.
 import multiprocessing as mp
 import os
 import pathlib
+import shutil
 import pytest
 import h5py
 import numpy as np
 
-from bigplanet import archive
+from bigplanet import archive, checkpoint, extract, process
+from tests.fixtures import generators
 
 
 class TestCreateCP:
@@ -312,6 +314,1108 @@ class TestWriteSimulationToArchive:
             assert "earth:Mass:final" in grp
 
 
-# TODO: Add integration tests for Archive() function
-# These require more complex setup with proper simulation directories
-# and BPL input files. The helper functions are already well-tested above.
+class TestSingleWriter:
+    """Tests for the single-writer archive pipeline."""
+
+    def test_archive_writer_mode(self, synthetic_sweep, monkeypatch,
+                                 sample_vplanet_help_dict):
+        """
+        Given: A synthetic sweep of three simulations
+        When: Archive is called in writer mode with two parsers
+        Then: Every simulation is written and marked complete
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+
+        archive.Archive(
+            str(synthetic_sweep), 2, True, False, False, False, mode="writer"
+        )
+
+        with h5py.File("test_sims.bpa", "r") as f:
+            assert sorted(archive.flistSimulationGroups(f)) == ["sim_00", "sim_01", "sim_02"]
+            assert "earth:TMan:forward" in f["sim_01"]
+
+        with checkpoint.OpenCheckpoint(".test_sims_BPL") as cp:
+            assert cp.fdictSummary()["done"] == 3
+
+    def test_writer_matches_lock_mode(self, synthetic_sweep, monkeypatch,
+                                      sample_vplanet_help_dict):
+        """
+        Given: The same sweep archived in lock mode and writer mode
+        When: The two archives are compared
+        Then: They contain identical groups and forward data
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+
+        archive.Archive(
+            str(synthetic_sweep), 2, True, False, False, False, mode="lock"
+        )
+        os.rename("test_sims.bpa", "lock.bpa")
+        checkpoint.RemoveCheckpoint(".test_sims_BPL")
+        archive.Archive(
+            str(synthetic_sweep), 2, True, False, False, False, mode="writer"
+        )
+
+        with h5py.File("lock.bpa", "r") as fLock, \
+                h5py.File("test_sims.bpa", "r") as fWriter:
+            assert sorted(fLock.keys()) == sorted(fWriter.keys())
+            for sGroup in archive.flistSimulationGroups(fLock):
+                assert sorted(fLock[sGroup].keys()) == sorted(
+                    fWriter[sGroup].keys()
+                )
+                np.testing.assert_array_equal(
+                    fLock[sGroup]["earth:TMan:forward"][()],
+                    fWriter[sGroup]["earth:TMan:forward"][()],
+                )
+
+    def test_parser_always_sends_sentinel(self, tempdir,
+                                          checkpoint_file_all_done):
+        """
+        Given: A checkpoint with nothing left to claim
+        When: par_parser runs
+        Then: It puts only the None sentinel on the queue
+        """
+        queueSims = mp.Queue()
+
+        archive.par_parser(
+            str(checkpoint_file_all_done), "earth", ["earth"], "earth.log",
+            ["earth.in", "vpl.in"], mp.Lock(), {}, queueSims, False
+        )
+
+        assert queueSims.get(timeout=5) is None
+        assert queueSims.empty()
+
+    def test_writer_marks_complete(self, tempdir, sample_vplanet_help_dict):
+        """
+        Given: A queue holding one parsed simulation and a sentinel
+        When: fnArchiveWriter drains it
+        Then: The group is written and the checkpoint entry is set to 1
+        """
+        sFolder = str(tempdir / "sim_00")
+        pathCheckpoint = tempdir / ".test_BPL"
+        archive.CreateCP(str(pathCheckpoint), "test.in", [sFolder])
+
+        queueSims = mp.Queue()
+        queueSims.put(
+            (sFolder, "{}", {"earth:Mass:final": ["kg", "5.972e24"]})
+        )
+        queueSims.put((sFolder, "{}", None))
+        queueSims.put(None)
+
+        archive.fnArchiveWriter(
+            queueSims, [None], str(pathCheckpoint), mp.Lock(),
+            str(tempdir / "test.bpa"), sample_vplanet_help_dict, True, False
+        )
+
+        with h5py.File(tempdir / "test.bpa", "r") as f:
+            assert "/sim_00/earth:Mass:final" in f
+        with open(pathCheckpoint, "r") as f:
+            assert f"{sFolder} 1" in f.readlines()[2]
+
+
+    @pytest.mark.parametrize("bRagged", [False, True])
+    def test_writer_interleaved_batches(self, tempdir, bRagged,
+                                        sample_vplanet_help_dict):
+        """
+        Given: The batches of two simulations arriving interleaved
+        When: fnArchiveWriter drains the queue
+        Then: Each simulation is written whole, with its manifest
+        """
+        listFolders = [str(tempdir / "sim_00"), str(tempdir / "sim_01")]
+        pathCheckpoint = tempdir / ".test_BPL"
+        archive.CreateCP(str(pathCheckpoint), "test.in", listFolders)
+
+        queueSims = mp.Queue()
+        for i, sFolder in enumerate(listFolders):
+            queueSims.put((sFolder, "{}", {
+                "earth:TMan:forward": ["K", np.arange(3.0) + i]
+            }))
+        for i, sFolder in enumerate(listFolders):
+            queueSims.put((sFolder, "{}", {"earth:Mass:final": ["kg", str(i)]}))
+            queueSims.put((sFolder, "{}", None))
+        queueSims.put(None)
+
+        archive.fnArchiveWriter(
+            queueSims, [None], str(pathCheckpoint), mp.Lock(),
+            str(tempdir / "test.bpa"), sample_vplanet_help_dict, True, False,
+            bRagged,
+        )
+
+        with h5py.File(tempdir / "test.bpa", "r") as f:
+            assert archive.flistSimulationGroups(f) == ["sim_00", "sim_01"]
+            assert f["sim_01"].attrs[archive.MANIFEST_ATTR] == "{}"
+            assert archive.ExtractColumn(f, "earth:Mass:final") == [0.0, 1.0]
+            listTMan = archive.ExtractColumn(f, "earth:TMan:forward")
+            np.testing.assert_array_equal(np.ravel(listTMan[1]), [1, 2, 3])
+
+    @pytest.mark.parametrize("bRagged", [False, True])
+    def test_writer_interleaved_blocks(self, tempdir, bRagged,
+                                       sample_vplanet_help_dict):
+        """
+        Given: The streamed blocks of two simulations arriving interleaved
+        When: fnArchiveWriter drains the queue
+        Then: Each simulation's series is the concatenation of its blocks
+        """
+        listFolders = [str(tempdir / "sim_00"), str(tempdir / "sim_01")]
+        pathCheckpoint = tempdir / ".test_BPL"
+        archive.CreateCP(str(pathCheckpoint), "test.in", listFolders)
+
+        queueSims = mp.Queue()
+        for iRow in (0, 3):
+            for i, sFolder in enumerate(listFolders):
+                block = process.StreamedBlock(
+                    np.arange(iRow, iRow + 3.0) + 10 * i, iRow, 6, iRow == 3
+                )
+                queueSims.put(
+                    (sFolder, "{}", {"earth:TMan:forward": ["K", block]})
+                )
+        for sFolder in listFolders:
+            queueSims.put((sFolder, "{}", None))
+        queueSims.put(None)
+
+        archive.fnArchiveWriter(
+            queueSims, [None], str(pathCheckpoint), mp.Lock(),
+            str(tempdir / "test.bpa"), sample_vplanet_help_dict, True, False,
+            bRagged,
+        )
+
+        with h5py.File(tempdir / "test.bpa", "r") as f:
+            assert archive.flistSimulationGroups(f) == ["sim_00", "sim_01"]
+            listTMan = archive.ExtractColumn(f, "earth:TMan:forward")
+            for i, daTMan in enumerate(listTMan):
+                np.testing.assert_array_equal(
+                    np.ravel(daTMan), np.arange(6.0) + 10 * i
+                )
+            assert archive.ExtractUnits(f, "earth:TMan:forward") == "K"
+            if bRagged:
+                assert "earth:TMan:forward" not in f["sim_00"]
+
+    @pytest.mark.parametrize("bRagged", [False, True])
+    def test_writer_discards_unfinished(self, tempdir, bRagged,
+                                        sample_vplanet_help_dict):
+        """
+        Given: A parser that stopped part way through a claimed simulation
+        When: fnArchiveWriter drains the queue
+        Then: Nothing of it is left in the archive and it is to do again
+        """
+        sFolder = str(tempdir / "sim_00")
+        pathCheckpoint = tempdir / ".test_BPL"
+        archive.CreateCP(
+            str(pathCheckpoint), "test.in", [sFolder], backend="sqlite"
+        )
+        with checkpoint.OpenCheckpoint(str(pathCheckpoint)) as cp:
+            assert cp.fsClaimNext() == sFolder
+
+        queueSims = mp.Queue()
+        queueSims.put((sFolder, "{}", {
+            "earth:TMan:forward": ["K", np.arange(3.0)],
+            "earth:Mass:final": ["kg", "1.0"],
+        }))
+        queueSims.put(None)
+
+        archive.fnArchiveWriter(
+            queueSims, [None], str(pathCheckpoint), mp.Lock(),
+            str(tempdir / "test.bpa"), sample_vplanet_help_dict, True, False,
+            bRagged,
+        )
+
+        with h5py.File(tempdir / "test.bpa", "r") as f:
+            assert [
+                sName for sName in f.keys()
+                if sName != archive.SERIES_GROUP
+            ] == []
+            if bRagged:
+                hSeries = f[archive.SERIES_GROUP]["earth:TMan:forward"]
+                assert len(hSeries["names"]) == 0
+        with checkpoint.OpenCheckpoint(str(pathCheckpoint)) as cp:
+            assert cp.fdictSummary()["remaining"] == 1
+            assert cp.fsClaimNext() == sFolder
+
+    def test_failed_parser_raises(self, synthetic_sweep, monkeypatch,
+                                  sample_vplanet_help_dict):
+        """
+        Given: A parser that raises after sending part of a simulation
+        When: Archive is called in writer mode
+        Then: It raises, and the archive holds no partial group
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+
+        def fiterFailingRecords(*args, **kwargs):
+            yield "earth:Mass:final", "kg", ["1.0"]
+            raise OSError("simulation folder vanished")
+
+        monkeypatch.setattr(
+            archive, "fiterSimulationRecords", fiterFailingRecords
+        )
+        # the first record reaches the writer before the parser fails
+        monkeypatch.setattr(process, "RECORD_BATCH_BYTES", 0)
+
+        with pytest.raises(RuntimeError):
+            archive.Archive(
+                str(synthetic_sweep), 1, True, False, False, False,
+                mode="writer"
+            )
+
+        with h5py.File("test_sims.bpa", "r") as f:
+            assert list(f.keys()) == []
+        with checkpoint.OpenCheckpoint(".test_sims_BPL") as cp:
+            dictSummary = cp.fdictSummary()
+        assert dictSummary["done"] == 0
+        assert dictSummary["remaining"] == 3
+
+
+class TestSimulationPrefetcher:
+    """Tests for reading simulation folders ahead of parsing."""
+
+    def fnCreateSweep(self, tempdir, iSims=3):
+        generators.fnCreateMultipleSimulations(
+            tempdir / "test_sims", iSims, bIncludeClimate=True,
+            iNumLatitudes=3, iNumDays=2,
+        )
+        return sorted(
+            str(path) for path in (tempdir / "test_sims").iterdir()
+        )
+
+    def test_prefetch_reads_simulation_files(self, tempdir):
+        """
+        Given: Simulation folders with an unrelated file in one of them
+        When: They are iterated through a SimulationPrefetcher
+        Then: Folders come in order with their input, log and output files
+        """
+        listFolders = self.fnCreateSweep(tempdir)
+        (tempdir / "test_sims" / "sim_00" / "notes.txt").write_text("x")
+
+        listSeen = list(archive.SimulationPrefetcher(
+            iter(listFolders), ["earth.in", "vpl.in", "earth.log"]
+        ))
+
+        assert [sFolder for sFolder, buffers in listSeen] == listFolders
+        sFolder, buffers = listSeen[0]
+        listNames = sorted(
+            os.path.relpath(sPath, sFolder) for sPath in buffers
+        )
+        assert "notes.txt" not in listNames
+        assert "earth.in" in listNames and "earth.log" in listNames
+        assert "earth.earth.forward" in listNames
+        assert os.path.join(
+            archive.SEASONAL_FOLDER, "earth.earth.SeasonalTemp.0"
+        ) in listNames
+
+    def test_prefetch_budget(self, tempdir):
+        """
+        Given: A memory budget of 0 MB, and a depth of 0
+        When: Simulation folders are iterated
+        Then: Nothing is read ahead, but every folder is still given
+        """
+        listFolders = self.fnCreateSweep(tempdir)
+
+        listNoBudget = list(archive.SimulationPrefetcher(
+            listFolders, ["earth.in"], {"iPrefetchMB": 0}
+        ))
+        listNoDepth = list(archive.SimulationPrefetcher(
+            listFolders, ["earth.in"], {"iPrefetchDepth": 0}
+        ))
+
+        assert listNoBudget == [(sFolder, {}) for sFolder in listFolders]
+        assert listNoDepth == [(sFolder, None) for sFolder in listFolders]
+        with pytest.raises(ValueError):
+            archive.fdictPrefetchOptions({"iPrefetchDepth": -1})
+
+    def test_parse_from_buffers(self, tempdir, sample_vplanet_help_dict):
+        """
+        Given: A simulation prefetched and then removed from disk
+        When: Its data is gathered from the buffers
+        Then: It matches the data gathered from disk beforehand
+        """
+        sFolder = self.fnCreateSweep(tempdir, 1)[0]
+        tArgs = ("earth", ["earth"], "earth.log", ["earth.in", "vpl.in"],
+                 sample_vplanet_help_dict, sFolder, False)
+        dictDisk = archive.GatherData({}, *tArgs)
+        (sFolder, buffers), = archive.SimulationPrefetcher(
+            [sFolder], ["earth.in", "vpl.in", "earth.log"]
+        )
+        shutil.rmtree(sFolder)
+
+        dictBuffered = archive.GatherData({}, *tArgs, buffers)
+
+        assert sorted(dictBuffered) == sorted(dictDisk)
+        assert dictBuffered["earth:dMass:option"] == dictDisk["earth:dMass:option"]
+        np.testing.assert_array_equal(
+            dictBuffered["earth:SeasonalTemp"][1],
+            dictDisk["earth:SeasonalTemp"][1],
+        )
+
+
+class TestShardedArchive:
+    """Tests for sharded archive creation."""
+
+    def test_archive_shard_mode(self, synthetic_sweep, monkeypatch,
+                                sample_vplanet_help_dict):
+        """
+        Given: A synthetic sweep of three simulations
+        When: Archive is called in shard mode with two workers
+        Then: The root archive links every group from the shard files
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+
+        archive.Archive(
+            str(synthetic_sweep), 2, True, False, False, False, mode="shard"
+        )
+
+        assert os.path.isdir("test_sims_shards")
+        with h5py.File("test_sims.bpa", "r") as f:
+            assert sorted(archive.flistSimulationGroups(f)) == ["sim_00", "sim_01", "sim_02"]
+            for sName in archive.flistSimulationGroups(f):
+                link = f.get(sName, getlink=True)
+                assert isinstance(link, h5py.ExternalLink)
+                assert link.filename.startswith("test_sims_shards")
+
+    def test_extract_reads_linked_root(self, synthetic_sweep, monkeypatch,
+                                       sample_vplanet_help_dict):
+        """
+        Given: A sharded archive opened from a different directory
+        When: ExtractColumn is called on the root
+        Then: Values are read through the external links
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        archive.Archive(
+            str(synthetic_sweep), 2, True, False, False, False, mode="shard"
+        )
+        sArchive = os.path.abspath("test_sims.bpa")
+        monkeypatch.chdir("/")
+
+        with archive.BPLFile(sArchive) as hf:
+            listFinal = archive.ExtractColumn(hf, "earth:TMan:final")
+            listForward = archive.ExtractColumn(hf, "earth:TMan:forward")
+
+        assert np.allclose(listFinal, [2750.0] * 3)
+        assert len(listForward) == 3
+
+    def test_archive_shard_merge(self, synthetic_sweep, monkeypatch,
+                                 sample_vplanet_help_dict):
+        """
+        Given: A sharded build with merge=True
+        When: Archive finishes
+        Then: The root holds real groups and the shard folder is removed
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+
+        archive.Archive(
+            str(synthetic_sweep), 2, True, False, False, False,
+            mode="shard", merge=True
+        )
+
+        assert not os.path.exists("test_sims_shards")
+        with h5py.File("test_sims.bpa", "r") as f:
+            assert sorted(archive.flistSimulationGroups(f)) == ["sim_00", "sim_01", "sim_02"]
+            for sName in archive.flistSimulationGroups(f):
+                link = f.get(sName, getlink=True)
+                assert isinstance(link, h5py.HardLink)
+            assert f["sim_02/earth:TMan:forward"].shape == (1, 6)
+
+    def test_link_shards_skips_partial(self, tempdir):
+        """
+        Given: A shard holding a complete group and a partial one
+        When: fnLinkShards is called
+        Then: Only the complete group is linked into the root
+        """
+        sShardFolder = str(tempdir / "test_shards")
+        os.makedirs(sShardFolder)
+        with h5py.File(archive.fsShardFile(sShardFolder, 0), "w") as f:
+            f.create_group("sim_00")
+            f.create_group(archive.PARTIAL_PREFIX + "sim_01")
+
+        archive.fnLinkShards(str(tempdir / "test.bpa"), sShardFolder)
+
+        with h5py.File(tempdir / "test.bpa", "r") as f:
+            assert list(f.keys()) == ["sim_00"]
+
+    def test_shard_folder_name(self):
+        """
+        Given: An archive path
+        When: fsShardFolder is called
+        Then: Returns a folder beside the archive named after it
+        """
+        assert archive.fsShardFolder("/data/BP_Test.bpa") == \
+            "/data/BP_Test_shards"
+
+
+class TestClaimStats:
+    """Tests for batched claiming in the archive workers."""
+
+    def test_iter_claims_records_stats(self, tempdir):
+        """
+        Given: An SQLite checkpoint with ten simulations
+        When: fiterClaimSimulations is drained by one worker
+        Then: Every folder is yielded and the claim stats add up
+        """
+        pathCheckpoint = tempdir / ".test_BPL"
+        listSims = [str(tempdir / f"sim_{i:02d}") for i in range(10)]
+        archive.CreateCP(str(pathCheckpoint), "bpl.in", listSims,
+                         backend="sqlite")
+        arrStats = mp.Array("d", archive.CLAIM_STATS_FIELDS, lock=False)
+
+        with checkpoint.OpenCheckpoint(str(pathCheckpoint)) as cp:
+            listFolders = list(archive.fiterClaimSimulations(cp, arrStats))
+
+        assert listFolders == listSims
+        assert arrStats[1] == 10
+        # 5 + 3 + 1 + 1 claimed, plus the final empty claim
+        assert arrStats[0] == 5
+        assert arrStats[2] > 0
+
+    def test_archive_prints_claim_summary(self, synthetic_sweep, monkeypatch,
+                                          sample_vplanet_help_dict, capsys):
+        """
+        Given: A synthetic sweep built without quiet
+        When: Archive finishes
+        Then: The run summary reports the checkpoint claims
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+
+        archive.Archive(
+            str(synthetic_sweep), 2, False, False, False, False, mode="writer"
+        )
+
+        captured = capsys.readouterr()
+        assert "Claimed 3 simulations in" in captured.out
+
+
+class TestIncrementalUpdate:
+    """Tests for updating an existing archive in place."""
+
+    def _fnBuild(self, pathBpl, monkeypatch, sample_vplanet_help_dict,
+                 mode="writer", update=False, layout="groups"):
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        archive.Archive(
+            str(pathBpl), 2, True, False, False, False, mode=mode,
+            update=update, layout=layout
+        )
+
+    def test_groups_store_manifest(self, synthetic_sweep, monkeypatch,
+                                   sample_vplanet_help_dict):
+        """
+        Given: A freshly built archive
+        When: Its groups are read
+        Then: Each stores the manifest of its simulation folder
+        """
+        self._fnBuild(synthetic_sweep, monkeypatch, sample_vplanet_help_dict)
+
+        sFolder = os.path.abspath("test_sims/sim_00")
+        with h5py.File("test_sims.bpa", "r") as f:
+            assert f["sim_00"].attrs[archive.MANIFEST_ATTR] == \
+                archive.fsSimulationManifest(sFolder)
+
+    def test_update_adds_new_and_changed(self, tempdir, synthetic_sweep,
+                                         monkeypatch,
+                                         sample_vplanet_help_dict):
+        """
+        Given: An archive, then one new simulation and one changed log file
+        When: Archive runs with update
+        Then: Only the new and changed groups are written
+        """
+        self._fnBuild(synthetic_sweep, monkeypatch, sample_vplanet_help_dict)
+        generators.fnCreateMinimalSimulation(
+            tempdir / "test_sims" / "sim_03"
+        )
+        pathLog = tempdir / "test_sims" / "sim_01" / "earth.log"
+        pathLog.write_text(pathLog.read_text() + "\n")
+
+        with h5py.File("test_sims.bpa", "a") as f:
+            f["sim_00"].attrs["Untouched"] = 1
+            f["sim_01"].attrs["Untouched"] = 1
+
+        self._fnBuild(synthetic_sweep, monkeypatch, sample_vplanet_help_dict,
+                      update=True)
+
+        with h5py.File("test_sims.bpa", "r") as f:
+            assert sorted(archive.flistSimulationGroups(f)) == [
+                "sim_00", "sim_01", "sim_02", "sim_03"
+            ]
+            assert "Untouched" in f["sim_00"].attrs
+            assert "Untouched" not in f["sim_01"].attrs
+            for sName in archive.flistSimulationGroups(f):
+                assert f[sName].attrs[archive.MANIFEST_ATTR] == \
+                    archive.fsSimulationManifest(
+                        os.path.abspath("test_sims/" + sName)
+                    )
+
+    def test_update_up_to_date(self, synthetic_sweep, monkeypatch,
+                               sample_vplanet_help_dict, capsys):
+        """
+        Given: An archive that matches its simulation folders
+        When: Archive runs with update
+        Then: Nothing is rebuilt
+        """
+        self._fnBuild(synthetic_sweep, monkeypatch, sample_vplanet_help_dict)
+        monkeypatch.setattr(
+            archive, "CreateCP",
+            lambda *args, **kwargs: pytest.fail("checkpoint recreated")
+        )
+
+        archive.Archive(
+            str(synthetic_sweep), 2, False, False, False, False, update=True
+        )
+
+        assert "Archive is up to date" in capsys.readouterr().out
+
+    def test_update_sharded_archive(self, tempdir, synthetic_sweep,
+                                    monkeypatch, sample_vplanet_help_dict):
+        """
+        Given: A sharded archive with one changed simulation
+        When: Archive runs with update in shard mode
+        Then: The stale group is removed from its shard and relinked
+        """
+        self._fnBuild(synthetic_sweep, monkeypatch, sample_vplanet_help_dict,
+                      mode="shard")
+        pathLog = tempdir / "test_sims" / "sim_02" / "earth.log"
+        pathLog.write_text(pathLog.read_text() + "\n")
+
+        self._fnBuild(synthetic_sweep, monkeypatch, sample_vplanet_help_dict,
+                      mode="shard", update=True)
+
+        iCopies = 0
+        for pathShard in (tempdir / "test_sims_shards").iterdir():
+            with h5py.File(pathShard, "r") as f:
+                iCopies += "sim_02" in f
+        assert iCopies == 1
+        with h5py.File("test_sims.bpa", "r") as f:
+            assert f["sim_02"].attrs[archive.MANIFEST_ATTR] == \
+                archive.fsSimulationManifest(
+                    os.path.abspath("test_sims/sim_02")
+                )
+
+
+    def test_update_ragged_archive(self, tempdir, synthetic_sweep,
+                                   monkeypatch, sample_vplanet_help_dict):
+        """
+        Given: A ragged layout archive with one changed simulation
+        When: Archive runs with update
+        Then: Each series holds one row per simulation, with the same data,
+              and the values do not grow
+        """
+        self._fnBuild(synthetic_sweep, monkeypatch, sample_vplanet_help_dict,
+                      layout="ragged")
+        with h5py.File("test_sims.bpa", "r") as f:
+            dictBefore = {
+                k: (f[archive.SERIES_GROUP][k]["values"].shape,
+                    archive.ExtractColumnArray(f, k))
+                for k in f[archive.SERIES_GROUP]
+            }
+        pathLog = tempdir / "test_sims" / "sim_01" / "earth.log"
+        pathLog.write_text(pathLog.read_text() + "\n")
+
+        self._fnBuild(synthetic_sweep, monkeypatch, sample_vplanet_help_dict,
+                      update=True, layout="ragged")
+
+        with h5py.File("test_sims.bpa", "r") as f:
+            for k, (tShape, before) in dictBefore.items():
+                hSeries = f[archive.SERIES_GROUP][k]
+                listNames = list(hSeries["names"].asstr()[()])
+                assert sorted(listNames) == ["sim_00", "sim_01", "sim_02"]
+                assert hSeries["values"].shape == tShape
+                after = archive.ExtractColumnArray(f, k)
+                for daBefore, daAfter in zip(before, after):
+                    np.testing.assert_array_equal(daBefore, daAfter)
+
+
+class TestSummaryColumns:
+    """Tests for building the consolidated scalar columns."""
+
+    def test_archive_builds_columns(self, synthetic_sweep, monkeypatch,
+                                    sample_vplanet_help_dict):
+        """
+        Given: A synthetic sweep
+        When: Archive finishes
+        Then: Numeric scalar keys are stored as columns, strings are not
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        archive.Archive(
+            str(synthetic_sweep), 2, True, False, False, False
+        )
+
+        with h5py.File("test_sims.bpa", "r") as f:
+            hColumns = f[archive.COLUMNS_GROUP]
+            assert list(hColumns[archive.COLUMNS_INDEX].asstr()[()]) == [
+                "sim_00", "sim_01", "sim_02"
+            ]
+            assert hColumns["earth:TMan:final"].dtype == np.float64
+            np.testing.assert_allclose(
+                hColumns["earth:TMan:final"][()], [2750.0] * 3
+            )
+            assert hColumns["earth:TMan:final"].attrs["Units"] == \
+                f["sim_00/earth:TMan:final"].attrs["Units"]
+            assert "earth:sName:option" not in hColumns
+            assert "earth:TMan:forward" not in hColumns
+
+    def test_build_columns_keeps_unchanged_rows(self, tempdir):
+        """
+        Given: Existing columns and one group marked unchanged
+        When: fnBuildColumns is called
+        Then: Only the other rows are read from their groups
+        """
+        pathArchive = tempdir / "test.bpa"
+        with h5py.File(pathArchive, "w") as f:
+            for sName in ("sim_00", "sim_01"):
+                f.create_group(sName).create_dataset(
+                    "earth:Mass:final", data=[b"1.0"]
+                )
+        archive.fnBuildColumns(str(pathArchive))
+        with h5py.File(pathArchive, "a") as f:
+            f[archive.COLUMNS_GROUP + "/earth:Mass:final"][:] = [5.0, 5.0]
+
+        archive.fnBuildColumns(str(pathArchive), setKeep={"sim_00"})
+
+        with h5py.File(pathArchive, "r") as f:
+            np.testing.assert_allclose(
+                f[archive.COLUMNS_GROUP + "/earth:Mass:final"][()], [5.0, 1.0]
+            )
+
+
+class TestPrecomputedStats:
+    """Tests for statistics stored with the archive by saPrecomputeStats."""
+
+    @pytest.mark.parametrize("sMode, sLayout", [
+        ("writer", "groups"),
+        ("lock", "ragged"),
+        ("shard", "groups"),
+    ])
+    def test_stats_stored_and_read(self, synthetic_sweep, monkeypatch,
+                                   sample_vplanet_help_dict, sMode, sLayout):
+        """
+        Given: A bpl.in with saPrecomputeStats and no list of statistics
+        When: The sweep is archived and a statistic is extracted
+        Then: Every default statistic is stored with each simulation group
+              and in the columns, and is read without the forward data
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        with open(synthetic_sweep, "a") as f:
+            f.write("saPrecomputeStats\n")
+        archive.Archive(
+            str(synthetic_sweep), 2, True, False, False, False, mode=sMode,
+            layout=sLayout,
+        )
+
+        with h5py.File("test_sims.bpa", "r") as f:
+            forward = archive.ExtractColumnArray(f, "earth:TMan:forward")
+            hColumns = f[archive.COLUMNS_GROUP]
+            dictSummary = archive.fdictReadSummary(f["sim_00"])
+            for sStat in archive.PRECOMPUTE_DEFAULTS:
+                k = "earth:TMan:" + sStat
+                daExpected = archive.SERIES_STATISTICS[sStat](forward)
+                assert k not in f["sim_00"]
+                np.testing.assert_array_equal(dictSummary[k], daExpected[:1])
+                assert k in archive.flistArchiveKeys(f)
+                assert hColumns[k].attrs["Units"] == \
+                    archive.ExtractUnits(f, "earth:TMan:forward")
+                np.testing.assert_array_equal(hColumns[k][()], daExpected)
+
+            def fnFail(*args, **kwargs):
+                raise AssertionError("forward data read for a statistic")
+
+            monkeypatch.setattr(extract, "fcolReadSeries", fnFail)
+            np.testing.assert_array_equal(
+                archive.ExtractColumn(f, "earth:TMan:last"),
+                [daRow[-1] for daRow in forward],
+            )
+
+    def test_only_listed_stats_stored(self, synthetic_sweep, monkeypatch,
+                                      sample_vplanet_help_dict):
+        """
+        Given: A bpl.in listing two statistics
+        When: The sweep is archived
+        Then: Only those statistics are stored
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        with open(synthetic_sweep, "a") as f:
+            f.write("saPrecomputeStats max mean\n")
+        archive.Archive(str(synthetic_sweep), 1, True, False, False, False)
+
+        with h5py.File("test_sims.bpa", "r") as f:
+            dictSummary = archive.fdictReadSummary(f["sim_00"])
+        listStats = [k for k in dictSummary if k.startswith("earth:TMan:")]
+        assert sorted(listStats) == ["earth:TMan:max", "earth:TMan:mean"]
+
+    @pytest.mark.parametrize("bRagged", [False, True])
+    def test_stats_of_several_rows_stored(self, tempdir, monkeypatch,
+                                          bRagged):
+        """
+        Given: A forward key with two rows
+        When: Its statistics are written and extracted
+        Then: A value per row is stored, and read without the forward data
+        """
+        listRecords = [
+            ("earth:TMan:forward", "K",
+             [np.array([1.0, 2.0, 3.0]), np.array([6.0, 5.0, 4.0])]),
+        ]
+        with h5py.File(tempdir / "test.bpa", "w") as f:
+            iterRecords = archive.fiterSummaryRecords(
+                iter(listRecords), ["max", "first"]
+            )
+            archive.fnWriteSimulationToArchive(
+                f, iterRecords, "sim_00", {}, False, bRagged=bRagged
+            )
+
+        def fnFail(*args, **kwargs):
+            raise AssertionError("forward data read for a statistic")
+
+        monkeypatch.setattr(extract, "fcolReadSeries", fnFail)
+        with h5py.File(tempdir / "test.bpa", "r") as f:
+            daMax = archive.ExtractColumnArray(f, "earth:TMan:max")
+            daFirst = archive.ExtractColumnArray(f, "earth:TMan:first")
+
+        np.testing.assert_array_equal(daMax, [3.0, 6.0])
+        np.testing.assert_array_equal(daFirst, [1.0, 6.0])
+
+    def test_streamed_keys_reported(self, synthetic_sweep, monkeypatch,
+                                    sample_vplanet_help_dict, capsys):
+        """
+        Given: A bpl.in with saPrecomputeStats and forward files large
+              enough to be streamed
+        When: The sweep is archived
+        Then: The forward keys without stored statistics are reported, and
+              their statistics are computed when extracted
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        # prefetched files are checked against the threshold in archive
+        monkeypatch.setattr(process, "STREAM_MIN_BYTES", 0)
+        monkeypatch.setattr(archive, "STREAM_MIN_BYTES", 0)
+        with open(synthetic_sweep, "a") as f:
+            f.write("saPrecomputeStats\n")
+        archive.Archive(str(synthetic_sweep), 1, True, False, False, False)
+
+        sOut = capsys.readouterr().out
+        assert "WARNING: Statistics of earth:TMan:forward" in sOut
+        assert "sun:Time:forward" not in sOut
+        with h5py.File("test_sims.bpa", "r") as f:
+            assert archive.fdictReadSummary(f["sim_00"]) == {}
+            forward = archive.ExtractColumnArray(f, "earth:TMan:forward")
+            np.testing.assert_array_equal(
+                archive.ExtractColumnArray(f, "earth:TMan:max"),
+                [np.max(daRow) for daRow in forward],
+            )
+
+    def test_summary_records(self):
+        """
+        Given: Records of a forward key with values, one without values,
+              and a final value
+        When: fiterSummaryRecords adds statistics
+        Then: Only the forward key with values gets statistic records
+        """
+        listRecords = [
+            ("earth:TMan:forward", "K", [np.array([3.0, 1.0, 2.0])]),
+            ("sun:Age:forward", "sec", []),
+            ("earth:TMan:final", "K", ["2.0"]),
+        ]
+
+        listSummary = list(
+            archive.fiterSummaryRecords(iter(listRecords), ["min", "last"])
+        )
+
+        assert listSummary == [
+            listRecords[0],
+            ("earth:TMan:min", "K", [1.0]),
+            ("earth:TMan:last", "K", [2.0]),
+            listRecords[1],
+            listRecords[2],
+        ]
+
+    def test_unknown_stat_raises(self):
+        """
+        Given: A statistic that ExtractColumn does not compute
+        When: flistPrecomputeStats is called
+        Then: Raises ValueError
+        """
+        with pytest.raises(ValueError):
+            archive.flistPrecomputeStats(["median"])
+
+
+class TestRaggedLayout:
+    """Tests for the ragged series layout."""
+
+    def test_ragged_matches_groups(self, synthetic_sweep, monkeypatch,
+                                   sample_vplanet_help_dict):
+        """
+        Given: The same sweep archived in the groups and ragged layouts
+        When: Forward columns and statistics are extracted
+        Then: Both layouts give the same values
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        archive.Archive(
+            str(synthetic_sweep), 2, True, False, False, False, mode="lock"
+        )
+        os.rename("test_sims.bpa", "groups.bpa")
+        checkpoint.RemoveCheckpoint(".test_sims_BPL")
+        archive.Archive(
+            str(synthetic_sweep), 2, True, False, False, False,
+            layout="ragged"
+        )
+
+        with h5py.File("groups.bpa", "r") as fGroups, \
+                h5py.File("test_sims.bpa", "r") as fRagged:
+            assert "earth:TMan:forward" not in fRagged["sim_00"]
+            assert "earth:TMan:final" in fRagged["sim_00"]
+            for k in ("earth:TMan:forward", "sun:Luminosity:forward"):
+                listGroups = archive.ExtractColumn(fGroups, k)
+                listRagged = archive.ExtractColumn(fRagged, k)
+                assert len(listGroups) == len(listRagged)
+                for daGroups, daRagged in zip(listGroups, listRagged):
+                    np.testing.assert_array_equal(daGroups, daRagged)
+            assert archive.ExtractColumn(fRagged, "earth:TMan:mean") == \
+                archive.ExtractColumn(fGroups, "earth:TMan:mean")
+            assert archive.ExtractUnits(fRagged, "earth:TMan:forward") == \
+                archive.ExtractUnits(fGroups, "earth:TMan:forward")
+
+    def test_ragged_rejects_shard_mode(self, synthetic_sweep):
+        """
+        Given: The ragged layout and shard mode
+        When: Archive is called
+        Then: Raises ValueError
+        """
+        with pytest.raises(ValueError):
+            archive.Archive(
+                str(synthetic_sweep), 2, True, False, False, False,
+                mode="shard", layout="ragged"
+            )
+
+    def test_append_series_views(self, tempdir):
+        """
+        Given: Two simulations appended, then the first appended again
+        When: The key is read through RaggedSeries
+        Then: Each name gives a reshaped view of its last row
+        """
+        with h5py.File(tempdir / "test.bpa", "w") as f:
+            archive.fnAppendSeries(
+                f, "sim_00", {"earth:TMan:forward": ["K", [1.0, 2.0, 3.0]]}
+            )
+            archive.fnAppendSeries(
+                f, "sim_01", {"earth:TMan:forward": ["K", [4.0, 5.0]]}
+            )
+            archive.fnAppendSeries(
+                f, "sim_00", {"earth:TMan:forward": ["K", [6.0, 7.0, 8.0]]}
+            )
+
+        with h5py.File(tempdir / "test.bpa", "r") as f:
+            series = archive.RaggedSeries(f, "earth:TMan:forward")
+
+        assert len(series) == 2
+        assert series.sUnits == "K"
+        np.testing.assert_array_equal(series["sim_00"], [[6.0, 7.0, 8.0]])
+        np.testing.assert_array_equal(series["sim_01"], [[4.0, 5.0]])
+        assert np.shares_memory(series["sim_01"], series.daValues)
+
+
+    def test_compact_series(self, tempdir):
+        """
+        Given: A series with a replaced row and rows of three simulations
+        When: The rows of one simulation are removed
+        Then: Every other simulation keeps its last row, moved down, and
+              the values keep their length
+        """
+        with h5py.File(tempdir / "test.bpa", "w") as f:
+            for sName, listValues in [
+                ("sim_00", [1.0, 2.0, 3.0]),
+                ("sim_01", [4.0, 5.0]),
+                ("sim_00", [6.0, 7.0]),
+                ("sim_02", [8.0]),
+            ]:
+                archive.fnAppendSeries(
+                    f, sName, {"earth:TMan:forward": ["K", listValues]}
+                )
+            hSeries = f[archive.SERIES_GROUP]["earth:TMan:forward"]
+            iRemoved = archive.fnCompactSeries(hSeries, {"sim_01"})
+            archive.fnAppendSeries(
+                f, "sim_01", {"earth:TMan:forward": ["K", [9.0, 10.0]]}
+            )
+
+        with h5py.File(tempdir / "test.bpa", "r") as f:
+            hSeries = f[archive.SERIES_GROUP]["earth:TMan:forward"]
+            series = archive.RaggedSeries(f, "earth:TMan:forward")
+            assert hSeries["values"].shape == (8,)
+            assert list(hSeries["names"].asstr()[()]) == [
+                "sim_00", "sim_02", "sim_01"
+            ]
+
+        assert iRemoved == 2
+        np.testing.assert_array_equal(series["sim_00"], [[6.0, 7.0]])
+        np.testing.assert_array_equal(series["sim_01"], [[9.0, 10.0]])
+        np.testing.assert_array_equal(series["sim_02"], [[8.0]])
+
+    def test_series_chunks_fit_rows(self, tempdir):
+        """
+        Given: Series whose first rows are short and long
+        When: They are appended in the ragged layout
+        Then: Each is chunked to fit its row, within the chunk limits
+        """
+        with h5py.File(tempdir / "test.bpa", "w") as f:
+            archive.fnAppendSeries(f, "sim_00", {
+                "earth:TMan:forward": ["K", np.zeros(10)],
+                "earth:Age:forward": ["sec", np.zeros(1000)],
+                "earth:Time:forward": ["sec", np.zeros(100000)],
+            })
+
+        with h5py.File(tempdir / "test.bpa", "r") as f:
+            hSeriesRoot = f[archive.SERIES_GROUP]
+            assert hSeriesRoot["earth:TMan:forward/values"].chunks == \
+                (archive.SERIES_MIN_CHUNK,)
+            assert hSeriesRoot["earth:Age:forward/values"].chunks == (1024,)
+            assert hSeriesRoot["earth:Time:forward/values"].chunks == \
+                (archive.SERIES_CHUNK,)
+
+
+class TestStorageOptions:
+    """Tests for storage options in archive creation."""
+
+    def test_series_values_compressed(self, tempdir):
+        """
+        Given: lzf compression settings
+        When: A series is appended in the ragged layout
+        Then: The concatenated values are compressed with lzf
+        """
+        dictStorage = archive.fdictStorageOptions({"sCompression": "lzf"})
+        with h5py.File(tempdir / "test.bpa", "w") as f:
+            archive.fnAppendSeries(
+                f, "sim_00", {"earth:TMan:forward": ["K", [1.0, 2.0]]},
+                dictStorage
+            )
+
+        with h5py.File(tempdir / "test.bpa", "r") as f:
+            dataset = f[archive.SERIES_GROUP + "/earth:TMan:forward/values"]
+            assert dataset.compression == "lzf"
+            assert dataset.fletcher32
+
+    def test_archive_rejects_bad_compression(self, synthetic_sweep):
+        """
+        Given: A bpl.in asking for an unknown compression
+        When: Archive is called
+        Then: Raises ValueError before any work starts
+        """
+        with open(synthetic_sweep, "a") as f:
+            f.write("sCompression zstd\n")
+
+        with pytest.raises(ValueError):
+            archive.Archive(
+                str(synthetic_sweep), 2, True, False, False, False
+            )
+        assert not os.path.exists(".test_sims_BPL")
+
+    def test_single_values_are_checksummed(self, synthetic_sweep,
+                                           monkeypatch,
+                                           sample_vplanet_help_dict):
+        """
+        Given: A synthetic sweep
+        When: It is archived
+        Then: Every numeric dataset of a simulation, single values
+              included, carries a Fletcher32 checksum
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        archive.Archive(str(synthetic_sweep), 1, True, False, False, False)
+
+        listUnchecked = []
+        with h5py.File("test_sims.bpa", "r") as f:
+            for sName in archive.flistSimulationGroups(f):
+                for k, dataset in f[sName].items():
+                    if dataset.size and dataset.dtype.kind in "iufc" and \
+                            not dataset.fletcher32:
+                        listUnchecked.append(sName + "/" + k)
+        assert listUnchecked == []
+
+
+class TestClimateArchive:
+    """Tests for archiving sweeps with several bodies and climate grids."""
+
+    def test_archive_climate_sweep(self, tempdir, monkeypatch,
+                                   sample_vplanet_help_dict):
+        """
+        Given: A sweep with two planets that both write climate grids
+        When: Archive is called
+        Then: Forward and climate data are archived for each planet
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        generators.fnCreateMultipleSimulations(
+            tempdir / "test_sims", 2,
+            listBodyNames=["sun", "earth", "mars"], bIncludeClimate=True,
+            iNumLatitudes=5, iNumDays=4, bSystemOutFile=True,
+        )
+        pathBpl = generators.fnCreateBigPlanetIn(
+            tempdir, "test_sims", listBodyFiles=["earth.in", "mars.in"]
+        )
+        monkeypatch.chdir(tempdir)
+
+        archive.Archive(str(pathBpl), 1, True, False, False, False)
+
+        with h5py.File("test_sims.bpa", "r") as f:
+            assert len(archive.ExtractColumn(f, "mars:TMan:forward")[0]) == 6
+            listInsol = archive.ExtractColumn(f, "mars:DailyInsol:climate")
+            assert len(listInsol) == 2
+            assert len(listInsol[0]) == 5
+            assert np.shape(f["sim_00/mars:SeasonalTemp"]) == (1, 4, 5)
+
+
+class TestStreamedArchive:
+    """Tests for archiving output files too large to read into memory."""
+
+    @pytest.mark.parametrize("sLayout", ["groups", "ragged"])
+    def test_streamed_matches_in_memory(self, synthetic_sweep, monkeypatch,
+                                        sample_vplanet_help_dict, sLayout):
+        """
+        Given: A sweep archived normally and with every file streamed
+        When: Forward columns are extracted from both
+        Then: The values and units are the same
+        """
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        archive.Archive(
+            str(synthetic_sweep), 1, True, False, False, False, layout=sLayout
+        )
+        os.rename("test_sims.bpa", "memory.bpa")
+        checkpoint.RemoveCheckpoint(".test_sims_BPL")
+
+        # prefetched files are checked against the threshold in archive
+        monkeypatch.setattr(process, "STREAM_MIN_BYTES", 0)
+        monkeypatch.setattr(archive, "STREAM_MIN_BYTES", 0)
+        monkeypatch.setattr(process, "STREAM_BLOCK_BYTES", 100)
+        archive.Archive(
+            str(synthetic_sweep), 1, True, False, False, False, layout=sLayout
+        )
+
+        with h5py.File("memory.bpa", "r") as fMemory, \
+                h5py.File("test_sims.bpa", "r") as fStreamed:
+            for k in ("earth:TMan:forward", "earth:Time:forward"):
+                listMemory = archive.ExtractColumn(fMemory, k)
+                listStreamed = archive.ExtractColumn(fStreamed, k)
+                assert len(listStreamed) == 3
+                for daMemory, daStreamed in zip(listMemory, listStreamed):
+                    np.testing.assert_array_equal(daMemory, daStreamed)
+                assert archive.ExtractUnits(fStreamed, k) == \
+                    archive.ExtractUnits(fMemory, k)
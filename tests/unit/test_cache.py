@@ -0,0 +1,188 @@
+"""
+Unit tests for cache module.
+
+Tests the on-disk cache of parsed simulation files used when filtering
+raw simulation folders.
+"""
+
+import os
+import pathlib
+import pickle
+
+import h5py
+import numpy as np
+import pytest
+
+from bigplanet import archive, cache, filter, process
+
+
+class TestParseCache:
+    """Tests for ParseCache hits, invalidation and eviction."""
+
+    def test_hit_skips_parsing(self, tempdir):
+        """
+        Given: A file parsed once through a ParseCache
+        When: A new cache on the same directory loads it again
+        Then: The cached result is returned without parsing
+        """
+        pathFile = tempdir / "earth.forward"
+        pathFile.write_text("0 1\n1 2\n")
+        listCalls = []
+
+        def fdaParse():
+            listCalls.append(1)
+            return np.array([[0.0, 1.0], [1.0, 2.0]])
+
+        cache.ParseCache(str(tempdir / "cache")).fLoad(
+            "output", [str(pathFile)], fdaParse
+        )
+        daData = cache.ParseCache(str(tempdir / "cache")).fLoad(
+            "output", [str(pathFile)], fdaParse
+        )
+
+        assert listCalls == [1]
+        np.testing.assert_array_equal(daData, [[0.0, 1.0], [1.0, 2.0]])
+
+    def test_changed_file_is_parsed_again(self, tempdir):
+        """
+        Given: A cached log file that is then rewritten
+        When: It is loaded again
+        Then: The new contents are parsed instead of the stale entry used
+        """
+        pathFile = tempdir / "earth.log"
+        pathFile.write_text("old")
+
+        def fdictParse():
+            return {"text": pathFile.read_text()}
+
+        cacheParse = cache.ParseCache(str(tempdir / "cache"))
+        cacheParse.fLoad("log", [str(pathFile)], fdictParse)
+        pathFile.write_text("newer")
+
+        dictParsed = cache.ParseCache(str(tempdir / "cache")).fLoad(
+            "log", [str(pathFile)], fdictParse
+        )
+
+        assert dictParsed == {"text": "newer"}
+
+    def test_eviction_keeps_recently_used(self, tempdir):
+        """
+        Given: A cache capped below the size of three entries
+        When: A fourth entry is written after the first is read again
+        Then: The least recently used entries are removed, down to the cap
+        """
+        sDir = str(tempdir / "cache")
+        listPaths = []
+        for i in range(4):
+            pathFile = tempdir / f"sim{i}.forward"
+            pathFile.write_text(str(i))
+            listPaths.append(str(pathFile))
+        daData = np.zeros(1000)
+        iEntryBytes = 8000 + 128
+        cacheParse = cache.ParseCache(sDir, iMaxBytes=3 * iEntryBytes)
+
+        for i, sPath in enumerate(listPaths[:3]):
+            cacheParse.fLoad("output", [sPath], lambda: daData)
+            # give each entry its own use time
+            sEntry = cacheParse.fsEntryFile("output", [sPath])
+            os.utime(sEntry, ns=(i * 10 ** 9, i * 10 ** 9))
+        cacheParse.fLoad("output", [listPaths[0]], pytest.fail)
+        cacheParse.fLoad("output", [listPaths[3]], lambda: daData)
+
+        assert os.path.isfile(cacheParse.fsEntryFile("output", listPaths[:1]))
+        assert not os.path.isfile(
+            cacheParse.fsEntryFile("output", [listPaths[1]])
+        )
+        assert sum(iBytes for _, iBytes, _ in cacheParse.flistEntries()) \
+            <= 3 * iEntryBytes
+
+    def test_input_entries_depend_on_help(self, tempdir):
+        """
+        Given: Two caches on one directory built with different vplanet help
+        When: They look up the same input file
+        Then: Each uses its own entry, since option units come from the help
+        """
+        pathFile = tempdir / "earth.in"
+        pathFile.write_text("dMass 1\n")
+
+        sFirst = cache.ParseCache(
+            str(tempdir), vplanet_help={"dMass": {"Dimension": "mass"}}
+        ).fsEntryFile("input", [str(pathFile)])
+        sSecond = cache.ParseCache(
+            str(tempdir), vplanet_help={}
+        ).fsEntryFile("input", [str(pathFile)])
+
+        assert sFirst != sSecond
+
+    def test_log_entries_are_binary(self, tempdir):
+        """
+        Given: A parsed log cached, and an entry that refers to a class
+        When: Each is loaded again
+        Then: The log entry is a pickle after ENTRY_MAGIC, and the entry
+              referring to a class is parsed again instead of loaded
+        """
+        pathFile = tempdir / "earth.log"
+        pathFile.write_text("log")
+        dictParsed = {
+            "earth:OutputOrder": [["Time", "year"], ["TMan", "K"]],
+            "earth:TMan:final": ["K", "2000.0"],
+        }
+        cacheParse = cache.ParseCache(str(tempdir / "cache"))
+        cacheParse.fLoad("log", [str(pathFile)], lambda: dictParsed)
+
+        sEntry = cacheParse.fsEntryFile("log", [str(pathFile)])
+        with open(sEntry, "rb") as f:
+            assert f.read(len(cache.ENTRY_MAGIC)) == cache.ENTRY_MAGIC
+        assert cacheParse.fLoad("log", [str(pathFile)], pytest.fail) == \
+            dictParsed
+
+        with open(sEntry, "wb") as f:
+            f.write(cache.ENTRY_MAGIC + pickle.dumps(pathlib.Path("x")))
+        assert cacheParse.fLoad(
+            "log", [str(pathFile)], lambda: {"parsed": "again"}
+        ) == {"parsed": "again"}
+
+
+class TestFilterParseCache:
+    """Tests for the parsed-file cache in the raw-data Filter path."""
+
+    def test_cached_filter_matches_and_skips_parsing(
+        self, synthetic_sweep, monkeypatch, sample_vplanet_help_dict, tempdir
+    ):
+        """
+        Given: A bpl.in with bParseCache that was filtered once
+        When: It is filtered again with different keys, with parsing broken
+        Then: The output comes from the cache and matches an uncached filter
+        """
+        monkeypatch.setenv("BIGPLANET_CACHE_DIR", str(tempdir / "cache"))
+        monkeypatch.setattr(
+            filter, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        sBpl = str(synthetic_sweep)
+        with open(sBpl) as f:
+            sBase = f.read()
+
+        def fnFilter(sKeys, bCache):
+            with open(sBpl, "w") as f:
+                f.write(sBase)
+                f.write(f"saKeyInclude {sKeys}\n")
+                if bCache:
+                    f.write("bParseCache\n")
+            filter.Filter(sBpl, True, False, False, True)
+            with h5py.File("test_sims_filtered.bpf", "r") as f:
+                return {k: f[k][()] for k in f.keys()}
+
+        sKeys = "earth:TMan:forward earth:TMan:final earth:dMass:option"
+        dictExpected = fnFilter(sKeys, False)
+        fnFilter("earth:*", True)
+
+        def fnFail(*args, **kwargs):
+            raise AssertionError("file parsed despite the cache")
+
+        monkeypatch.setattr(process, "fdaReadOutputFile", fnFail)
+        monkeypatch.setattr(process, "fhOpenFile", fnFail)
+        dictCached = fnFilter(sKeys, True)
+
+        assert sorted(dictCached) == sorted(dictExpected)
+        for k in dictExpected:
+            np.testing.assert_array_equal(dictCached[k], dictExpected[k])
@@ -0,0 +1,310 @@
+"""
+Unit tests for checkpoint module.
+
+Tests the text and SQLite checkpoint backends behind OpenCheckpoint.
+"""
+
+import os
+import pathlib
+import pytest
+import h5py
+
+from bigplanet import archive, bpstatus, checkpoint
+
+
+@pytest.fixture
+def sqlite_checkpoint(tempdir):
+    """Create an SQLite checkpoint with three simulations to do."""
+    pathCheckpoint = tempdir / ".test_sims_BPL"
+    listSims = [str(tempdir / f"sim_{i:02d}") for i in range(3)]
+    archive.CreateCP(str(pathCheckpoint), "bpl.in", listSims,
+                     backend="sqlite")
+    return pathCheckpoint
+
+
+class TestOpenCheckpoint:
+    """Tests for backend detection in OpenCheckpoint()."""
+
+    def test_detects_sqlite(self, sqlite_checkpoint):
+        """
+        Given: A checkpoint created with the sqlite backend
+        When: OpenCheckpoint is called without a backend
+        Then: Returns an SQLiteCheckpoint
+        """
+        assert checkpoint.fbIsSQLiteCheckpoint(str(sqlite_checkpoint))
+        with checkpoint.OpenCheckpoint(str(sqlite_checkpoint)) as cp:
+            assert isinstance(cp, checkpoint.SQLiteCheckpoint)
+
+    def test_detects_text(self, checkpoint_file_in_progress):
+        """
+        Given: An original text checkpoint
+        When: OpenCheckpoint is called
+        Then: Returns a TextCheckpoint
+        """
+        with checkpoint.OpenCheckpoint(str(checkpoint_file_in_progress)) as cp:
+            assert isinstance(cp, checkpoint.TextCheckpoint)
+
+    def test_unknown_backend(self, tempdir):
+        """
+        Given: A backend name that does not exist
+        When: OpenCheckpoint is called for a new file
+        Then: Raises ValueError
+        """
+        with pytest.raises(ValueError):
+            checkpoint.OpenCheckpoint(str(tempdir / ".x_BPL"), backend="csv")
+
+
+class TestSQLiteCheckpoint:
+    """Tests for the SQLite checkpoint backend."""
+
+    def test_claim_in_order(self, tempdir, sqlite_checkpoint):
+        """
+        Given: A new SQLite checkpoint
+        When: Simulations are claimed until none are left
+        Then: They come back in creation order, then None
+        """
+        with checkpoint.OpenCheckpoint(str(sqlite_checkpoint)) as cp:
+            listClaimed = [cp.fsClaimNext() for i in range(4)]
+
+        assert listClaimed == [
+            str(tempdir / "sim_00"),
+            str(tempdir / "sim_01"),
+            str(tempdir / "sim_02"),
+            None,
+        ]
+
+    def test_summary_tracks_states(self, sqlite_checkpoint):
+        """
+        Given: One simulation claimed and one completed
+        When: fdictSummary is called
+        Then: Counts reflect each state
+        """
+        with checkpoint.OpenCheckpoint(str(sqlite_checkpoint)) as cp:
+            cp.fnMarkComplete(cp.fsClaimNext())
+            cp.fsClaimNext()
+            dictSummary = cp.fdictSummary()
+
+        assert dictSummary == {
+            "done": 1, "in_progress": 1, "remaining": 1, "total": 3
+        }
+
+    def test_mark_complete_twice(self, sqlite_checkpoint):
+        """
+        Given: A simulation already marked complete
+        When: It is marked complete again
+        Then: The counts do not change
+        """
+        with checkpoint.OpenCheckpoint(str(sqlite_checkpoint)) as cp:
+            sFolder = cp.fsClaimNext()
+            cp.fnMarkComplete(sFolder)
+            cp.fnMarkComplete(sFolder)
+            assert cp.fdictSummary()["done"] == 1
+
+    def test_reset_in_progress(self, tempdir, sqlite_checkpoint):
+        """
+        Given: Two simulations left in progress
+        When: flistResetInProgress is called
+        Then: Both are returned and can be claimed again
+        """
+        with checkpoint.OpenCheckpoint(str(sqlite_checkpoint)) as cp:
+            cp.fsClaimNext()
+            cp.fsClaimNext()
+            listReset = cp.flistResetInProgress()
+            assert cp.fdictSummary()["remaining"] == 3
+            assert cp.fsClaimNext() == str(tempdir / "sim_00")
+
+        assert listReset == [str(tempdir / "sim_00"), str(tempdir / "sim_01")]
+
+    def test_remove_checkpoint(self, tempdir, sqlite_checkpoint):
+        """
+        Given: An SQLite checkpoint that has been written to
+        When: RemoveCheckpoint is called
+        Then: The database and its journal files are gone
+        """
+        cp = checkpoint.OpenCheckpoint(str(sqlite_checkpoint))
+        cp.fsClaimNext()
+
+        checkpoint.RemoveCheckpoint(str(sqlite_checkpoint))
+        cp.close()
+
+        assert list(tempdir.glob(".test_sims_BPL*")) == []
+
+
+class TestJournalMode:
+    """Tests for choosing the SQLite journal mode by filesystem."""
+
+    def test_filesystem_type_from_mounts(self, tempdir):
+        """
+        Given: A mount table with nested mount points
+        When: fsFilesystemType is called for paths under them
+        Then: The type of the longest matching mount point is returned
+        """
+        pathMounts = tempdir / "mounts"
+        pathMounts.write_text(
+            "/dev/sda1 / ext4 rw 0 0\n"
+            "server:/home /scratch nfs4 rw 0 0\n"
+            "fs@o2ib:/lus /scratch/lus\\040fs lustre rw,flock 0 0\n"
+        )
+
+        assert checkpoint.fsFilesystemType(
+            "/scratch/run/.x_BPL", str(pathMounts)
+        ) == "nfs4"
+        assert checkpoint.fsFilesystemType(
+            "/scratch/lus fs/run", str(pathMounts)
+        ) == "lustre"
+        assert checkpoint.fsFilesystemType(
+            "/scratchy", str(pathMounts)
+        ) == "ext4"
+        assert checkpoint.fsFilesystemType(
+            "/scratch", str(tempdir / "missing")
+        ) is None
+
+    @pytest.mark.parametrize("sType, sMode", [
+        ("ext4", "wal"),
+        (None, "wal"),
+        ("lustre", "delete"),
+        ("nfs4", "delete"),
+    ])
+    def test_journal_mode_by_filesystem(self, tempdir, monkeypatch, sType,
+                                        sMode):
+        """
+        Given: A checkpoint on a local, unknown or network filesystem
+        When: It is created and a simulation is claimed
+        Then: Network filesystems get a rollback journal instead of WAL
+        """
+        monkeypatch.setattr(
+            checkpoint, "fsFilesystemType", lambda sPath: sType
+        )
+        sCheckpoint = str(tempdir / ".test_sims_BPL")
+        archive.CreateCP(sCheckpoint, "bpl.in", ["sim_00"], backend="sqlite")
+
+        with checkpoint.OpenCheckpoint(sCheckpoint) as cp:
+            assert cp.fsClaimNext() == os.path.abspath("sim_00")
+            sJournal = cp._fConnect().execute(
+                "PRAGMA journal_mode"
+            ).fetchone()[0]
+
+        assert sJournal == sMode
+
+
+class TestCheckpointConsumers:
+    """Tests that archive and bpstatus work through either backend."""
+
+    def test_recreate_sqlite_failed_sims(self, tempdir, sqlite_checkpoint):
+        """
+        Given: An SQLite checkpoint with a simulation left in progress
+        When: ReCreateCP is called
+        Then: The simulation is queued again and its group deleted
+        """
+        with checkpoint.OpenCheckpoint(str(sqlite_checkpoint)) as cp:
+            cp.fnMarkComplete(cp.fsClaimNext())
+            cp.fsClaimNext()
+
+        pathArchive = tempdir / "test_sims.bpa"
+        with h5py.File(pathArchive, "w") as f:
+            f.create_group("/sim_00")
+            f.create_group("/sim_01")
+
+        archive.ReCreateCP(
+            str(sqlite_checkpoint), "bpl.in", quiet=True, sims=[],
+            folder_name=str(tempdir / "test_sims"), force=False
+        )
+
+        with h5py.File(pathArchive, "r") as f:
+            assert "/sim_00" in f
+            assert "/sim_01" not in f
+        with checkpoint.OpenCheckpoint(str(sqlite_checkpoint)) as cp:
+            assert cp.fdictSummary()["remaining"] == 2
+
+    def test_recreate_sqlite_force(self, tempdir, sqlite_checkpoint):
+        """
+        Given: A completed SQLite checkpoint and force=True
+        When: ReCreateCP is called
+        Then: A fresh SQLite checkpoint is created
+        """
+        with checkpoint.OpenCheckpoint(str(sqlite_checkpoint)) as cp:
+            for i in range(3):
+                cp.fnMarkComplete(cp.fsClaimNext())
+
+        (tempdir / "test_sims.bpa").touch()
+        archive.ReCreateCP(
+            str(sqlite_checkpoint), "bpl.in", quiet=True,
+            sims=[str(tempdir / "sim_00")],
+            folder_name=str(tempdir / "test_sims"), force=True
+        )
+
+        assert checkpoint.fbIsSQLiteCheckpoint(str(sqlite_checkpoint))
+        with checkpoint.OpenCheckpoint(str(sqlite_checkpoint)) as cp:
+            assert cp.fdictSummary()["remaining"] == 1
+
+    def test_bpstatus_sqlite(self, tempdir, sqlite_checkpoint, monkeypatch,
+                             capsys):
+        """
+        Given: An SQLite checkpoint with one simulation complete
+        When: bpstatus is called
+        Then: Prints the counts from the status summary
+        """
+        with checkpoint.OpenCheckpoint(str(sqlite_checkpoint)) as cp:
+            cp.fnMarkComplete(cp.fsClaimNext())
+
+        pathVspaceInput = tempdir / "vspace.in"
+        pathVspaceInput.write_text("srcfolder .\ndestfolder test_sims\n")
+        monkeypatch.chdir(tempdir)
+
+        bpstatus.bpstatus(str(pathVspaceInput))
+
+        captured = capsys.readouterr()
+        assert "Number of Simulations completed: 1" in captured.out
+        assert "Number of Simulations remaining: 2" in captured.out
+
+
+class TestBatchedClaims:
+    """Tests for batched, adaptive claiming."""
+
+    def test_batch_size_shrinks(self):
+        """
+        Given: Four workers and a shrinking queue
+        When: fiClaimBatchSize is called
+        Then: Batches are capped early and fall to one near the end
+        """
+        assert checkpoint.fiClaimBatchSize(100000, 4) == \
+            checkpoint.CLAIM_BATCH_MAX
+        assert checkpoint.fiClaimBatchSize(80, 4) == 10
+        assert checkpoint.fiClaimBatchSize(3, 4) == 1
+        assert checkpoint.fiClaimBatchSize(0, 4) == 1
+
+    def test_sqlite_claim_batch(self, tempdir):
+        """
+        Given: An SQLite checkpoint with 40 simulations and two workers
+        When: Batches are claimed until none are left
+        Then: Every simulation is claimed once, in order, in shrinking batches
+        """
+        pathCheckpoint = tempdir / ".test_sims_BPL"
+        listSims = [str(tempdir / f"sim_{i:02d}") for i in range(40)]
+        archive.CreateCP(str(pathCheckpoint), "bpl.in", listSims,
+                         backend="sqlite")
+
+        listBatches = []
+        with checkpoint.OpenCheckpoint(str(pathCheckpoint)) as cp:
+            while True:
+                listBatch = cp.flistClaimBatch(2)
+                if not listBatch:
+                    break
+                listBatches.append(listBatch)
+            assert cp.fdictSummary()["in_progress"] == 40
+
+        assert [len(b) for b in listBatches][:3] == [10, 8, 6]
+        assert len(listBatches[-1]) == 1
+        assert sum(listBatches, []) == listSims
+
+    def test_text_claim_batch(self, tempdir, checkpoint_file_in_progress):
+        """
+        Given: A text checkpoint with two simulations to do
+        When: flistClaimBatch is called for one worker
+        Then: Claims one and marks it in progress
+        """
+        with checkpoint.OpenCheckpoint(str(checkpoint_file_in_progress)) as cp:
+            listBatch = cp.flistClaimBatch(1)
+            assert cp.fdictSummary()["in_progress"] == 2
+
+        assert [os.path.basename(s) for s in listBatch] == ["sim_02"]
@@ -6,10 +6,13 @@ Tests cover HDF5 extraction, statistical functions, and MD5 checksums.
 
 import hashlib
 import pathlib
+import statistics
+import warnings
 
 import h5py
 import numpy as np
 import pytest
+from scipy import stats
 
 from bigplanet import extract
 
@@ -69,6 +72,390 @@ class TestExtractColumn:
             assert len(result[0]) == 6  # 6 time steps
 
 
+class TestExtractColumnArray:
+    """Tests for ExtractColumnArray function and RaggedColumn class."""
+
+    def fnWriteArchive(self, pathArchive):
+        with h5py.File(pathArchive, "w") as hf:
+            for iSim, daForward in enumerate(
+                [np.array([[1.0, 2.0, 3.0]]), np.array([[4.0, 5.0]])]
+            ):
+                grp = hf.create_group(f"sim_{iSim:02d}")
+                grp.create_dataset("earth:Temp:forward", data=daForward)
+                grp.create_dataset(
+                    "earth:Temp:final", data=np.array([daForward[0, -1]])
+                )
+
+    def test_scalar_key_returns_array(self, tempdir):
+        """
+        Given: An archive with a final value in each simulation
+        When: ExtractColumnArray is called for the final key
+        Then: Returns a float64 array with one value per simulation
+        """
+        self.fnWriteArchive(tempdir / "test.bpa")
+
+        with h5py.File(tempdir / "test.bpa", "r") as hf:
+            daFinal = extract.ExtractColumnArray(hf, "earth:Temp:final")
+
+        assert isinstance(daFinal, np.ndarray)
+        assert daFinal.dtype == np.float64
+        np.testing.assert_array_equal(daFinal, [3.0, 5.0])
+
+    def test_forward_key_returns_ragged_column(self, tempdir):
+        """
+        Given: An archive whose simulations have series of different lengths
+        When: ExtractColumnArray is called for the forward key
+        Then: Returns a RaggedColumn holding each series end to end
+        """
+        self.fnWriteArchive(tempdir / "test.bpa")
+
+        with h5py.File(tempdir / "test.bpa", "r") as hf:
+            column = extract.ExtractColumnArray(hf, "earth:Temp:forward")
+            listForward = extract.ExtractColumn(hf, "earth:Temp:forward")
+
+        assert isinstance(column, extract.RaggedColumn)
+        assert len(column) == 2
+        np.testing.assert_array_equal(column.daValues, [1, 2, 3, 4, 5])
+        np.testing.assert_array_equal(column.daOffsets, [0, 3, 5])
+        np.testing.assert_array_equal(column.fdaLengths(), [3, 2])
+        np.testing.assert_array_equal(column[-1], [4.0, 5.0])
+        assert [list(row) for row in column] == \
+            [list(row) for row in listForward]
+        with pytest.raises(ValueError):
+            column.fdaStack()
+
+    def test_filtered_forward_stacks(self, tempdir):
+        """
+        Given: A filtered file with one forward row per simulation
+        When: ExtractColumnArray is called for the forward key
+        Then: Its rows stack back into the stored 2-D array
+        """
+        daForward = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]])
+        with h5py.File(tempdir / "filtered.bpf", "w") as hf:
+            hf.create_dataset("earth:Temp:forward", data=daForward)
+
+        with h5py.File(tempdir / "filtered.bpf", "r") as hf:
+            column = extract.ExtractColumnArray(hf, "earth:Temp:forward")
+
+        np.testing.assert_array_equal(column.fdaStack(), daForward)
+
+    @pytest.mark.parametrize("sStatistic, fnExpected", [
+        ("mean", statistics.mean),
+        ("stddev", statistics.stdev),
+        ("min", min),
+        ("max", max),
+        ("geomean", statistics.geometric_mean),
+    ])
+    def test_statistics_match_statistics_module(
+        self, tempdir, sStatistic, fnExpected
+    ):
+        """
+        Given: An archive with forward series of different lengths
+        When: ExtractColumnArray is called for a statistic
+        Then: Each value matches the statistic of that simulation's series
+        """
+        self.fnWriteArchive(tempdir / "test.bpa")
+
+        with h5py.File(tempdir / "test.bpa", "r") as hf:
+            daStatistic = extract.ExtractColumnArray(
+                hf, "earth:Temp:" + sStatistic
+            )
+
+        np.testing.assert_allclose(
+            daStatistic,
+            [fnExpected([1.0, 2.0, 3.0]), fnExpected([4.0, 5.0])],
+        )
+
+
+    def test_statistics_match_per_row_kernels(self):
+        """
+        Given: A RaggedColumn of random rows, some of them empty
+        When: Each statistic in SERIES_STATISTICS is computed
+        Then: It matches NumPy and scipy row by row, with NaN for empty rows
+        """
+        rng = np.random.default_rng(0)
+        listRows = [
+            np.round(rng.normal(size=iLength), 1)
+            for iLength in rng.integers(0, 30, 50)
+        ]
+        listRows[1] = np.array([])
+        daLengths = np.array([len(daRow) for daRow in listRows])
+        daOffsets = np.concatenate([[0], np.cumsum(daLengths)])
+        column = extract.RaggedColumn(
+            np.concatenate(listRows), daOffsets, daLengths[:, None]
+        )
+        dictKernels = {
+            "mean": np.mean,
+            "stddev": lambda daRow: np.std(daRow, ddof=1),
+            "min": np.min,
+            "max": np.max,
+            "mode": lambda daRow: stats.mode(daRow).mode,
+            "first": lambda daRow: daRow[0],
+            "last": lambda daRow: daRow[-1],
+        }
+
+        for sStatistic, fnKernel in dictKernels.items():
+            daStatistic = extract.SERIES_STATISTICS[sStatistic](column)
+            with warnings.catch_warnings():
+                # the kernels warn on rows too short for a statistic
+                warnings.simplefilter("ignore", RuntimeWarning)
+                daExpected = [
+                    fnKernel(daRow) if len(daRow) else np.nan
+                    for daRow in listRows
+                ]
+            np.testing.assert_allclose(
+                daStatistic, daExpected, rtol=1e-12, err_msg=sStatistic
+            )
+
+    def test_stored_statistic_is_read(self, tempdir):
+        """
+        Given: An archive whose groups store a statistic of the forward
+              data as attributes
+        When: ExtractColumnArray is called for the statistic
+        Then: The stored values are returned instead of being computed
+        """
+        self.fnWriteArchive(tempdir / "test.bpa")
+        with h5py.File(tempdir / "test.bpa", "a") as hf:
+            for sName, dMax in (("sim_00", 30.0), ("sim_01", 50.0)):
+                hf[sName].attrs[extract.SUMMARY_KEYS_ATTR] = ["earth:Temp:max"]
+                hf[sName].attrs[extract.SUMMARY_ATTR] = [dMax]
+            hf["sim_00/earth:Temp:forward"].attrs["Units"] = "K"
+
+        with h5py.File(tempdir / "test.bpa", "r") as hf:
+            daMax = extract.ExtractColumnArray(hf, "earth:Temp:max")
+            daMean = extract.ExtractColumnArray(hf, "earth:Temp:mean")
+            sUnits = extract.ExtractUnits(hf, "earth:Temp:max")
+
+        np.testing.assert_array_equal(daMax, [30.0, 50.0])
+        assert sUnits == "K"
+        np.testing.assert_array_equal(daMean, [2.0, 4.5])
+
+    def test_partly_stored_statistic_is_computed(self, tempdir):
+        """
+        Given: An archive where only some groups hold a statistic
+        When: ExtractColumnArray is called for the statistic
+        Then: It is computed from the forward data of every simulation
+        """
+        self.fnWriteArchive(tempdir / "test.bpa")
+        with h5py.File(tempdir / "test.bpa", "a") as hf:
+            hf["sim_00"].attrs[extract.SUMMARY_KEYS_ATTR] = ["earth:Temp:max"]
+            hf["sim_00"].attrs[extract.SUMMARY_ATTR] = [30.0]
+
+        with h5py.File(tempdir / "test.bpa", "r") as hf:
+            daMax = extract.ExtractColumnArray(hf, "earth:Temp:max")
+
+        np.testing.assert_array_equal(daMax, [3.0, 5.0])
+
+    def test_mode_ties_and_nan(self, tempdir):
+        """
+        Given: Forward series with tied values and repeated NaNs
+        When: ExtractColumn is called for :mode
+        Then: Each result matches scipy.stats.mode, value and count
+        """
+        listRows = [
+            np.array([[3.0, 1.0, 3.0, 1.0, 2.0]]),
+            np.array([[1.0, np.nan, np.nan, np.nan, 2.0, 2.0]]),
+        ]
+        with h5py.File(tempdir / "test.bpa", "w") as hf:
+            for iSim, daForward in enumerate(listRows):
+                grp = hf.create_group(f"sim_{iSim:02d}")
+                grp.create_dataset("earth:Temp:forward", data=daForward)
+
+        with h5py.File(tempdir / "test.bpa", "r") as hf:
+            listModes = extract.ExtractColumn(hf, "earth:Temp:mode")
+
+        for mode, daForward in zip(listModes, listRows):
+            expected = stats.mode(daForward[0])
+            np.testing.assert_equal(mode.mode, expected.mode)
+            assert mode.count == expected.count
+
+
+class TestBigPlanetArchive:
+    """Tests for the BigPlanetArchive handle."""
+
+    def fnWriteArchive(self, pathArchive):
+        with h5py.File(pathArchive, "w") as hf:
+            for iSim in range(3):
+                grp = hf.create_group(f"sim_{iSim:02d}")
+                grp.create_dataset(
+                    "earth:Temp:forward", data=np.arange(4.0)[None] + iSim
+                )
+                grp.create_dataset(
+                    "earth:Temp:final", data=np.array([float(iSim % 2)])
+                )
+                grp["earth:Temp:forward"].attrs["Units"] = "K"
+                grp["earth:Temp:final"].attrs["Units"] = "K"
+
+    @pytest.mark.parametrize("sFunction, k", [
+        ("ExtractColumn", "earth:Temp:final"),
+        ("ExtractColumn", "earth:Temp:mean"),
+        ("ExtractUnits", "earth:Temp:forward"),
+        ("ExtractUniqueValues", "earth:Temp:final"),
+    ])
+    def test_functions_accept_handle(self, tempdir, sFunction, k):
+        """
+        Given: An archive opened as an h5py file and as a handle
+        When: An extract function is called on each, and as a method
+        Then: All three give the same result
+        """
+        self.fnWriteArchive(tempdir / "test.bpa")
+
+        with h5py.File(tempdir / "test.bpa", "r") as hf:
+            expected = getattr(extract, sFunction)(hf, k)
+        with extract.BigPlanetArchive(str(tempdir / "test.bpa")) as archive:
+            assert getattr(extract, sFunction)(archive, k) == expected
+            assert getattr(archive, sFunction)(k) == expected
+
+    def test_groups_listed_once(self, tempdir, monkeypatch):
+        """
+        Given: A handle on an archive
+        When: Several columns, units and the key list are extracted
+        Then: The archive's groups are only listed once
+        """
+        self.fnWriteArchive(tempdir / "test.bpa")
+        archive = extract.BigPlanetArchive(str(tempdir / "test.bpa"))
+        listCalls = []
+        fnKeys = archive.hf.keys
+        monkeypatch.setattr(
+            archive.hf, "keys", lambda: listCalls.append(1) or fnKeys()
+        )
+
+        listForward = archive.ForwardData("earth:Temp:mean")
+        archive.ExtractColumnArray("earth:Temp:final")
+        archive.ExtractUnits("earth:Temp:final")
+        listKeys = extract.flistArchiveKeys(archive)
+        archive.close()
+
+        assert listCalls == [1]
+        assert len(listForward) == 3
+        assert listKeys == ["earth:Temp:final", "earth:Temp:forward"]
+        assert archive.fbIsArchive()
+
+    def test_handle_closes_only_files_it_opened(self, tempdir):
+        """
+        Given: Handles made from a path and from an open file
+        When: They are closed
+        Then: Only the file opened by the handle is closed
+        """
+        self.fnWriteArchive(tempdir / "test.bpa")
+
+        with h5py.File(tempdir / "test.bpa", "r") as hf:
+            with extract.BigPlanetArchive(hf) as archive:
+                archive.ExtractColumn("earth:Temp:final")
+            assert hf.id.valid
+        with extract.BigPlanetArchive(str(tempdir / "test.bpa")) as archive:
+            hOpened = archive.hf
+        assert not hOpened.id.valid
+
+
+class TestExtractColumns:
+    """Tests for ExtractColumns function and BigPlanetArchive.to_dataframe."""
+
+    def fnWriteArchive(self, pathArchive):
+        with h5py.File(pathArchive, "w") as hf:
+            for iSim in range(3):
+                grp = hf.create_group(f"sim_{iSim:02d}")
+                grp.create_dataset(
+                    "earth:Temp:forward", data=np.arange(4.0)[None] + iSim
+                )
+                grp.create_dataset(
+                    "earth:Temp:final", data=np.array([3.0 + iSim])
+                )
+                grp.create_dataset(
+                    "earth:dMass:option", data=np.array([0.5 * iSim])
+                )
+                grp["earth:Temp:forward"].attrs["Units"] = "K"
+                grp["earth:Temp:final"].attrs["Units"] = "K"
+                grp["earth:dMass:option"].attrs["Units"] = "Earth"
+
+    def test_matches_extract_column(self, tempdir):
+        """
+        Given: An archive with final, option and forward keys
+        When: ExtractColumns is called for scalar keys and a statistic
+        Then: Each column matches ExtractColumn, indexed by simulation name
+        """
+        self.fnWriteArchive(tempdir / "test.bpa")
+        listKeys = ["earth:Temp:final", "earth:dMass:option", "earth:Temp:mean"]
+
+        with h5py.File(tempdir / "test.bpa", "r") as hf:
+            df = extract.ExtractColumns(hf, listKeys)
+            dictExpected = {k: extract.ExtractColumn(hf, k) for k in listKeys}
+
+        assert list(df.columns) == listKeys
+        assert list(df.index) == ["sim_00", "sim_01", "sim_02"]
+        for k in listKeys:
+            assert df[k].tolist() == dictExpected[k]
+        assert df.attrs["Units"] == {
+            "earth:Temp:final": "K",
+            "earth:dMass:option": "Earth",
+            "earth:Temp:mean": "K",
+        }
+
+    def test_groups_opened_once(self, tempdir, monkeypatch):
+        """
+        Given: An archive without consolidated columns
+        When: ExtractColumns is called for two scalar keys
+        Then: Each simulation group is opened once, not once per key
+        """
+        self.fnWriteArchive(tempdir / "test.bpa")
+        listOpened = []
+        fnOpen = h5py.h5g.open
+        monkeypatch.setattr(
+            h5py.h5g, "open",
+            lambda *args: listOpened.append(args[1]) or fnOpen(*args),
+        )
+
+        with h5py.File(tempdir / "test.bpa", "r") as hf:
+            extract.ExtractColumns(
+                hf, ["earth:Temp:final", "earth:dMass:option"]
+            )
+
+        assert listOpened == [b"sim_00", b"sim_01", b"sim_02"]
+
+    def test_filtered_file(self, tempdir):
+        """
+        Given: A filtered file
+        When: ExtractColumns is called
+        Then: The columns are indexed by row number
+        """
+        with h5py.File(tempdir / "filtered.bpf", "w") as hf:
+            hf.create_dataset("earth:Temp:final", data=np.array([1.0, 2.0]))
+            hf["earth:Temp:final"].attrs["Units"] = "K"
+
+        with h5py.File(tempdir / "filtered.bpf", "r") as hf:
+            df = extract.ExtractColumns(hf, ["earth:Temp:final"])
+
+        assert list(df.index) == [0, 1]
+        assert df["earth:Temp:final"].tolist() == [1.0, 2.0]
+        assert df.attrs["Units"] == {"earth:Temp:final": "K"}
+
+    def test_series_key_raises(self, tempdir):
+        """
+        Given: An archive with forward data
+        When: ExtractColumns is called for the forward key
+        Then: Raises ValueError, since it has no single value per simulation
+        """
+        self.fnWriteArchive(tempdir / "test.bpa")
+
+        with h5py.File(tempdir / "test.bpa", "r") as hf:
+            with pytest.raises(ValueError):
+                extract.ExtractColumns(hf, ["earth:Temp:forward"])
+
+    def test_to_dataframe_defaults_to_scalar_keys(self, tempdir):
+        """
+        Given: A handle on an archive
+        When: to_dataframe is called without keys
+        Then: Every initial, final and option key is a column
+        """
+        self.fnWriteArchive(tempdir / "test.bpa")
+
+        with extract.BigPlanetArchive(str(tempdir / "test.bpa")) as archive:
+            df = archive.to_dataframe()
+
+        assert sorted(df.columns) == ["earth:Temp:final", "earth:dMass:option"]
+        assert df["earth:dMass:option"].tolist() == [0.0, 0.5, 1.0]
+
+
 class TestExtractUnits:
     """Tests for ExtractUnits function."""
 
@@ -361,6 +748,118 @@ class TestExtractUniqueValues:
             assert 5.0 in result
 
 
+    def test_extract_unique_numeric(self, tempdir):
+        """
+        Given: Archive with values stored as numbers
+        When: ExtractUniqueValues and ExtractColumn are called
+        Then: The numbers are returned without conversion from text
+        """
+        pathArchive = tempdir / "test.bpa"
+        with h5py.File(pathArchive, "w") as hf:
+            for sName, iDigits in (("sim_00", 4), ("sim_01", 6), ("sim_02", 4)):
+                hf.create_group(sName).create_dataset(
+                    "earth:iDigits:option", data=np.array([iDigits])
+                )
+
+        with h5py.File(pathArchive, "r") as hf:
+            assert extract.ExtractUniqueValues(
+                hf, "earth:iDigits:option"
+            ) == [4.0, 6.0]
+            assert extract.ExtractColumn(
+                hf, "earth:iDigits:option"
+            ) == [4.0, 6.0, 4.0]
+
+    def test_extract_unique_variable_length_text(self, tempdir):
+        """
+        Given: Filtered file with values stored as variable-length strings
+        When: ExtractUniqueValues is called
+        Then: The values are converted to numbers
+        """
+        pathFiltered = tempdir / "filtered.bpf"
+        with h5py.File(pathFiltered, "w") as hf:
+            hf.create_dataset("earth:dMass:option", data=["1.5", "2", "1.5"])
+
+        with h5py.File(pathFiltered, "r") as hf:
+            result = extract.ExtractUniqueValues(hf, "earth:dMass:option")
+
+        assert result == [1.5, 2.0]
+
+
+class TestSummaryColumns:
+    """Tests for reading the consolidated scalar columns."""
+
+    @pytest.fixture
+    def columnar_archive(self, tempdir):
+        """Create a two-group archive whose columns hold marker values."""
+        pathArchive = tempdir / "test.bpa"
+        with h5py.File(pathArchive, "w") as hf:
+            for sName, sMass in (("sim_00", b"1.0"), ("sim_01", b"2.0")):
+                grp = hf.create_group(sName)
+                grp.create_dataset("earth:Mass:final", data=[sMass])
+                grp["earth:Mass:final"].attrs["Units"] = "kg"
+            hColumns = hf.create_group(extract.COLUMNS_GROUP)
+            hColumns.create_dataset(
+                extract.COLUMNS_INDEX, data=np.array([b"sim_00", b"sim_01"])
+            )
+            hColumns.create_dataset("earth:Mass:final", data=[10.0, 10.0])
+        return pathArchive
+
+    def test_simulation_groups_skip_reserved(self, columnar_archive):
+        """
+        Given: An archive with a reserved columns group
+        When: flistSimulationGroups is called
+        Then: Only the simulation groups are returned
+        """
+        with h5py.File(columnar_archive, "r") as hf:
+            assert extract.flistSimulationGroups(hf) == ["sim_00", "sim_01"]
+
+    def test_extract_column_uses_columns(self, columnar_archive):
+        """
+        Given: An archive whose columns match its groups
+        When: A scalar column and its units are extracted
+        Then: Values come from the columns, units from the first group
+        """
+        with h5py.File(columnar_archive, "r") as hf:
+            assert extract.ExtractColumn(hf, "earth:Mass:final") == [10.0, 10.0]
+            assert extract.ExtractUnits(hf, "earth:Mass:final") == "kg"
+            assert extract.ExtractUniqueValues(
+                hf, "earth:Mass:final"
+            ) == [10.0]
+
+    def test_stale_columns_ignored(self, columnar_archive):
+        """
+        Given: A group added after the columns were built
+        When: ExtractColumn is called
+        Then: Values are read from each group instead
+        """
+        with h5py.File(columnar_archive, "a") as hf:
+            grp = hf.create_group("sim_02")
+            grp.create_dataset("earth:Mass:final", data=[b"3.0"])
+
+        with h5py.File(columnar_archive, "r") as hf:
+            assert extract.ExtractColumn(
+                hf, "earth:Mass:final"
+            ) == [1.0, 2.0, 3.0]
+
+
+class TestSeriesKeys:
+    """Tests for fbIsSeriesKey function."""
+
+    def test_series_keys(self):
+        """
+        Given: Keys of every kind
+        When: fbIsSeriesKey is called
+        Then: Only forward, backward and climate keys are series
+        """
+        assert extract.fbIsSeriesKey("earth:TMan:forward")
+        assert extract.fbIsSeriesKey("earth:TMan:backward")
+        assert extract.fbIsSeriesKey("earth:DailyInsol")
+        assert not extract.fbIsSeriesKey("earth:TMan:final")
+        assert not extract.fbIsSeriesKey("earth:dMass:option")
+        assert not extract.fbIsSeriesKey("earth:OutputOrder")
+        assert not extract.fbIsSeriesKey("earth:GridOutputOrder")
+
+
 class TestRotate90Clockwise:
     """Tests for rotate90Clockwise function."""
 
@@ -418,6 +917,39 @@ class TestArchiveToFiltered:
             assert "earth:Mass:final" in hf
             assert hf["earth:Mass:final"].attrs["Units"] == "Mearth"
 
+    @pytest.mark.parametrize(
+        "sFunction", ["ArchiveToFiltered", "ArchiveToCSV"]
+    )
+    def test_archive_path_is_closed(self, tempdir, monkeypatch, sFunction):
+        """
+        Given: The path of an archive
+        When: ArchiveToFiltered or ArchiveToCSV is called with it
+        Then: The archive it opened is closed before it returns, and can
+              then be opened for writing
+        """
+        pathArchive = tempdir / "test.bpa"
+        with h5py.File(pathArchive, "w") as hf:
+            grp = hf.create_group("sim_00")
+            grp.create_dataset("earth:Mass:final", data=np.array([1.0]))
+            grp["earth:Mass:final"].attrs["Units"] = "Mearth"
+
+        listClosed = []
+        fnClose = extract.BigPlanetArchive.close
+
+        def fnRecordClose(archive):
+            listClosed.append(archive.bOwnsFile)
+            fnClose(archive)
+
+        monkeypatch.setattr(extract.BigPlanetArchive, "close", fnRecordClose)
+        getattr(extract, sFunction)(
+            str(pathArchive), ["earth:Mass:final"], str(tempdir / "out")
+        )
+
+        assert listClosed == [True]
+        assert (tempdir / "out").exists()
+        with h5py.File(pathArchive, "a") as hf:
+            del hf["sim_00"]
+
 
 class TestDictToCSV:
     """Tests for DictToCSV function."""
@@ -5,13 +5,14 @@ Tests the BigPlanet filter functionality, including key categorization
 and filter file creation.
 """
 
+import json
 import os
 import pathlib
 import pytest
 import h5py
 import numpy as np
 
-from bigplanet import filter
+from bigplanet import archive, filter, process
 
 
 class TestSplitsaKey:
@@ -319,7 +320,257 @@ class TestGetOutputFilename:
         assert result == "system.venus.Climate"
 
 
-# TODO: Add integration tests for Filter() function
-# These require more complex setup with proper BPL input files, simulation directories,
-# and archive files. The SplitsaKey function is well-tested above, and Filter()'s
-# archive extraction path is covered by existing integration tests in tests/ExtractFilter*.
+class TestKeyPatterns:
+    """Tests for saKeyInclude patterns and saKeyExclude in Filter()."""
+
+    def test_split_key_patterns(self):
+        """
+        Given: Patterns on the aggregation and on the whole key
+        When: SplitsaKey is called
+        Then: Each pattern goes to every list whose keys it could match
+        """
+        loglist, bodylist, forwardlist, climatelist, backwardlist = \
+            filter.SplitsaKey(["earth:*:fin*", "earth:*", "*Mass*"], False)
+
+        assert loglist == ["earth:*:fin*", "earth:*", "*Mass*"]
+        assert forwardlist == ["earth:*", "*Mass*"]
+        assert bodylist == ["earth:*", "*Mass*"]
+        assert climatelist == ["earth:*", "*Mass*"]
+        assert backwardlist == ["earth:*", "*Mass*"]
+
+    @pytest.mark.parametrize("bArchive", [False, True])
+    def test_filter_include_pattern(self, synthetic_sweep, monkeypatch,
+                                    sample_vplanet_help_dict, bArchive):
+        """
+        Given: A bpl.in including keys by pattern
+        When: Filter is called on the raw folders or on the archive
+        Then: Both paths write the keys matching the patterns
+        """
+        monkeypatch.setattr(
+            filter, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        if bArchive:
+            archive.Archive(str(synthetic_sweep), 1, True, False, False, False)
+        with open(synthetic_sweep, "a") as f:
+            f.write("saKeyInclude earth:T*:final *:TMan:forward\n")
+
+        filter.Filter(str(synthetic_sweep), True, False, False, True)
+
+        with h5py.File("test_sims_filtered.bpf", "r") as f:
+            assert sorted(f.keys()) == [
+                "earth:TCore:final", "earth:TMan:final", "earth:TMan:forward"
+            ]
+            assert len(f["earth:TMan:final"]) == 3
+
+    @pytest.mark.parametrize("bArchive", [False, True])
+    def test_filter_exclude(self, synthetic_sweep, monkeypatch,
+                            sample_vplanet_help_dict, bArchive):
+        """
+        Given: A bpl.in with only saKeyExclude
+        When: Filter is called on the raw folders or on the archive
+        Then: The excluded keys are left out and other keys are written
+        """
+        monkeypatch.setattr(
+            filter, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        monkeypatch.setattr(
+            archive, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        if bArchive:
+            archive.Archive(str(synthetic_sweep), 1, True, False, False, False)
+        with open(synthetic_sweep, "a") as f:
+            f.write("saKeyExclude earth:*:forward sun:*\n")
+
+        filter.Filter(str(synthetic_sweep), True, False, False, True)
+
+        with h5py.File("test_sims_filtered.bpf", "r") as f:
+            listKeys = list(f.keys())
+        assert "earth:TMan:final" in listKeys
+        assert "earth:TMan:forward" not in listKeys
+        assert not any(k.startswith("sun:") for k in listKeys)
+
+
+class TestParallelFilter:
+    """Tests for the parallel, resumable raw-data path of Filter()."""
+
+    def fdictReadFiltered(self):
+        with h5py.File("test_sims_filtered.bpf", "r") as f:
+            return {k: f[k][()] for k in f.keys()}
+
+    def fnWriteInclude(self, synthetic_sweep):
+        with open(synthetic_sweep, "a") as f:
+            f.write("saKeyInclude earth:TMan:forward earth:TMan:final "
+                    "earth:dObliquity:option\n")
+
+    def test_parallel_matches_serial(self, synthetic_sweep, monkeypatch,
+                                     sample_vplanet_help_dict):
+        """
+        Given: A bpl.in selecting log, option and forward keys
+        When: Filter reads the raw folders on one core and on two
+        Then: Both write the same values, in simulation order
+        """
+        monkeypatch.setattr(
+            filter, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        self.fnWriteInclude(synthetic_sweep)
+
+        filter.Filter(str(synthetic_sweep), True, False, False, True, 1)
+        dictSerial = self.fdictReadFiltered()
+        filter.Filter(str(synthetic_sweep), True, False, False, True, 2)
+        dictParallel = self.fdictReadFiltered()
+
+        assert sorted(dictParallel) == sorted(dictSerial)
+        for k in dictSerial:
+            np.testing.assert_array_equal(dictParallel[k], dictSerial[k])
+        assert len(dictSerial["earth:TMan:final"]) == 3
+        assert not os.path.exists(
+            filter.fsFilterJournal("test_sims_filtered.bpf")
+        )
+
+    def fnInterruptThirdSimulation(self, synthetic_sweep, monkeypatch):
+        """Run the filter until it starts reading sim_02."""
+        fdictRead = filter.fdictFilterSimulation
+
+        def fdictInterrupted(sFolder, *args, **kwargs):
+            if os.path.basename(sFolder) == "sim_02":
+                raise KeyboardInterrupt
+            return fdictRead(sFolder, *args, **kwargs)
+
+        monkeypatch.setattr(filter, "fdictFilterSimulation", fdictInterrupted)
+        with pytest.raises(KeyboardInterrupt):
+            filter.Filter(str(synthetic_sweep), True, False, False, True)
+        monkeypatch.setattr(filter, "fdictFilterSimulation", fdictRead)
+
+    def flistRecordParses(self, monkeypatch):
+        """Record the simulation of each forward file parsed from text."""
+        fdaRead = process.fdaReadOutputFile
+        listParsed = []
+
+        def fdaRecorded(source):
+            listParsed.append(os.path.basename(os.path.dirname(source)))
+            return fdaRead(source)
+
+        monkeypatch.setattr(process, "fdaReadOutputFile", fdaRecorded)
+        return listParsed
+
+    def test_interrupted_filter_resumes(self, synthetic_sweep, monkeypatch,
+                                        sample_vplanet_help_dict):
+        """
+        Given: A filter interrupted while reading its third simulation
+        When: It is run again
+        Then: Only the third simulation is parsed, the output is complete,
+              and the journal holds no data
+        """
+        monkeypatch.setattr(
+            filter, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        self.fnWriteInclude(synthetic_sweep)
+        filter.Filter(str(synthetic_sweep), True, False, False, True)
+        dictExpected = self.fdictReadFiltered()
+        os.remove("test_sims_filtered.bpf")
+
+        self.fnInterruptThirdSimulation(synthetic_sweep, monkeypatch)
+        sJournal = filter.fsFilterJournal("test_sims_filtered.bpf")
+        with open(sJournal, "rb") as f:
+            listLines = f.read().splitlines()
+        assert len(listLines) == 3
+        assert [
+            os.path.basename(json.loads(byLine)[0])
+            for byLine in listLines[1:]
+        ] == ["sim_00", "sim_01"]
+        # a record cut short by the interruption is dropped
+        with open(sJournal, "ab") as f:
+            f.write(b'["test_sims/sim_0')
+
+        listParsed = self.flistRecordParses(monkeypatch)
+        filter.Filter(str(synthetic_sweep), True, False, False, True)
+
+        assert listParsed == ["sim_02"]
+        dictResumed = self.fdictReadFiltered()
+        assert sorted(dictResumed) == sorted(dictExpected)
+        for k in dictExpected:
+            np.testing.assert_array_equal(dictResumed[k], dictExpected[k])
+        assert not os.path.isfile(sJournal)
+        assert not os.path.exists(sJournal + filter.FILTER_CACHE_SUFFIX)
+
+    def test_changed_simulation_is_read_again(self, synthetic_sweep,
+                                              monkeypatch,
+                                              sample_vplanet_help_dict):
+        """
+        Given: A filter interrupted after two simulations, then a change
+              to the forward file of the first
+        When: It is run again
+        Then: Only the changed simulation and the unfinished one are
+              parsed, and the output holds the new data
+        """
+        monkeypatch.setattr(
+            filter, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        self.fnWriteInclude(synthetic_sweep)
+        self.fnInterruptThirdSimulation(synthetic_sweep, monkeypatch)
+
+        pathForward = pathlib.Path("test_sims/sim_00/earth.earth.forward")
+        daForward = np.loadtxt(pathForward)
+        daForward[:, 1] += 100
+        np.savetxt(pathForward, daForward, fmt="%.6e")
+
+        listParsed = self.flistRecordParses(monkeypatch)
+        filter.Filter(str(synthetic_sweep), True, False, False, True)
+
+        assert listParsed == ["sim_00", "sim_02"]
+        daTMan = self.fdictReadFiltered()["earth:TMan:forward"]
+        np.testing.assert_array_equal(daTMan[0], daForward[:, 1])
+
+    def test_journal_of_other_filter_is_ignored(self, tempdir):
+        """
+        Given: A journal written for a different key selection
+        When: A FilterJournal with another header resumes from it
+        Then: No records are reused and the journal starts again
+        """
+        sOutput = str(tempdir / "out.bpf")
+        with filter.FilterJournal(sOutput, {"include": ["a"]}) as journal:
+            journal.flistResume()
+            journal.fnAppend("sim_00", filter.fsSimulationManifest("sim_00"))
+        with filter.FilterJournal(sOutput, {"include": ["a"]}) as journal:
+            assert journal.flistResume() == ["sim_00"]
+
+        with filter.FilterJournal(sOutput, {"include": ["b"]}) as journal:
+            assert journal.flistResume() == []
+        with filter.FilterJournal(sOutput, {"include": ["b"]}) as journal:
+            assert journal.flistResume() == []
+
+
+class TestFilterLogReads:
+    """Tests for how often the raw-data path of Filter() reads logs."""
+
+    def test_log_read_once_per_simulation(self, synthetic_sweep, monkeypatch,
+                                          sample_vplanet_help_dict):
+        """
+        Given: A bpl.in selecting final and forward keys
+        When: Filter reads the raw folders
+        Then: Each simulation's log is parsed once
+        """
+        monkeypatch.setattr(
+            filter, "GetVplanetHelp", lambda: sample_vplanet_help_dict
+        )
+        with open(synthetic_sweep, "a") as f:
+            f.write("saKeyInclude earth:TMan:final earth:TMan:forward\n")
+        listReads = []
+        fnProcessLogFile = process.ProcessLogFile
+
+        def fdictCountingLog(logfile, data, folder, *args, **kwargs):
+            # a call with a cache only looks the log up, and parses it
+            # through a call without one on a miss
+            if kwargs.get("cache") is None:
+                listReads.append(os.path.basename(folder))
+            return fnProcessLogFile(logfile, data, folder, *args, **kwargs)
+
+        monkeypatch.setattr(process, "ProcessLogFile", fdictCountingLog)
+        filter.Filter(str(synthetic_sweep), True, False, False, True)
+
+        assert listReads == ["sim_00", "sim_01", "sim_02"]
+        with h5py.File("test_sims_filtered.bpf", "r") as f:
+            assert sorted(f.keys()) == ["earth:TMan:final", "earth:TMan:forward"]
@@ -171,6 +171,66 @@ class TestProcessLogFile:
         assert result["earth:Mass:final"][1] == "1.0e24"
 
 
+class TestParsedLog:
+    """Tests for ParsedLog class."""
+
+    @pytest.mark.parametrize("listInclude", [
+        ["earth:Mass:final", "sun:*:initial"],
+        ["earth:*"],
+        None,
+    ])
+    def test_select_matches_process_log_file(
+        self, minimal_vplanet_log, listInclude
+    ):
+        """
+        Given: A log with values already in the data dictionary
+        When: ParsedLog.fdictSelect adds a selection of its keys
+        Then: The result is the same as ProcessLogFile with that selection
+        """
+        folder = str(minimal_vplanet_log.parent)
+        logfile = minimal_vplanet_log.name
+
+        dictExpected = process.ProcessLogFile(
+            logfile, {"earth:Mass:final": ["kg", "1.0e24"]}, folder, False,
+            incl=listInclude,
+        )
+        log = process.ParsedLog(logfile, folder, False)
+        dictData = log.fdictSelect(
+            {"earth:Mass:final": ["kg", "1.0e24"]}, listInclude
+        )
+
+        assert dictData == dictExpected
+
+    def test_heading_reads_log_once(self, minimal_vplanet_log, monkeypatch):
+        """
+        Given: A ParsedLog queried for values and two bodies' headings
+        When: The queries are made
+        Then: The log is read once and each heading is the body's order
+        """
+        listReads = []
+        fnProcessLogFile = process.ProcessLogFile
+
+        def fdictCountingLog(*args, **kwargs):
+            listReads.append(args[0])
+            return fnProcessLogFile(*args, **kwargs)
+
+        monkeypatch.setattr(process, "ProcessLogFile", fdictCountingLog)
+        log = process.ParsedLog(
+            minimal_vplanet_log.name, str(minimal_vplanet_log.parent), False
+        )
+
+        log.fdictSelect({}, ["earth:*:final"])
+        dictEarth = log.fdictHeading("earth")
+        dictSun = log.fdictHeading("sun")
+
+        assert listReads == ["earth.log"]
+        assert [sVar for sVar, _ in dictEarth["earth:OutputOrder"]] == [
+            "Time", "TMan", "TCore", "Eccentricity", "Obliquity"
+        ]
+        assert list(dictSun) == ["sun:OutputOrder"]
+        assert log.fdictHeading("earth", "GridOutputOrder") == {}
+
+
 class TestProcessInputfile:
     """Tests for ProcessInputfile function."""
 
@@ -361,6 +421,73 @@ dMass 1.0
         assert "kg" in units
 
 
+class TestUnitSystem:
+    """Tests for UnitSystem and the cached dimension lookup."""
+
+    def test_unit_precedence(self, tempdir, sample_vplanet_help_dict):
+        """
+        Given: A body file setting sUnitMass and a vpl.in setting sUnitLength
+        When: A dimension using mass, length and time is resolved
+        Then: Body settings win over vpl.in, which wins over the defaults
+        """
+        (tempdir / "vpl.in").write_text("sUnitMass kg\nsUnitLength AU\n")
+        unit_system = process.UnitSystem(
+            ["sUnitMass solar  # comment\n", "# sUnitTime year\n"],
+            str(tempdir), sample_vplanet_help_dict,
+        )
+
+        assert unit_system.fsUnits("energy") == "(solar*AU^2*sec^-2)"
+
+    def test_vpl_in_read_once(self, tempdir, sample_vplanet_help_dict,
+                              monkeypatch):
+        """
+        Given: A body file with several dimensional options
+        When: ProcessInputfile is called
+        Then: The body file and vpl.in are each opened once
+        """
+        (tempdir / "vpl.in").write_text("sUnitMass kg\n")
+        (tempdir / "earth.in").write_text(
+            "sName earth\ndMass 1.0\ndRadius 1.0\ndSemi 1.0\n"
+        )
+        listOpened = []
+
+        def fnOpen(path, *args, **kwargs):
+            listOpened.append(os.path.basename(path))
+            return open(path, *args, **kwargs)
+
+        monkeypatch.setattr(process, "open", fnOpen, raising=False)
+        data = process.ProcessInputfile(
+            {}, "earth.in", str(tempdir), sample_vplanet_help_dict,
+            verbose=False,
+        )
+
+        assert sorted(listOpened) == ["earth.in", "vpl.in"]
+        assert data["earth:dMass:option"][0] == "kg"
+
+    def test_resolution_shared_across_simulations(self, tempdir,
+                                                  sample_vplanet_help_dict):
+        """
+        Given: Two simulations with the same unit settings
+        When: The same dimension is resolved in both
+        Then: The second lookup is served from the cache
+        """
+        listSystems = []
+        for sSim in ("sim_01", "sim_02"):
+            pathSim = tempdir / sSim
+            pathSim.mkdir()
+            (pathSim / "vpl.in").write_text("sUnitTime year\n")
+            listSystems.append(process.UnitSystem(
+                [], str(pathSim), sample_vplanet_help_dict
+            ))
+
+        process.fsResolveDimension.cache_clear()
+        sFirst = listSystems[0].fsUnits("length*time^-1")
+        sSecond = listSystems[1].fsUnits("length*time^-1")
+
+        assert sFirst == sSecond == "m*year^-1"
+        assert process.fsResolveDimension.cache_info().hits == 1
+
+
 class TestProcessOutputfile:
     """Tests for ProcessOutputfile function."""
 
@@ -390,9 +517,10 @@ class TestProcessOutputfile:
         assert "earth:Time:forward" in result
         assert "earth:TMan:forward" in result
 
-        # Check that data is in correct format [units, [array]]
+        # Check that data is in correct format [units, array]
         assert len(result["earth:Time:forward"]) == 2
-        assert isinstance(result["earth:Time:forward"][1], list)
+        assert isinstance(result["earth:Time:forward"][1], np.ndarray)
+        assert result["earth:Time:forward"][1].dtype == np.float64
 
     def test_process_output_file_with_include_list(self, minimal_forward_file, minimal_vplanet_log):
         """
@@ -475,6 +603,95 @@ class TestGatherData:
         assert len(result) > 0
 
 
+class TestGatherRecords:
+    """Tests for fiterGatherData and record batches."""
+
+    def test_records_match_gather_data(self, tempdir, sample_vplanet_help_dict):
+        """
+        Given: A simulation with forward and seasonal climate files
+        When: Its records are collected with fiterGatherData
+        Then: They hold the same keys, units and values as GatherData
+        """
+        generators.fnCreateMinimalSimulation(
+            tempdir / "sim_00", bIncludeClimate=True, iNumLatitudes=3,
+            iNumDays=2,
+        )
+        tArgs = (
+            "earth", ["earth"], "earth.log",
+            ["sun.in", "earth.in", "vpl.in"], sample_vplanet_help_dict,
+            str(tempdir / "sim_00"), False,
+        )
+
+        dictData = process.GatherData({}, *tArgs)
+        listRecords = list(process.fiterGatherData(*tArgs))
+
+        assert sorted(k for k, units, values in listRecords) == sorted(dictData)
+        for k, units, values in listRecords:
+            entry = process.flistRecordEntry(k, units, values)
+            assert len(entry) == len(dictData[k])
+        assert dictData["earth:TMan:forward"][0] == "K"
+        assert dictData["earth:SeasonalTemp"][1].shape == (2, 3)
+
+    def test_one_output_file_at_a_time(self, tempdir, sample_vplanet_help_dict,
+                                       monkeypatch):
+        """
+        Given: A simulation with a forward file and climate files
+        When: The first record of fiterGatherData is taken
+        Then: Only the forward file has been read
+        """
+        generators.fnCreateMinimalSimulation(
+            tempdir / "sim_00", bIncludeClimate=True
+        )
+        listRead = []
+
+        def fdaRead(path):
+            listRead.append(os.path.basename(path))
+            return fdaReadOutputFile(path)
+
+        fdaReadOutputFile = process.fdaReadOutputFile
+        monkeypatch.setattr(process, "fdaReadOutputFile", fdaRead)
+        iterRecords = process.fiterGatherData(
+            "earth", ["earth"], "earth.log", ["earth.in", "vpl.in"],
+            sample_vplanet_help_dict, str(tempdir / "sim_00"), False,
+        )
+
+        k, units, values = next(iterRecords)
+
+        assert k.endswith(":forward")
+        assert listRead == ["earth.earth.forward"]
+
+    def test_record_batches(self):
+        """
+        Given: Array records and the streamed columns of one file
+        When: They are grouped with fiterRecordBatches
+        Then: Batches close at the byte limit and streamed columns stay
+              together in a batch of their own
+        """
+        daRow = np.zeros(100)
+        listRecords = [
+            ("earth:A:forward", "K", [daRow]),
+            ("earth:B:forward", "K", [daRow]),
+            ("earth:C:forward", "K", [daRow]),
+            ("earth:D:forward", "K",
+             [process.StreamedColumn("big.forward", 0, 2)]),
+            ("earth:E:forward", "K",
+             [process.StreamedColumn("big.forward", 1, 2)]),
+            ("earth:dMass:option", "kg", ["1.0"]),
+        ]
+
+        listBatches = list(process.fiterRecordBatches(
+            listRecords, iBatchBytes=2 * daRow.nbytes
+        ))
+
+        assert [list(d) for d in listBatches] == [
+            ["earth:A:forward", "earth:B:forward"],
+            ["earth:C:forward"],
+            ["earth:D:forward", "earth:E:forward"],
+            ["earth:dMass:option"],
+        ]
+        assert listBatches[3]["earth:dMass:option"] == ["kg", "1.0"]
+
+
 class TestDictToBP:
     """Tests for DictToBP function."""
 
@@ -552,6 +769,93 @@ class TestDictToBP:
             assert dataset.dtype.kind in ['S', 'O', 'U']  # String types
 
 
+    def test_dict_to_bp_typed_values(self, tempdir, sample_vplanet_help_dict):
+        """
+        Given: Log, Double, Int and String values read as text
+        When: DictToBP is called
+        Then: Numbers are stored as float64 or int64, including Double
+              options named after output, and text as strings
+        """
+        help_dict = dict(sample_vplanet_help_dict)
+        help_dict["iDigits"] = {"Type": "Int", "Default Value": "4"}
+        help_dict["bDoLog"] = {"Type": "Bool", "Default Value": "0"}
+        help_dict["dOutputTime"] = {"Type": "Double", "Default Value": "0"}
+        data = {
+            "earth:Mass:final": ["kg", "5.972e24"],
+            "earth:dObliquity:option": ["rad", "23.5"],
+            "earth:dOutputTime:option": ["year", "1e8"],
+            "earth:iDigits:option": ["nd", "6"],
+            "earth:bDoLog:option": ["nd", "1"],
+            "earth:sName:option": ["nd", "earth"],
+        }
+
+        test_file = tempdir / "test.bpf"
+        with h5py.File(test_file, "w") as hf:
+            process.DictToBP(
+                data, help_dict, hf, verbose=False, group_name="",
+                archive=False
+            )
+
+        with h5py.File(test_file, "r") as hf:
+            assert hf["earth:Mass:final"].dtype == np.float64
+            assert hf["earth:Mass:final"][0] == 5.972e24
+            assert hf["earth:dObliquity:option"].dtype == np.float64
+            assert hf["earth:dOutputTime:option"][0] == 1e8
+            assert hf["earth:iDigits:option"].dtype == np.int64
+            assert hf["earth:bDoLog:option"][0] == 1
+            assert hf["earth:sName:option"].dtype.kind in ["S", "O"]
+            assert hf["earth:sName:option"][0] == b"earth"
+
+    def test_single_values_are_checksummed(self, tempdir,
+                                           sample_vplanet_help_dict):
+        """
+        Given: Single option and final values, and a forward series
+        When: DictToBP writes them into files opened with and without
+              ARCHIVE_LIBVER
+        Then: Every value is checksummed, and the checksums of single
+              values take a fraction of the space with ARCHIVE_LIBVER
+        """
+        data = {
+            "earth:Mass:final": ["kg", "5.972e24"],
+            "earth:dObliquity:option": ["rad", "23.5"],
+            "earth:TMan:forward": ["K", [1.0, 2.0, 3.0]],
+        }
+        dictValues = {
+            f"earth:Value{i}:final": ["kg", str(i)] for i in range(200)
+        }
+
+        dictSizes = {}
+        for sName, dictKwargs in (
+            ("latest.bpa", {"libver": process.ARCHIVE_LIBVER}),
+            ("earliest.bpa", {}),
+        ):
+            with h5py.File(tempdir / sName, "w", **dictKwargs) as hf:
+                process.DictToBP(
+                    data, sample_vplanet_help_dict, hf, group_name="/sim_00"
+                )
+                process.DictToBP(
+                    dictValues, sample_vplanet_help_dict, hf,
+                    group_name="/sim_01",
+                )
+            dictSizes[sName] = os.path.getsize(tempdir / sName)
+
+        with h5py.File(tempdir / "latest.bpa", "r") as hf:
+            for k in data:
+                assert hf["sim_00/" + k].fletcher32
+        assert dictSizes["latest.bpa"] * 4 < dictSizes["earliest.bpa"]
+
+    def test_typed_values_keep_text(self):
+        """
+        Given: A numeric option whose value is not a number
+        When: fdaTypedValues converts it
+        Then: The values are kept as text, and whole numbers of a Double
+              option stay float64
+        """
+        assert process.fdaTypedValues(["1", "x"], "f").dtype.kind == "S"
+        assert process.fdaTypedValues(["1", "2"], "f").dtype == np.float64
+        assert process.fdaTypedValues(["1.5"], "i").dtype == np.float64
+
+
 class TestProcessSeasonalClimatefile:
     """Tests for ProcessSeasonalClimatefile function."""
 
@@ -687,6 +991,154 @@ Grid Output Order: TempLandLat[] AlbedoLand[ND]
         assert grid_order[1] == ["AlbedoLand", "ND"]
 
 
+class TestReadOutputFile:
+    """Tests for the NumPy output file reader."""
+
+    def test_columns_are_views(self, tempdir):
+        """
+        Given: A well-formed forward file
+        When: ProcessOutputfile is called
+        Then: Each key holds a contiguous float64 view of one shared array
+        """
+        (tempdir / "earth.earth.forward").write_text(
+            "0.0 3000.0\n1.0 2990.0\n2.0 2980.0\n"
+        )
+        Output = {"earth:OutputOrder": [["Time", "sec"], ["TMan", "K"]]}
+
+        result = process.ProcessOutputfile(
+            "earth.earth.forward", {}, "earth", Output, ":forward",
+            str(tempdir), verbose=False
+        )
+
+        daTime = result["earth:Time:forward"][1]
+        daTMan = result["earth:TMan:forward"][1]
+        np.testing.assert_array_equal(daTMan, [3000.0, 2990.0, 2980.0])
+        assert daTMan.flags["C_CONTIGUOUS"]
+        assert daTime.base is daTMan.base
+
+    def test_malformed_rows_fall_back(self, tempdir):
+        """
+        Given: A file whose last row is cut short
+        When: fdaReadOutputFile is called
+        Then: The pandas reader fills the missing value with NaN
+        """
+        pathFile = tempdir / "earth.earth.forward"
+        pathFile.write_text("0.0 1.0 2.0\n1.0 2.0 3.0\n2.0 3.0\n")
+
+        daData = process.fdaReadOutputFile(str(pathFile))
+
+        assert daData.shape == (3, 3)
+        assert np.isnan(daData[2, 2])
+
+    def test_stack_rows(self):
+        """
+        Given: One array row, and two list rows
+        When: fdaStackRows is called
+        Then: The array row is returned as a view, the lists are stacked
+        """
+        daRow = np.arange(4.0)
+
+        daStacked = process.fdaStackRows([daRow])
+
+        assert daStacked.shape == (1, 4)
+        assert np.shares_memory(daStacked, daRow)
+        assert process.fdaStackRows([[1.0, 2.0], [3.0, 4.0]]).shape == (2, 2)
+
+
+class TestStreamedColumns:
+    """Tests for streaming large output files into HDF5."""
+
+    def test_blocks_cover_file(self, tempdir):
+        """
+        Given: A file read in blocks smaller than one line
+        When: fiterBlocks is iterated
+        Then: Every row is returned once, in order
+        """
+        daData = np.arange(30.0).reshape(10, 3)
+        np.savetxt(tempdir / "earth.earth.forward", daData)
+        column = process.StreamedColumn(
+            str(tempdir / "earth.earth.forward"), 1, 3
+        )
+
+        for iBlockBytes in (10, 100, 10 ** 6):
+            listBlocks = list(column.fiterBlocks(iBlockBytes))
+            np.testing.assert_array_equal(np.vstack(listBlocks), daData)
+        np.testing.assert_array_equal(np.asarray(column), daData[:, 1])
+
+    def test_dict_to_bp_streams(self, tempdir, monkeypatch,
+                                sample_vplanet_help_dict):
+        """
+        Given: A streaming threshold below the size of a forward file
+        When: The file is processed and written with DictToBP
+        Then: Columns are streamed in blocks into (1, rows) datasets
+        """
+        monkeypatch.setattr(process, "STREAM_MIN_BYTES", 0)
+        monkeypatch.setattr(process, "STREAM_BLOCK_BYTES", 64)
+        daData = np.column_stack([np.arange(50.0), np.arange(50.0) * 2])
+        np.savetxt(tempdir / "earth.earth.forward", daData)
+        Output = {"earth:OutputOrder": [["Time", "sec"], ["TMan", "K"]]}
+
+        data = process.ProcessOutputfile(
+            "earth.earth.forward", {}, "earth", Output, ":forward",
+            str(tempdir), verbose=False
+        )
+        assert isinstance(data["earth:TMan:forward"][1],
+                          process.StreamedColumn)
+        with h5py.File(tempdir / "test.bpa", "w") as f:
+            process.DictToBP(
+                data, sample_vplanet_help_dict, f, group_name="/sim_00",
+                storage=process.fdictStorageOptions({}),
+            )
+
+        with h5py.File(tempdir / "test.bpa", "r") as f:
+            dataset = f["sim_00/earth:TMan:forward"]
+            assert dataset.shape == (1, 50)
+            assert dataset.maxshape == (1, None)
+            assert dataset.attrs["Units"] == "K"
+            np.testing.assert_array_equal(dataset[0], daData[:, 1])
+
+    def test_streamed_batches(self, tempdir, monkeypatch,
+                              sample_vplanet_help_dict):
+        """
+        Given: A processed forward file large enough to be streamed
+        When: Its batch is split by fiterStreamedBatches and each batch is
+              written with DictToBP
+        Then: Each batch holds one small block, only the last is marked,
+              and the datasets match the file
+        """
+        monkeypatch.setattr(process, "STREAM_MIN_BYTES", 0)
+        daData = np.column_stack([np.arange(50.0), np.arange(50.0) * 2])
+        np.savetxt(tempdir / "earth.earth.forward", daData)
+        Output = {"earth:OutputOrder": [["Time", "sec"], ["TMan", "K"]]}
+        data = process.ProcessOutputfile(
+            "earth.earth.forward", {}, "earth", Output, ":forward",
+            str(tempdir), verbose=False
+        )
+        dictFinal = {"earth:TMan:final": ["K", "98.0"]}
+
+        assert list(process.fiterStreamedBatches(dictFinal)) == [dictFinal]
+        listBatches = list(process.fiterStreamedBatches(data, 100))
+        assert len(listBatches) > 5
+        for dictBatch in listBatches:
+            assert sorted(dictBatch) == sorted(data)
+            block = dictBatch["earth:TMan:forward"][1]
+            assert isinstance(block, process.StreamedBlock)
+            assert len(block.daValues) <= 10
+            assert block.bLast == (dictBatch is listBatches[-1])
+
+        with h5py.File(tempdir / "test.bpa", "w") as f:
+            for dictBatch in listBatches:
+                process.DictToBP(
+                    dictBatch, sample_vplanet_help_dict, f,
+                    group_name="/sim_00",
+                )
+        with h5py.File(tempdir / "test.bpa", "r") as f:
+            dataset = f["sim_00/earth:TMan:forward"]
+            assert dataset.shape == (1, 50)
+            assert dataset.attrs["Units"] == "K"
+            np.testing.assert_array_equal(dataset[0], daData[:, 1])
+
+
 class TestProcessOutputfileAdvanced:
     """Advanced tests for ProcessOutputfile edge cases."""
 
@@ -726,7 +1178,9 @@ class TestProcessOutputfileAdvanced:
         assert len(result["earth:Time:forward"]) == 3  # units + 2 data arrays
         assert result["earth:Time:forward"][0] == "sec"  # units
         assert result["earth:Time:forward"][1] == [0.0, 0.5, 1.0]  # original
-        assert result["earth:Time:forward"][2] == [0.0, 1.0, 2.0]  # new
+        np.testing.assert_array_equal(
+            result["earth:Time:forward"][2], [0.0, 1.0, 2.0]
+        )  # new
 
     def test_process_output_file_include_filtering(self, tempdir):
         """
@@ -762,6 +1216,212 @@ class TestProcessOutputfileAdvanced:
 
 
 
+class TestKeySelector:
+    """Tests for compiled saKeyInclude/saKeyExclude matching."""
+
+    def test_exact_prefix_and_pattern(self):
+        """
+        Given: An include list with an exact key, a prefix and a pattern
+        When: Keys are matched
+        Then: Each kind of entry selects its keys and nothing else
+        """
+        selKeys = process.KeySelector(
+            ["earth:TMan:final", "sun:*", "*:Obliquity:forward"]
+        )
+
+        assert selKeys.fbMatch("earth:TMan:final")
+        assert selKeys.fbMatch("sun:Luminosity:initial")
+        assert selKeys.fbMatch("mars:Obliquity:forward")
+        assert not selKeys.fbMatch("earth:TMan:initial")
+        assert not selKeys.fbMatch("mars:Obliquity:final")
+        assert "sun:Mass:final" in selKeys
+
+    def test_exclude_wins(self):
+        """
+        Given: A prefix include and an overlapping exclude pattern
+        When: Keys are matched
+        Then: Excluded keys are dropped; with no include list the rest is kept
+        """
+        selKeys = process.KeySelector(["earth:*"], ["*:forward"])
+        assert selKeys.fbMatch("earth:TMan:final")
+        assert not selKeys.fbMatch("earth:TMan:forward")
+
+        selAll = process.KeySelector(None, ["sun:Luminosity:final"])
+        assert selAll.fbMatch("earth:TMan:forward")
+        assert not selAll.fbMatch("sun:Luminosity:final")
+
+    def test_select_expands_patterns(self):
+        """
+        Given: Exact keys, one of them a statistic, and a pattern
+        When: flistSelect is called with the stored keys
+        Then: Exact keys come first in order, then pattern matches, once each
+        """
+        selKeys = process.KeySelector(
+            ["earth:TMan:mean", "earth:TMan:final", "earth:*:final"]
+        )
+
+        listSelected = selKeys.flistSelect(
+            ["earth:TCore:final", "earth:TMan:final", "earth:TMan:forward"]
+        )
+
+        assert listSelected == [
+            "earth:TMan:mean", "earth:TMan:final", "earth:TCore:final"
+        ]
+
+    def test_matches_body(self):
+        """
+        Given: Include lists naming bodies exactly, by pattern or not at all
+        When: fbMatchesBody is called
+        Then: Only bodies that could have a selected key match
+        """
+        selKeys = process.KeySelector(["earth:TMan:forward", "ma*:Mass:final"])
+        assert selKeys.fbMatchesBody("earth")
+        assert selKeys.fbMatchesBody("mars")
+        assert not selKeys.fbMatchesBody("sun")
+
+        assert process.KeySelector(["*Obliquity*"]).fbMatchesBody("sun")
+        assert process.KeySelector(None, ["earth:*"]).fbMatchesBody("earth")
+
+    def test_parsers_accept_selector(self, minimal_vplanet_log):
+        """
+        Given: A log file and a selector with a pattern and an exclusion
+        When: ProcessLogFile is called with the selector
+        Then: Only the selected keys are extracted
+        """
+        selKeys = process.KeySelector(["earth:*:final"], ["earth:Mass:final"])
+
+        result = process.ProcessLogFile(
+            minimal_vplanet_log.name, {}, str(minimal_vplanet_log.parent),
+            verbose=False, incl=selKeys,
+        )
+
+        assert "earth:Obliquity:final" in result
+        assert "earth:Mass:final" not in result
+        assert all(k.startswith("earth:") for k in result)
+
+    def test_parsers_exclude_list(self, minimal_vplanet_log):
+        """
+        Given: A log file and only an exclude list
+        When: ProcessLogFile is called with excl
+        Then: Every key except the excluded ones is extracted
+        """
+        result = process.ProcessLogFile(
+            minimal_vplanet_log.name, {}, str(minimal_vplanet_log.parent),
+            verbose=False, excl=["sun:*"],
+        )
+
+        assert "earth:Mass:final" in result
+        assert not any(k.startswith("sun:") for k in result)
+
+
+class TestStorageOptions:
+    """Tests for chunking and compression settings."""
+
+    def test_storage_kind(self):
+        """
+        Given: Keys of every kind
+        When: fsStorageKind is called
+        Then: Series, climate and other keys are told apart
+        """
+        assert process.fsStorageKind("earth:TMan:forward") == "forward"
+        assert process.fsStorageKind("earth:TMan:backward") == "forward"
+        assert process.fsStorageKind("earth:DailyInsol") == "climate"
+        assert process.fsStorageKind("earth:TMan:final") == "scalar"
+        assert process.fsStorageKind("earth:OutputOrder") == "scalar"
+
+    def test_options_override_series_only(self):
+        """
+        Given: Options selecting lzf without shuffling
+        When: fdictStorageOptions is called
+        Then: Forward and climate use them, scalars keep their defaults
+        """
+        dictStorage = process.fdictStorageOptions(
+            {"sCompression": "lzf", "bShuffle": False}
+        )
+
+        assert dictStorage["forward"]["sCompression"] == "lzf"
+        assert dictStorage["climate"]["bShuffle"] is False
+        assert dictStorage["scalar"] == process.STORAGE_DEFAULTS["scalar"]
+
+    @pytest.mark.parametrize("dictOptions", [
+        {"sCompression": "zstd"},
+        {"iCompressionLevel": 12},
+        {"sCompresion": "gzip"},
+    ])
+    def test_invalid_options(self, dictOptions):
+        """
+        Given: An unknown compression, level or option name
+        When: fdictStorageOptions is called
+        Then: Raises ValueError
+        """
+        with pytest.raises(ValueError):
+            process.fdictStorageOptions(dictOptions)
+
+    def test_chunk_shape(self):
+        """
+        Given: Short and long series
+        When: ftChunkShape is called
+        Then: Short ones fit one chunk, long ones split along time
+        """
+        assert process.ftChunkShape((1, 100), 8) == (1, 100)
+        assert process.ftChunkShape((1, 100000), 8) == (1, 6250)
+        assert process.ftChunkShape((1, 100000), 8, 1024) == (1, 98)
+
+    def test_dataset_options(self):
+        """
+        Given: Small, large and string arrays
+        When: fdictDatasetOptions is called with the default settings
+        Then: Only large numeric arrays are chunked and compressed
+        """
+        dictStorage = process.fdictStorageOptions()
+        daSmall = np.zeros((1, 6))
+        daLarge = np.zeros((1, 10000))
+
+        assert process.fdictDatasetOptions(
+            "earth:TMan:forward", daSmall, dictStorage
+        ) == {"fletcher32": True}
+        assert process.fdictDatasetOptions(
+            "earth:TMan:final", np.array(["1.0"]), dictStorage
+        ) == {"fletcher32": False}
+        assert process.fdictDatasetOptions(
+            "earth:TMan:final", np.array([1.0]), dictStorage
+        ) == {"fletcher32": True}
+        assert process.fdictDatasetOptions(
+            "earth:TMan:forward", daLarge
+        ) == {"fletcher32": True}
+        assert process.fdictDatasetOptions(
+            "earth:TMan:forward", daLarge, dictStorage
+        ) == {
+            "fletcher32": True,
+            "compression": "gzip",
+            "compression_opts": 4,
+            "shuffle": True,
+            "chunks": (1, 5000),
+        }
+
+    def test_scaleoffset_drops_checksum(self, tempdir):
+        """
+        Given: The scale-offset filter
+        When: DictToBP writes a long series
+        Then: The dataset is filtered, without a checksum
+        """
+        dictStorage = process.fdictStorageOptions({"iScaleOffset": 3})
+        data = {"earth:TMan:forward": ["K", list(np.linspace(0, 1, 1000))]}
+
+        with h5py.File(tempdir / "test.bpa", "w") as hf:
+            process.DictToBP(
+                data, {}, hf, group_name="/sim_00", storage=dictStorage
+            )
+
+        with h5py.File(tempdir / "test.bpa", "r") as hf:
+            dataset = hf["/sim_00/earth:TMan:forward"]
+            assert dataset.scaleoffset == 3
+            assert not dataset.fletcher32
+            np.testing.assert_allclose(
+                dataset[0], np.linspace(0, 1, 1000), atol=1e-3
+            )
+
+
 class TestDictToBPAdvanced:
     """Advanced tests for DictToBP verbose and edge cases."""
 
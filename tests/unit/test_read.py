@@ -405,6 +405,103 @@ saKeyInclude earth:Mass:final
         assert "Include List:" in captured.out
 
 
+class TestReadStorageOptions:
+    """Tests for ReadStorageOptions function."""
+
+    def test_read_storage_options(self, tempdir):
+        """
+        Given: A bpl.in file with every storage option
+        When: ReadStorageOptions is called
+        Then: Returns them with their types
+        """
+        pathBpl = tempdir / "bpl.in"
+        pathBpl.write_text(
+            "sDestFolder test\nsCompression LZF\niCompressionLevel 6\n"
+            "bShuffle 0\niScaleOffset 4\n"
+        )
+
+        assert read.ReadStorageOptions(str(pathBpl)) == {
+            "sCompression": "lzf",
+            "iCompressionLevel": 6,
+            "bShuffle": False,
+            "iScaleOffset": 4,
+        }
+
+    def test_read_storage_options_unset(self, tempdir):
+        """
+        Given: A bpl.in with no storage options and a bare bShuffle
+        When: ReadStorageOptions is called
+        Then: Only bShuffle is returned, turned on
+        """
+        pathBpl = tempdir / "bpl.in"
+        pathBpl.write_text("sDestFolder test\nbShuffle\n")
+
+        assert read.ReadStorageOptions(str(pathBpl)) == {"bShuffle": True}
+
+
+class TestReadPrefetchOptions:
+    """Tests for ReadPrefetchOptions function."""
+
+    def test_read_prefetch_options(self, tempdir):
+        """
+        Given: A bpl.in file with both prefetch options
+        When: ReadPrefetchOptions is called
+        Then: Returns them as integers
+        """
+        pathBpl = tempdir / "bpl.in"
+        pathBpl.write_text(
+            "sDestFolder test\niPrefetchDepth 8\niPrefetchMB 1024\n"
+        )
+
+        assert read.ReadPrefetchOptions(str(pathBpl)) == {
+            "iPrefetchDepth": 8,
+            "iPrefetchMB": 1024,
+        }
+
+
+class TestReadParseCacheOptions:
+    """Tests for ReadParseCacheOptions function."""
+
+    @pytest.mark.parametrize("sLine, bExpected", [
+        ("bParseCache", True),
+        ("bParseCache 1", True),
+        ("bParseCache false", False),
+    ])
+    def test_read_parse_cache_options(self, tempdir, sLine, bExpected):
+        """
+        Given: A bpl.in file with bParseCache and a cache size
+        When: ReadParseCacheOptions is called
+        Then: Returns the switch as a bool and the size as an integer
+        """
+        pathBpl = tempdir / "bpl.in"
+        pathBpl.write_text(f"sDestFolder test\n{sLine}\niParseCacheMB 64\n")
+
+        assert read.ReadParseCacheOptions(str(pathBpl)) == {
+            "bParseCache": bExpected,
+            "iParseCacheMB": 64,
+        }
+
+
+class TestReadPrecomputeStats:
+    """Tests for ReadPrecomputeStats function."""
+
+    @pytest.mark.parametrize("sLines, expected", [
+        ("", None),
+        ("saPrecomputeStats\n", []),
+        ("saPrecomputeStats min max $\nmean\n", ["min", "max", "mean"]),
+    ])
+    def test_read_precompute_stats(self, tempdir, sLines, expected):
+        """
+        Given: A bpl.in file with or without saPrecomputeStats
+        When: ReadPrecomputeStats is called
+        Then: Returns the listed statistics, across $ continuations
+        """
+        pathBpl = tempdir / "bpl.in"
+        pathBpl.write_text(f"sDestFolder test\n{sLines}")
+
+        assert read.ReadPrecomputeStats(str(pathBpl)) == expected
+
+
 class TestGetDir:
     """Tests for GetDir function."""
 
@@ -521,3 +618,101 @@ class TestGetVplanetHelp:
         except Exception as e:
             # If vplanet is not available, skip test
             pytest.skip(f"VPLanet not available: {e}")
+
+
+# Two options and an output in the format printed by `vplanet -H`
+FAKE_VPLANET_HELP = """
+| **dMass**                   |
++-----------------+-----------+
+| Description     || Mass      |
++-----------------+-----------+
+| Type            || Double    |
++-----------------+-----------+
+| Dimension(s)    || mass      |
++-----------------+-----------+
+| Default value   || 1 Earth Mass |
++-----------------+-----------+
+| **sName**                   |
++-----------------+-----------+
+| Type            || String    |
++-----------------+-----------+
+| Default value   || None      |
++-----------------+-----------+
+Output Parameters
+| **Age**                     |
+"""
+
+
+class TestVplanetHelpCache:
+    """Tests for the GetVplanetHelp disk cache and bundled snapshot."""
+
+    @pytest.fixture
+    def fake_vplanet(self, tempdir, monkeypatch):
+        """Put a vplanet on the PATH that counts how often it runs."""
+        pathBin = tempdir / "bin"
+        pathBin.mkdir()
+        (tempdir / "help.txt").write_text(FAKE_VPLANET_HELP)
+        pathExe = pathBin / "vplanet"
+        pathExe.write_text(
+            "#!/bin/sh\n"
+            f"echo run >> {tempdir / 'runs.txt'}\n"
+            f"cat {tempdir / 'help.txt'}\n"
+        )
+        pathExe.chmod(0o755)
+        monkeypatch.setenv("PATH", str(pathBin) + os.pathsep + os.environ["PATH"])
+        monkeypatch.setenv("BIGPLANET_CACHE_DIR", str(tempdir / "cache"))
+        return pathExe
+
+    def fiRuns(self, tempdir):
+        pathRuns = tempdir / "runs.txt"
+        if not pathRuns.exists():
+            return 0
+        return len(pathRuns.read_text().splitlines())
+
+    def test_parses_and_caches(self, tempdir, fake_vplanet):
+        """
+        Given: A vplanet on the PATH and an empty cache
+        When: GetVplanetHelp is called twice
+        Then: vplanet runs once and both calls return the parsed help
+        """
+        dictFirst = read.GetVplanetHelp()
+        dictSecond = read.GetVplanetHelp()
+
+        assert dictFirst == {
+            "dMass": {
+                "Type": "Double",
+                "Dimension": "mass",
+                "Default Value": "1 Earth Mass",
+            },
+            "sName": {"Type": "String", "Default Value": "None"},
+        }
+        assert dictSecond == dictFirst
+        assert self.fiRuns(tempdir) == 1
+        assert len(list((tempdir / "cache").glob("vplanet_help_*.json"))) == 1
+
+    def test_changed_executable_invalidates(self, tempdir, fake_vplanet):
+        """
+        Given: A cached help
+        When: The vplanet executable is replaced
+        Then: The help is parsed again
+        """
+        read.GetVplanetHelp()
+        iMtime = fake_vplanet.stat().st_mtime_ns
+        os.utime(fake_vplanet, ns=(iMtime + 10**9, iMtime + 10**9))
+
+        read.GetVplanetHelp()
+
+        assert self.fiRuns(tempdir) == 2
+
+    def test_snapshot_without_vplanet(self, tempdir, monkeypatch, capsys):
+        """
+        Given: No vplanet on the PATH
+        When: GetVplanetHelp is called
+        Then: The bundled snapshot is returned with a warning
+        """
+        monkeypatch.setenv("PATH", str(tempdir))
+
+        dictHelp = read.GetVplanetHelp()
+
+        assert dictHelp["dMass"]["Dimension"] == "mass"
+        assert "bundled with bigplanet" in capsys.readouterr().out